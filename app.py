@@ -1,5 +1,6 @@
 from __future__ import annotations
 import random 
+import sys
 from abc import ABC, abstractmethod 
 from typing import List, Optional, Tuple
 import os
@@ -7,26 +8,213 @@ import sqlite3
 import json
 from datetime import datetime
 from copy import deepcopy
+import math
+from array import array
+import threading
+from collections import OrderedDict, deque
+from fractions import Fraction
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import queue
+import time
+import atexit
+import contextlib
+from collections import Counter
+from bisect import bisect_left
+from types import GeneratorType
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class Almacenamiento(ABC):
+    # Operaciones de persistencia que usa App; cada backend las implementa con
+    # las mismas tuplas de resultado que las consultas SQL originales.
+    @abstractmethod
+    def get_all_users(self) -> List[Tuple]:
+        raise NotImplementedError
 
+    @abstractmethod
+    def post_new_user(self, user: str) -> Tuple | None:
+        raise NotImplementedError
 
-class DataBase:
-    def __init__(self) -> None:
-        self.conexion = sqlite3.connect('pokedex.db')
-        self.cursor = self.conexion.cursor()
-        self.__init_tables()
+    @abstractmethod
+    def get_user_by_id(self, id: int) -> Tuple:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_user_by_name(self, name: str) -> Tuple:
+        raise NotImplementedError
+
+    @abstractmethod
+    def post_pokemon_by_id_user(self, id_user: int, pokemon: Agua | Electrico | Fuego | Hierba):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_pokemon_by_id(self, id_pokemon: int) -> Tuple:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_all_pokemons_by_user_id(self, id_user: int) -> List[Tuple]:
+        raise NotImplementedError
+
+    def delete_user_by_id(self, id_user: int) -> threading.Thread | None:
+        return self.delete_users_by_ids([id_user])
+
+    @abstractmethod
+    def delete_users_by_ids(self, ids_users: List[int]) -> threading.Thread | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def put_pokemon_by_id(self, pokemon: Agua | Electrico | Fuego | Hierba):
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_pokemons_by_id_user(self, id_user: int, pokemons: List[Agua | Electrico | Fuego | Hierba]) -> List[int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def put_user_update_by_id(self, user_id) -> Tuple | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def post_combate(self, user_id: int, ruta: str) -> Tuple | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_all_combates_by_user_id(self, user_id: int) -> List[Tuple]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_all_species(self) -> List[Tuple]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_all_pokemons_by_species_id(self, id_species: int) -> List[Tuple]:
+        raise NotImplementedError
+
+    # Lectura por lotes y paginacion por clave (despues del id X, N filas).
+    # Los backends pueden sobreescribirlas con consultas propias.
+    def iter_all_users(self, tamaño_lote: int = 500):
+        yield from self.get_all_users()
+
+    def iter_pokemons_by_user_id(self, id_user: int, tamaño_lote: int = 500):
+        yield from self.get_all_pokemons_by_user_id(id_user)
+
+    def iter_combates_by_user_id(self, user_id: int, tamaño_lote: int = 500):
+        yield from self.get_all_combates_by_user_id(user_id)
+
+    def get_users_page(self, after_id: int = 0, limit: int = 20) -> List[Tuple]:
+        return sorted(u for u in self.get_all_users() if u[0] > after_id)[:limit]
+
+    def get_pokemons_page_by_user_id(self, id_user: int, after_id: int = 0, limit: int = 20) -> List[Tuple]:
+        return sorted(p for p in self.get_all_pokemons_by_user_id(id_user) if p[0] > after_id)[:limit]
 
-    def __init_tables(self):
-        # Tabla de usuarios
-        self.cursor.execute("""
+    def get_combates_page_by_user_id(self, user_id: int, after_id: int = 0, limit: int = 20) -> List[Tuple]:
+        return sorted(c for c in self.get_all_combates_by_user_id(user_id) if c[0] > after_id)[:limit]
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def _limpiar_combates(rutas: List[str]) -> threading.Thread | None:
+        # Los archivos de combate se eliminan en segundo plano
+        if not rutas:
+            return None
+        limpieza = threading.Thread(target=Almacenamiento.__borrar_archivos, args=(rutas,), name='limpieza-combates')
+        limpieza.start()
+        return limpieza
+
+    @staticmethod
+    def __borrar_archivos(rutas: List[str]):
+        for ruta in rutas:
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+
+class PoolConexiones:
+    # Una conexion por hilo sobre el mismo archivo. En modo WAL los lectores no
+    # esperan al escritor y busy_timeout serializa a los escritores.
+    def __init__(self, ruta: str = 'pokedex.db', busy_timeout_ms: int = 5000, synchronous: str = 'NORMAL', uri: bool = False) -> None:
+        self.ruta = ruta
+        self.uri = uri
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous
+        self.__local = threading.local()
+        self.__candado = threading.Lock()
+        self.__conexiones: List[sqlite3.Connection] = []
+        # Clase de las conexiones nuevas; MetricasDB pone una subclase que cuenta commits
+        self.fabrica = sqlite3.Connection
+
+    def conexion(self) -> sqlite3.Connection:
+        conexion = getattr(self.__local, 'conexion', None)
+        if conexion is None:
+            # check_same_thread=False solo para poder cerrarlas todas desde cerrar()
+            conexion = sqlite3.connect(self.ruta, timeout=self.busy_timeout_ms / 1000, check_same_thread=False, uri=self.uri, factory=self.fabrica)
+            conexion.execute("PRAGMA journal_mode = WAL")
+            conexion.execute(f"PRAGMA synchronous = {self.synchronous}")
+            conexion.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+            self.__local.conexion = conexion
+            self.__local.cursor = conexion.cursor()
+            with self.__candado:
+                self.__conexiones.append(conexion)
+        return conexion
+
+    def cursor(self) -> sqlite3.Cursor:
+        cursor = getattr(self.__local, 'cursor', None)
+        if cursor is None:
+            self.conexion()
+            cursor = self.__local.cursor
+        return cursor
+
+    def cerrar(self):
+        with self.__candado:
+            for conexion in self.__conexiones:
+                conexion.close()
+            self.__conexiones.clear()
+        self.__local = threading.local()
+
+def _migrar_especies(cursor: sqlite3.Cursor):
+    # Mueve las lineas evolutivas de cada fila de pokemons a la tabla species
+    cursor.execute("PRAGMA table_info(pokemons)")
+    columnas = [fila[1] for fila in cursor.fetchall()]
+    if 'evolution_names' not in columnas:
+        return
+    if 'id_species' not in columnas:
+        cursor.execute("ALTER TABLE pokemons ADD COLUMN id_species INTEGER REFERENCES species(id)")
+    cursor.execute("""
+        INSERT OR IGNORE INTO species (name, evolution_names)
+        SELECT json_extract(evolution_names, '$[0]'), evolution_names
+        FROM pokemons
+        GROUP BY evolution_names
+    """)
+    cursor.execute("""
+        UPDATE pokemons
+        SET id_species = (SELECT s.id FROM species s WHERE s.evolution_names = pokemons.evolution_names)
+    """)
+    cursor.execute("ALTER TABLE pokemons DROP COLUMN evolution_names")
+
+class DataBase(Almacenamiento):
+    # Migraciones en orden; la version aplicada se guarda en PRAGMA user_version.
+    # Cada paso es una sentencia SQL o una funcion que recibe el cursor, y debe
+    # ser idempotente para poder actualizar bases existentes.
+    MIGRACIONES: List[list] = [
+        # 1 - Tablas base
+        [
+            # Tabla de usuarios
+            """
             CREATE TABLE IF NOT EXISTS users(
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user VARCHAR(50) NOT NULL UNIQUE,
                 update_at DATETIME DEFAULT (datetime('now', 'localtime'))
             )
-            """)
-        
-        # Tabla de pokémons
-        self.cursor.execute("""
+            """,
+            # Tabla de pokémons
+            """
             CREATE TABLE IF NOT EXISTS pokemons(
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name VARCHAR(100) NOT NULL,
@@ -39,10 +227,9 @@ class DataBase:
                 level INTEGER DEFAULT 1,
                 evolution_names TEXT NOT NULL
             )
-            """)
-        
-        # Tabla intermedia usuario-pokémons
-        self.cursor.execute("""
+            """,
+            # Tabla intermedia usuario-pokémons
+            """
             CREATE TABLE IF NOT EXISTS user_pokemons(
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 id_user INTEGER NOT NULL,
@@ -50,10 +237,9 @@ class DataBase:
                 FOREIGN KEY (id_user) REFERENCES users(id) ON DELETE CASCADE,
                 FOREIGN KEY (id_pokemon) REFERENCES pokemons(id) ON DELETE CASCADE
             )
-            """)
-        
-        # Tabla de batallas
-        self.cursor.execute("""
+            """,
+            # Tabla de batallas
+            """
             CREATE TABLE IF NOT EXISTS battles(
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 id_user INTEGER NOT NULL,
@@ -61,9 +247,118 @@ class DataBase:
                 created_at DATETIME DEFAULT (datetime('now', 'localtime')),
                 FOREIGN KEY (id_user) REFERENCES users(id) ON DELETE CASCADE
             )
-            """)
-        
-        self.conexion.commit()
+            """,
+        ],
+        # 2 - Indices para las busquedas por usuario y los borrados
+        [
+            "CREATE INDEX IF NOT EXISTS idx_user_pokemons_id_user ON user_pokemons(id_user)",
+            "CREATE INDEX IF NOT EXISTS idx_user_pokemons_id_pokemon ON user_pokemons(id_pokemon)",
+            "CREATE INDEX IF NOT EXISTS idx_battles_id_user_created_at ON battles(id_user, created_at)",
+        ],
+        # 3 - Indices para la paginacion por id dentro de cada usuario
+        [
+            "CREATE INDEX IF NOT EXISTS idx_user_pokemons_id_user_id_pokemon ON user_pokemons(id_user, id_pokemon)",
+            "CREATE INDEX IF NOT EXISTS idx_battles_id_user_id ON battles(id_user, id)",
+        ],
+        # 4 - Catalogo de especies: una fila por linea evolutiva en lugar del JSON por pokemon
+        [
+            """
+            CREATE TABLE IF NOT EXISTS species(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name VARCHAR(100) NOT NULL,
+                evolution_names TEXT NOT NULL UNIQUE
+            )
+            """,
+            _migrar_especies,
+            "CREATE INDEX IF NOT EXISTS idx_pokemons_id_species ON pokemons(id_species)",
+        ],
+    ]
+
+    # Campo de PokemonBase -> columna de pokemons, para los UPDATE parciales
+    COLUMNAS_CAMPOS = {
+        'nombre': 'name',
+        'descripcion': 'description',
+        'evolucion': 'evolution',
+        'ataque': 'damage',
+        'defensa': 'defense',
+        'vida': 'health',
+        'nivel': 'level',
+        'evoluciones_nombres': 'id_species',
+    }
+
+    # Columnas de pokemon que devuelven las consultas; evolution_names sale de species
+    COLUMNAS_POKEMON = "p.id, p.name, p.description, p.evolution, p.type, p.damage, p.defense, p.health, p.level, s.evolution_names"
+
+    def __init__(self, ruta: str = 'pokedex.db') -> None:
+        self.pool = self._crear_pool(ruta)
+        # MetricasDB instalada con instrumentar(); None = sin instrumentacion
+        self.metricas: MetricasDB | None = None
+        # Linea evolutiva -> id en species; las especies nunca se borran
+        self.__especies: dict = {}
+        self.__migrar()
+
+    def _crear_pool(self, ruta: str) -> PoolConexiones:
+        return PoolConexiones(ruta)
+
+    @property
+    def conexion(self) -> sqlite3.Connection:
+        return self.pool.conexion()
+
+    @property
+    def cursor(self) -> sqlite3.Cursor:
+        return self.pool.cursor()
+
+    def close(self):
+        self.pool.cerrar()
+
+    def schema_version(self) -> int:
+        self.cursor.execute("PRAGMA user_version")
+        return self.cursor.fetchone()[0]
+
+    def __migrar(self):
+        version = self.schema_version()
+
+        for numero, sentencias in enumerate(self.MIGRACIONES, start=1):
+            if numero <= version:
+                continue
+            # Cada migracion y su numero de version se aplican de forma atomica
+            self.cursor.execute("BEGIN")
+            try:
+                for sentencia in sentencias:
+                    if callable(sentencia):
+                        sentencia(self.cursor)
+                    else:
+                        self.cursor.execute(sentencia)
+                self.cursor.execute(f"PRAGMA user_version = {numero}")
+                self.conexion.commit()
+            except Exception:
+                self.conexion.rollback()
+                raise
+
+    def _id_especie(self, evoluciones_nombres: List[str]) -> int:
+        linea = tuple(evoluciones_nombres)
+        id_species = self.__especies.get(linea)
+        if id_species is None:
+            # Solo se serializa una vez por especie y proceso
+            # Transaccion propia: la especie queda confirmada antes de guardarla en cache.
+            # Dentro de una transaccion abierta se usa _id_especie_en_cache.
+            evolution_names_json = json.dumps(list(linea))
+            cursor = self.conexion.cursor()
+            with self.conexion:
+                cursor.execute("INSERT OR IGNORE INTO species (name, evolution_names) VALUES(?, ?)",
+                    (linea[0] if linea else "", evolution_names_json))
+                cursor.execute("SELECT id FROM species WHERE evolution_names = ?", (evolution_names_json,))
+                id_species = cursor.fetchone()[0]
+            cursor.close()
+            self.__especies[linea] = id_species
+        return id_species
+
+    def _id_especie_en_cache(self, evoluciones_nombres: List[str]) -> int:
+        # Solo lectura, para usar dentro de transacciones: nunca confirma nada
+        id_species = self.__especies.get(tuple(evoluciones_nombres))
+        if id_species is None:
+            raise ValueError(f"Especie sin registrar: {list(evoluciones_nombres)}; falta _preparar_especies antes de la transaccion")
+        return id_species
 
     def get_all_users(self) -> List[Tuple]:
         self.cursor.execute('SELECT * FROM users')
@@ -71,14 +366,15 @@ class DataBase:
         return partidas
     
     def post_new_user(self, user : str) -> Tuple | None:
-        self.cursor.execute("INSERT INTO users (user) VALUES(?)", (user,))
-        self.conexion.commit()
-        user_id = self.cursor.lastrowid
+        with self.conexion:
+            return self._insertar_usuario(self.cursor, user)
 
-        if user_id is None:
-            return None
-        
-        return self.get_user_by_id(user_id)
+    # Las operaciones _insertar_*, _actualizar_*, _guardar_* y _borrar_* ejecutan el
+    # SQL sobre el cursor recibido sin confirmar; la transaccion la abre quien llama
+    # (los metodos publicos o el escritor de DataBaseAsync)
+    def _insertar_usuario(self, cursor: sqlite3.Cursor, user: str) -> Tuple | None:
+        cursor.execute("INSERT INTO users (user) VALUES(?) RETURNING id, user, update_at", (user,))
+        return cursor.fetchone()
 
     def get_user_by_id(self, id : int) -> Tuple:
         self.cursor.execute("SELECT id, user, update_at FROM users WHERE id = ?", (id,))
@@ -92,69 +388,92 @@ class DataBase:
     
     def post_pokemon_by_id_user(self, id_user : int, pokemon : Agua | Electrico | Fuego | Hierba):
 
-        evolution_names_json = json.dumps(pokemon.evoluciones_nombres)
-
-        self.cursor.execute("INSERT INTO pokemons (name, description, evolution, type, damage, defense, health, level, evolution_names) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)", 
-            (
-                pokemon.nombre,
-                pokemon.descripcion,
-                pokemon.evolucion,
-                pokemon.tipo,
-                pokemon.ataque,
-                pokemon.defensa,
-                pokemon.vida,
-                pokemon.nivel,
-                evolution_names_json
+        id_species = self._id_especie(pokemon.evoluciones_nombres)
+
+        # Pokemon y vinculo en la misma transaccion: un solo commit y sin filas huerfanas
+        with self.conexion:
+            self.cursor.execute("INSERT INTO pokemons (name, description, evolution, type, damage, defense, health, level, id_species) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)", 
+                (
+                    pokemon.nombre,
+                    pokemon.descripcion,
+                    pokemon.evolucion,
+                    pokemon.tipo,
+                    pokemon.ataque,
+                    pokemon.defensa,
+                    pokemon.vida,
+                    pokemon.nivel,
+                    id_species
+                )
             )
-        )
-        self.conexion.commit()
-        pokemon_id = self.cursor.lastrowid
+            pokemon_id = self.cursor.lastrowid
 
-        if pokemon_id is None:
-            return
-        
-        self.cursor.execute("INSERT INTO user_pokemons (id_user, id_pokemon) VALUES(?, ?)", (id_user, pokemon_id,))
-        self.conexion.commit()
+            if pokemon_id is None:
+                return
+
+            self.cursor.execute("INSERT INTO user_pokemons (id_user, id_pokemon) VALUES(?, ?)", (id_user, pokemon_id,))
+        pokemon.pokemon_id = pokemon_id
+        pokemon.limpiar_cambios()
+        return pokemon_id
 
     def get_pokemon_by_id(self, id_pokemon : int) -> Tuple:
-        self.cursor.execute("SELECT * FROM pokemons WHERE id = ?", (id_pokemon,))
+        self.cursor.execute(f"""
+            SELECT {self.COLUMNAS_POKEMON}
+            FROM pokemons p
+            INNER JOIN species s ON s.id = p.id_species
+            WHERE p.id = ?
+        """, (id_pokemon,))
         pokemon = self.cursor.fetchone()
         return pokemon
     
     def get_all_pokemons_by_user_id(self, id_user: int) -> List[Tuple]:
-        self.cursor.execute("""
-            SELECT p.id, p.name, p.description, p.evolution, p.type, p.damage, p.defense, p.health, p.level, p.evolution_names
+        self.cursor.execute(f"""
+            SELECT {self.COLUMNAS_POKEMON}
             FROM pokemons p
             INNER JOIN user_pokemons up ON p.id = up.id_pokemon
+            INNER JOIN species s ON s.id = p.id_species
             WHERE up.id_user = ?
         """, (id_user,))
         pokemons = self.cursor.fetchall()
         return pokemons
     
-    def delete_user_by_id(self, id_user: int):
+    def delete_users_by_ids(self, ids_users: List[int]) -> threading.Thread | None:
+        with self.conexion:
+            rutas = self._borrar_usuarios(self.cursor, ids_users)
 
-        pokemons = self.get_all_pokemons_by_user_id(id_user)
-        for pokemon in pokemons:
-            self.cursor.execute("DELETE FROM pokemons WHERE id = ?", (pokemon[0],))
-            self.conexion.commit()
+        return self._limpiar_combates(rutas)
 
-        self.cursor.execute("DELETE FROM users WHERE id = ?", (id_user,))
-        self.conexion.commit()
+    def _borrar_usuarios(self, cursor: sqlite3.Cursor, ids_users: List[int]) -> List[str]:
+        # Borrado por conjuntos; los ids van como un arreglo JSON. Devuelve las rutas de combates
+        ids_json = json.dumps(list(ids_users))
 
-        self.cursor.execute("DELETE FROM user_pokemons WHERE id_user = ?", (id_user,))
-        self.conexion.commit()
+        cursor.execute("SELECT txt_route FROM battles WHERE id_user IN (SELECT value FROM json_each(?))", (ids_json,))
+        rutas = [fila[0] for fila in cursor.fetchall()]
 
-        self.cursor.execute("DELETE FROM battles WHERE id_user = ?", (id_user,))
-        self.conexion.commit()
+        cursor.execute("""
+            DELETE FROM pokemons
+            WHERE id IN (
+                SELECT id_pokemon FROM user_pokemons WHERE id_user IN (SELECT value FROM json_each(?))
+            )
+        """, (ids_json,))
+        cursor.execute("DELETE FROM user_pokemons WHERE id_user IN (SELECT value FROM json_each(?))", (ids_json,))
+        cursor.execute("DELETE FROM battles WHERE id_user IN (SELECT value FROM json_each(?))", (ids_json,))
+        cursor.execute("DELETE FROM users WHERE id IN (SELECT value FROM json_each(?))", (ids_json,))
+        return rutas
 
     def put_pokemon_by_id(self, pokemon : Agua | Electrico | Fuego | Hierba):
         if pokemon.pokemon_id is None:
             print("Error: El pokémon no tiene un ID válido para actualizar")
             return
     
-        evolution_names_json = json.dumps(pokemon.evoluciones_nombres)
+        self._id_especie(pokemon.evoluciones_nombres)
+        with self.conexion:
+            self._actualizar_pokemon(self.cursor, pokemon)
+        pokemon.limpiar_cambios()
+
+    def _actualizar_pokemon(self, cursor: sqlite3.Cursor, pokemon : Agua | Electrico | Fuego | Hierba):
+        id_species = self._id_especie_en_cache(pokemon.evoluciones_nombres)
         
-        self.cursor.execute("""
+        cursor.execute("""
             UPDATE pokemons 
             SET name = ?, 
                 description = ?, 
@@ -164,7 +483,7 @@ class DataBase:
                 defense = ?, 
                 health = ?, 
                 level = ?, 
-                evolution_names = ?
+                id_species = ?
             WHERE id = ?
         """, (
             pokemon.nombre,
@@ -175,43 +494,1292 @@ class DataBase:
             pokemon.defensa,
             pokemon.vida,
             pokemon.nivel,
-            evolution_names_json,
+            id_species,
             pokemon.pokemon_id
         ))
-        
-        self.conexion.commit()
 
-    def put_user_update_by_id(self, user_id):
-        self.cursor.execute("""
+    def __valor_campo(self, pokemon: Agua | Electrico | Fuego | Hierba, campo: str):
+        if campo == 'evoluciones_nombres':
+            return self._id_especie_en_cache(pokemon.evoluciones_nombres)
+        return getattr(pokemon, campo)
+
+    def _preparar_especies(self, pokemons: List[Agua | Electrico | Fuego | Hierba]):
+        # Las especies nuevas se registran antes de abrir la transaccion de guardado;
+        # dentro de ella solo se lee la cache con _id_especie_en_cache
+        for pokemon in pokemons:
+            if pokemon.pokemon_id is None or pokemon.cambios:
+                self._id_especie(pokemon.evoluciones_nombres)
+
+    def save_pokemons_by_id_user(self, id_user: int, pokemons: List[Agua | Electrico | Fuego | Hierba]) -> List[int]:
+        # Guarda el equipo en una sola transaccion. Devuelve los ids asignados a los nuevos.
+        self._preparar_especies(pokemons)
+        with self.conexion:
+            nuevos_ids = self._guardar_pokemons(self.cursor, id_user, pokemons)
+        self._confirmar_pokemons(pokemons, nuevos_ids)
+        return nuevos_ids
+
+    def _guardar_pokemons(self, cursor: sqlite3.Cursor, id_user: int, pokemons: List[Agua | Electrico | Fuego | Hierba]) -> List[int]:
+        # UPDATE solo de las columnas modificadas de cada pokemon e INSERT de los nuevos
+        actualizar = [p for p in pokemons if p.pokemon_id is not None and p.cambios]
+        insertar = [p for p in pokemons if p.pokemon_id is None]
+        nuevos_ids: List[int] = []
+
+        # Un UPDATE por combinacion de columnas modificadas
+        grupos: dict = {}
+        for pokemon in actualizar:
+            grupos.setdefault(pokemon.campos_modificados(), []).append(pokemon)
+
+        for campos, grupo in grupos.items():
+            asignaciones = ", ".join(f"{self.COLUMNAS_CAMPOS[campo]} = ?" for campo in campos)
+            cursor.executemany(f"UPDATE pokemons SET {asignaciones} WHERE id = ?", [
+                tuple(self.__valor_campo(p, campo) for campo in campos) + (p.pokemon_id,)
+                for p in grupo
+            ])
+
+        if insertar:
+            # Cada id sale del RETURNING de su propio INSERT: con una conexion por hilo otro
+            # escritor puede confirmar filas entre una lectura de MAX(id) y la siguiente
+            for p in insertar:
+                cursor.execute("INSERT INTO pokemons (name, description, evolution, type, damage, defense, health, level, id_species) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?) RETURNING id", (
+                    p.nombre, p.descripcion, p.evolucion, p.tipo, p.ataque, p.defensa, p.vida, p.nivel,
+                    self._id_especie_en_cache(p.evoluciones_nombres)
+                ))
+                nuevos_ids.append(cursor.fetchone()[0])
+            cursor.executemany("INSERT INTO user_pokemons (id_user, id_pokemon) VALUES(?, ?)",
+                [(id_user, pokemon_id) for pokemon_id in nuevos_ids])
+        return nuevos_ids
+
+    @staticmethod
+    def _confirmar_pokemons(pokemons: List[Agua | Electrico | Fuego | Hierba], nuevos_ids: List[int]):
+        # Tras el commit: los nuevos reciben su id y todos quedan sin cambios pendientes
+        for pokemon, pokemon_id in zip([p for p in pokemons if p.pokemon_id is None], nuevos_ids):
+            pokemon.pokemon_id = pokemon_id
+        for pokemon in pokemons:
+            pokemon.limpiar_cambios()
+
+    def put_user_update_by_id(self, user_id) -> Tuple | None:
+        with self.conexion:
+            return self._actualizar_usuario(self.cursor, user_id)
+
+    def _actualizar_usuario(self, cursor: sqlite3.Cursor, user_id) -> Tuple | None:
+        # RETURNING devuelve la fila actualizada sin una segunda consulta
+        cursor.execute("""
             UPDATE users 
             SET update_at = datetime('now', 'localtime')
             WHERE id = ?
+            RETURNING id, user, update_at
         """, (
             user_id,
         ))            
+        return cursor.fetchone()
 
-        self.conexion.commit()
+    def post_combate(self, user_id :int, ruta: str) -> Tuple | None:
+        with self.conexion:
+            return self._insertar_combate(self.cursor, user_id, ruta)
 
-    def post_combate(self, user_id :int, ruta: str):
-        self.cursor.execute("INSERT INTO battles (id_user, txt_route) VALUES(?, ?)", (user_id, ruta,))
-        self.conexion.commit()
+    def _insertar_combate(self, cursor: sqlite3.Cursor, user_id: int, ruta: str) -> Tuple | None:
+        cursor.execute("INSERT INTO battles (id_user, txt_route) VALUES(?, ?) RETURNING *", (user_id, ruta,))
+        return cursor.fetchone()
     
     def get_all_combates_by_user_id(self, user_id: int):
         self.cursor.execute('SELECT * FROM battles WHERE id_user = ?', (user_id,))
         combates = self.cursor.fetchall()
         return combates
-class Utils:
-    @staticmethod 
-    def clear():
-        os.system("cls" if os.name == "nt" else "clear")
+
+    def get_all_species(self) -> List[Tuple]:
+        self.cursor.execute('SELECT id, name, evolution_names FROM species ORDER BY id')
+        return self.cursor.fetchall()
+
+    def get_all_pokemons_by_species_id(self, id_species: int) -> List[Tuple]:
+        self.cursor.execute(f"""
+            SELECT {self.COLUMNAS_POKEMON}
+            FROM pokemons p
+            INNER JOIN species s ON s.id = p.id_species
+            WHERE p.id_species = ?
+            ORDER BY p.id
+        """, (id_species,))
+        return self.cursor.fetchall()
+
+    def __iter_consulta(self, consulta: str, parametros: Tuple, tamaño_lote: int):
+        # Cursor propio para no pisar el cursor compartido mientras se consume el generador
+        cursor = self.conexion.cursor()
+        try:
+            cursor.execute(consulta, parametros)
+            while True:
+                lote = cursor.fetchmany(tamaño_lote)
+                if not lote:
+                    break
+                yield from lote
+        finally:
+            cursor.close()
+
+    def iter_all_users(self, tamaño_lote: int = 500):
+        return self.__iter_consulta('SELECT * FROM users ORDER BY id', (), tamaño_lote)
+
+    def iter_pokemons_by_user_id(self, id_user: int, tamaño_lote: int = 500):
+        return self.__iter_consulta(f"""
+            SELECT {self.COLUMNAS_POKEMON}
+            FROM user_pokemons up
+            INNER JOIN pokemons p ON p.id = up.id_pokemon
+            INNER JOIN species s ON s.id = p.id_species
+            WHERE up.id_user = ?
+            ORDER BY up.id_pokemon
+        """, (id_user,), tamaño_lote)
+
+    def iter_combates_by_user_id(self, user_id: int, tamaño_lote: int = 500):
+        return self.__iter_consulta('SELECT * FROM battles WHERE id_user = ? ORDER BY id', (user_id,), tamaño_lote)
+
+    def get_users_page(self, after_id: int = 0, limit: int = 20) -> List[Tuple]:
+        self.cursor.execute('SELECT * FROM users WHERE id > ? ORDER BY id LIMIT ?', (after_id, limit))
+        return self.cursor.fetchall()
+
+    def get_pokemons_page_by_user_id(self, id_user: int, after_id: int = 0, limit: int = 20) -> List[Tuple]:
+        self.cursor.execute(f"""
+            SELECT {self.COLUMNAS_POKEMON}
+            FROM user_pokemons up
+            INNER JOIN pokemons p ON p.id = up.id_pokemon
+            INNER JOIN species s ON s.id = p.id_species
+            WHERE up.id_user = ? AND up.id_pokemon > ?
+            ORDER BY up.id_pokemon
+            LIMIT ?
+        """, (id_user, after_id, limit))
+        return self.cursor.fetchall()
+
+    def get_combates_page_by_user_id(self, user_id: int, after_id: int = 0, limit: int = 20) -> List[Tuple]:
+        self.cursor.execute('SELECT * FROM battles WHERE id_user = ? AND id > ? ORDER BY id LIMIT ?', (user_id, after_id, limit))
+        return self.cursor.fetchall()
+class DataBaseMemoria(DataBase):
+    # SQLite en memoria compartida entre los hilos del pool; no toca el disco
+    __contador = 0
+
+    def __init__(self) -> None:
+        DataBaseMemoria.__contador += 1
+        super().__init__(f'file:pokedex_memoria_{os.getpid()}_{DataBaseMemoria.__contador}?mode=memory&cache=shared')
+
+    def _crear_pool(self, ruta: str) -> PoolConexiones:
+        pool = PoolConexiones(ruta, uri=True)
+        # La base en memoria vive mientras quede una conexion abierta
+        self.__ancla = sqlite3.connect(ruta, uri=True, check_same_thread=False)
+        return pool
+
+    def close(self):
+        super().close()
+        self.__ancla.close()
+
+class _EstadoHiloMetricas:
+    # Contadores de un hilo: las envolturas y las conexiones escriben solo en los de su
+    # hilo, asi el camino caliente no toma candados. snapshot() suma todos los hilos.
+    __slots__ = ('commits', 'metodos')
+
+    def __init__(self) -> None:
+        self.commits = 0
+        # nombre -> [llamadas, errores, segundos, filas, commits, *buckets]
+        self.metodos: dict = {}
+
+class _HiloMetricas(threading.local):
+    # threading.local vuelve a llamar a __init__ en cada hilo nuevo
+    def __init__(self, nuevo_estado) -> None:
+        self.estado: _EstadoHiloMetricas = nuevo_estado()
+
+class MetricasDB:
+    # Instrumentacion de DataBase: por metodo cuenta llamadas, errores, filas devueltas,
+    # commits y un histograma de latencia. Se instala envolviendo los metodos publicos
+    # de una instancia, asi que sin instalar no cuesta nada.
+    # Una llamada mas lenta que `umbral_lento` queda en `lentas` y arma la captura del
+    # SQL de la siguiente llamada al mismo metodo, que guarda su EXPLAIN QUERY PLAN en
+    # `planes`. Trazar cada sentencia siempre costaria mas que la consulta mas barata.
+
+    # Limites superiores de los buckets del histograma, en segundos
+    LIMITES = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+    SIN_PLAN = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE', 'PRAGMA')
+    # Posiciones en la lista de contadores de cada metodo; los buckets van a continuacion
+    LLAMADAS, ERRORES, SEGUNDOS, FILAS, COMMITS, BUCKETS = range(6)
+
+    def __init__(self, umbral_lento: float = 0.025, max_lentas: int = 50) -> None:
+        self.umbral_lento = umbral_lento
+        self.lentas: deque = deque(maxlen=max_lentas)
+        # metodo -> [{'sql', 'plan'}] de la primera llamada capturada despues de una lenta
+        self.planes: dict = {}
+        self.__estados: List[_EstadoHiloMetricas] = []
+        self.__candado = threading.Lock()
+        self.__hilo = _HiloMetricas(self.__nuevo_estado)
+        self.__pool: PoolConexiones | None = None
+
+    def __nuevo_estado(self) -> _EstadoHiloMetricas:
+        estado = _EstadoHiloMetricas()
+        with self.__candado:
+            self.__estados.append(estado)
+        return estado
+
+    def instrumentar(self, db: DataBase) -> DataBase:
+        for nombre in dir(type(db)):
+            # Solo metodos: conexion y cursor son propiedades
+            if nombre.startswith('_') or nombre == 'close' or not callable(getattr(type(db), nombre)):
+                continue
+            setattr(db, nombre, self.__envolver(nombre, getattr(db, nombre)))
+        # Las conexiones se vuelven a abrir con la clase que cuenta commits
+        self.__pool = db.pool
+        db.pool.fabrica = self.__clase_conexion()
+        db.pool.cerrar()
+        db.metricas = self
+        return db
+
+    def __clase_conexion(self):
+        hilo = self.__hilo
+
+        class ConexionMedida(sqlite3.Connection):
+            # Cuenta los commits que confirman una transaccion abierta
+            def commit(self):
+                abierta = self.in_transaction
+                super().commit()
+                if abierta:
+                    hilo.estado.commits += 1
+
+            def __exit__(self, tipo, valor, traza):
+                confirma = tipo is None and self.in_transaction
+                resultado = super().__exit__(tipo, valor, traza)
+                if confirma:
+                    hilo.estado.commits += 1
+                return resultado
+
+        return ConexionMedida
+
+    def __envolver(self, nombre: str, metodo):
+        # Camino caliente: todo lo que usa la envoltura queda en variables locales
+        hilo = self.__hilo
+        limites = self.LIMITES
+        vacios = [0, 0, 0.0, 0, 0] + [0] * (len(limites) + 1)
+        reloj = time.perf_counter
+        medir_iterador = self.__medir_iterador
+        # [True] cuando la proxima llamada debe capturar su SQL
+        capturar = [False]
+
+        def envoltura(*args, **kwargs):
+            estado = hilo.estado
+            commits = estado.commits
+            sentencias = None
+            if capturar[0]:
+                capturar[0] = False
+                sentencias = self.__iniciar_captura()
+            inicio = reloj()
+            try:
+                resultado = metodo(*args, **kwargs)
+            except BaseException:
+                segundos = reloj() - inicio
+                datos = estado.metodos.get(nombre) or estado.metodos.setdefault(nombre, vacios[:])
+                datos[0] += 1
+                datos[1] += 1
+                datos[2] += segundos
+                datos[4] += estado.commits - commits
+                datos[5 + bisect_left(limites, segundos)] += 1
+                if sentencias is not None:
+                    self.__terminar_captura(nombre, sentencias)
+                raise
+            segundos = reloj() - inicio
+
+            tipo = type(resultado)
+            if tipo is list:
+                filas = len(resultado)
+            elif tipo is tuple:
+                filas = 1
+            elif resultado is None or tipo is threading.Thread:
+                filas = 0
+            elif tipo is GeneratorType:
+                return medir_iterador(nombre, resultado, segundos, capturar, sentencias)
+            else:
+                filas = 1
+            datos = estado.metodos.get(nombre) or estado.metodos.setdefault(nombre, vacios[:])
+            datos[0] += 1
+            datos[2] += segundos
+            datos[3] += filas
+            datos[4] += estado.commits - commits
+            datos[5 + bisect_left(limites, segundos)] += 1
+            if sentencias is not None:
+                self.__terminar_captura(nombre, sentencias)
+            elif segundos >= self.umbral_lento:
+                self.__lenta(nombre, segundos, capturar)
+            return resultado
+
+        return envoltura
+
+    def __medir_iterador(self, nombre: str, iterador, segundos: float, capturar: list, sentencias: List[str] | None):
+        # Los iter_* leen por lotes mientras se consumen: se mide solo el tiempo
+        # dentro del generador y se registra al agotarlo o cerrarlo
+        reloj = time.perf_counter
+        filas = 0
+        try:
+            while True:
+                inicio = reloj()
+                try:
+                    fila = next(iterador)
+                except StopIteration:
+                    break
+                finally:
+                    segundos += reloj() - inicio
+                filas += 1
+                yield fila
+        finally:
+            estado = self.__hilo.estado
+            datos = estado.metodos.get(nombre) or estado.metodos.setdefault(nombre, [0, 0, 0.0, 0, 0] + [0] * (len(self.LIMITES) + 1))
+            datos[self.LLAMADAS] += 1
+            datos[self.SEGUNDOS] += segundos
+            datos[self.FILAS] += filas
+            datos[self.BUCKETS + bisect_left(self.LIMITES, segundos)] += 1
+            if sentencias is not None:
+                self.__terminar_captura(nombre, sentencias)
+            elif segundos >= self.umbral_lento:
+                self.__lenta(nombre, segundos, capturar)
+
+    def __lenta(self, nombre: str, segundos: float, capturar: list):
+        self.lentas.append({'metodo': nombre, 'segundos': segundos})
+        if nombre not in self.planes:
+            capturar[0] = True
+
+    def __iniciar_captura(self) -> List[str]:
+        # Traza la conexion de este hilo mientras dura una llamada
+        sentencias: List[str] = []
+        if self.__pool is not None:
+            self.__pool.conexion().set_trace_callback(sentencias.append)
+        return sentencias
+
+    def __terminar_captura(self, nombre: str, sentencias: List[str]):
+        if self.__pool is None:
+            return
+        conexion = self.__pool.conexion()
+        conexion.set_trace_callback(None)
+        # executemany traza una sentencia por fila: las seguidas que empiezan igual se explican una vez
+        planes = []
+        anterior = None
+        for sql in sentencias:
+            if sql[:24] == anterior or sql.lstrip().upper().startswith(self.SIN_PLAN):
+                continue
+            anterior = sql[:24]
+            planes.append({'sql': sql, 'plan': self.__plan(conexion, sql)})
+        self.planes[nombre] = planes
+
+    def __plan(self, conexion: sqlite3.Connection, sql: str) -> List[str]:
+        # EXPLAIN QUERY PLAN no ejecuta la sentencia; el SQL trazado ya trae los valores
+        try:
+            return [fila[3] for fila in conexion.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()]
+        except sqlite3.Error as error:
+            return [f"Error: {error}"]
+
+    def snapshot(self) -> dict:
+        # Suma los contadores de todos los hilos; una llamada en curso puede quedar a medias
+        with self.__candado:
+            estados = list(self.__estados)
+        metodos: dict = {}
+        for estado in estados:
+            for nombre, datos in list(estado.metodos.items()):
+                total = metodos.get(nombre)
+                metodos[nombre] = list(datos) if total is None else [a + b for a, b in zip(total, datos)]
+        return {
+            'commits': sum(estado.commits for estado in estados),
+            'limites_buckets': list(self.LIMITES),
+            'metodos': {
+                nombre: {
+                    'llamadas': datos[self.LLAMADAS],
+                    'errores': datos[self.ERRORES],
+                    'segundos': datos[self.SEGUNDOS],
+                    'filas': datos[self.FILAS],
+                    'commits': datos[self.COMMITS],
+                    'buckets': datos[self.BUCKETS:],
+                }
+                for nombre, datos in sorted(metodos.items())
+            },
+            'lentas': list(self.lentas),
+            'planes': dict(self.planes),
+        }
+
+    def prometheus(self) -> str:
+        # Formato de texto de Prometheus (sirve para el textfile collector de node_exporter)
+        datos = self.snapshot()
+        lineas = [
+            '# HELP pokedex_db_commits_total Commits de SQLite en todas las conexiones.',
+            '# TYPE pokedex_db_commits_total counter',
+            f'pokedex_db_commits_total {datos["commits"]}',
+        ]
+        contadores = (
+            ('llamadas', 'Llamadas por metodo de DataBase.'),
+            ('errores', 'Llamadas que terminaron con excepcion.'),
+            ('filas', 'Filas devueltas por metodo.'),
+            ('commits', 'Commits hechos dentro de cada metodo.'),
+        )
+        for campo, ayuda in contadores:
+            lineas.append(f'# HELP pokedex_db_{campo}_total {ayuda}')
+            lineas.append(f'# TYPE pokedex_db_{campo}_total counter')
+            for nombre, metodo in sorted(datos['metodos'].items()):
+                lineas.append(f'pokedex_db_{campo}_total{{metodo="{nombre}"}} {metodo[campo]}')
+
+        lineas.append('# HELP pokedex_db_latencia_segundos Latencia por metodo de DataBase.')
+        lineas.append('# TYPE pokedex_db_latencia_segundos histogram')
+        for nombre, metodo in sorted(datos['metodos'].items()):
+            acumulado = 0
+            for limite, cantidad in zip(self.LIMITES + ('+Inf',), metodo['buckets']):
+                acumulado += cantidad
+                lineas.append(f'pokedex_db_latencia_segundos_bucket{{metodo="{nombre}",le="{limite}"}} {acumulado}')
+            lineas.append(f'pokedex_db_latencia_segundos_sum{{metodo="{nombre}"}} {metodo["segundos"]:.9f}')
+            lineas.append(f'pokedex_db_latencia_segundos_count{{metodo="{nombre}"}} {metodo["llamadas"]}')
+        return '\n'.join(lineas) + '\n'
+
+    def exportar(self, prefijo: str = 'metricas'):
+        # Escribe <prefijo>.prom y <prefijo>.json; cada archivo se reemplaza de forma atomica
+        for ruta, contenido in ((f'{prefijo}.prom', self.prometheus()), (f'{prefijo}.json', json.dumps(self.snapshot(), indent=2))):
+            temporal = f'{ruta}.tmp'
+            with open(temporal, 'w', encoding='utf-8') as archivo:
+                archivo.write(contenido)
+            os.replace(temporal, ruta)
+
+class DataBaseAsync:
+    # API asyncio sobre DataBase. Las lecturas corren en un pool de hilos (WAL
+    # permite lectores concurrentes) y las escrituras van a una cola con un solo
+    # hilo escritor, que junta lo pendiente y lo confirma en un unico commit.
+    def __init__(self, ruta: str = 'pokedex.db', lectores: int = 4, max_lote: int = 512) -> None:
+        self.db = DataBase(ruta)
+        self.max_lote = max_lote
+        # Commits realizados y escrituras confirmadas, para ver el tamaño medio de cada grupo
+        self.commits = 0
+        self.escrituras = 0
+        self.__lectores = ThreadPoolExecutor(max_workers=lectores, thread_name_prefix='pokedex-lector')
+        self.__cola: queue.Queue = queue.Queue()
+        self.__escritor = threading.Thread(target=self.__escribir, name='pokedex-escritor', daemon=True)
+        self.__escritor.start()
+
+    async def __leer(self, funcion, *argumentos):
+        return await asyncio.get_running_loop().run_in_executor(self.__lectores, funcion, *argumentos)
+
+    async def __encolar(self, operacion, preparar=None, confirmar=None):
+        # operacion(cursor) corre dentro de la transaccion del grupo; preparar() antes
+        # de abrirla y confirmar(resultado) despues del commit, en el hilo escritor
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        self.__cola.put((operacion, preparar, confirmar, loop, futuro))
+        return await futuro
+
+    def __escribir(self):
+        while True:
+            tarea = self.__cola.get()
+            if tarea is None:
+                break
+            lote = [tarea]
+            fin = False
+            while len(lote) < self.max_lote:
+                try:
+                    tarea = self.__cola.get_nowait()
+                except queue.Empty:
+                    break
+                if tarea is None:
+                    fin = True
+                    break
+                lote.append(tarea)
+            self.__aplicar_lote(lote)
+            if fin:
+                break
+
+    def __aplicar_lote(self, lote: List[Tuple]):
+        conexion = self.db.conexion
+        cursor = conexion.cursor()
+        resultados = []
+        for operacion, preparar, _, _, _ in lote:
+            try:
+                if preparar is not None:
+                    preparar()
+                resultados.append((True, None))
+            except Exception as error:
+                resultados.append((False, error))
+
+        # Cada escritura en su SAVEPOINT: si una falla, el resto del grupo se confirma igual
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for i, (operacion, _, _, _, _) in enumerate(lote):
+                if not resultados[i][0]:
+                    continue
+                cursor.execute("SAVEPOINT escritura")
+                try:
+                    resultados[i] = (True, operacion(cursor))
+                    cursor.execute("RELEASE escritura")
+                except Exception as error:
+                    cursor.execute("ROLLBACK TO escritura")
+                    cursor.execute("RELEASE escritura")
+                    resultados[i] = (False, error)
+            conexion.commit()
+            self.commits += 1
+        except Exception as error:
+            conexion.rollback()
+            resultados = [(False, error)] * len(lote)
+        finally:
+            cursor.close()
+
+        for (_, _, confirmar, loop, futuro), (correcto, valor) in zip(lote, resultados):
+            if correcto:
+                self.escrituras += 1
+                if confirmar is not None:
+                    confirmar(valor)
+            try:
+                loop.call_soon_threadsafe(self.__resolver, futuro, correcto, valor)
+            except RuntimeError:
+                # El event loop ya se cerro
+                pass
 
     @staticmethod
-    def pause():
+    def __resolver(futuro: asyncio.Future, correcto: bool, valor):
+        if futuro.done():
+            return
+        if correcto:
+            futuro.set_result(valor)
+        else:
+            futuro.set_exception(valor)
+
+    async def get_all_users(self) -> List[Tuple]:
+        return await self.__leer(self.db.get_all_users)
+
+    async def get_user_by_id(self, id: int) -> Tuple:
+        return await self.__leer(self.db.get_user_by_id, id)
+
+    async def get_user_by_name(self, name: str) -> Tuple:
+        return await self.__leer(self.db.get_user_by_name, name)
+
+    async def get_pokemon_by_id(self, id_pokemon: int) -> Tuple:
+        return await self.__leer(self.db.get_pokemon_by_id, id_pokemon)
+
+    async def get_all_pokemons_by_user_id(self, id_user: int) -> List[Tuple]:
+        return await self.__leer(self.db.get_all_pokemons_by_user_id, id_user)
+
+    async def get_pokemons_page_by_user_id(self, id_user: int, after_id: int = 0, limit: int = 20) -> List[Tuple]:
+        return await self.__leer(self.db.get_pokemons_page_by_user_id, id_user, after_id, limit)
+
+    async def get_all_combates_by_user_id(self, user_id: int) -> List[Tuple]:
+        return await self.__leer(self.db.get_all_combates_by_user_id, user_id)
+
+    async def get_combates_page_by_user_id(self, user_id: int, after_id: int = 0, limit: int = 20) -> List[Tuple]:
+        return await self.__leer(self.db.get_combates_page_by_user_id, user_id, after_id, limit)
+
+    async def get_users_page(self, after_id: int = 0, limit: int = 20) -> List[Tuple]:
+        return await self.__leer(self.db.get_users_page, after_id, limit)
+
+    async def post_new_user(self, user: str) -> Tuple | None:
+        return await self.__encolar(lambda cursor: self.db._insertar_usuario(cursor, user))
+
+    async def put_user_update_by_id(self, user_id) -> Tuple | None:
+        return await self.__encolar(lambda cursor: self.db._actualizar_usuario(cursor, user_id))
+
+    async def post_pokemon_by_id_user(self, id_user: int, pokemon: Agua | Electrico | Fuego | Hierba):
+        nuevos_ids = await self.save_pokemons_by_id_user(id_user, [pokemon])
+        return nuevos_ids[0] if nuevos_ids else None
+
+    async def post_new_user_with_pokemon(self, user: str, pokemon: Agua | Electrico | Fuego | Hierba) -> Tuple | None:
+        # Usuario y pokemon inicial en una sola escritura (un solo SAVEPOINT del grupo):
+        # se confirman o se descartan juntos
+        def operacion(cursor: sqlite3.Cursor):
+            usuario = self.db._insertar_usuario(cursor, user)
+            return usuario, self.db._guardar_pokemons(cursor, usuario[0], [pokemon])
+
+        usuario, _ = await self.__encolar(
+            operacion,
+            preparar=lambda: self.db._preparar_especies([pokemon]),
+            confirmar=lambda resultado: self.db._confirmar_pokemons([pokemon], resultado[1])
+        )
+        return usuario
+
+    async def put_pokemon_by_id(self, pokemon: Agua | Electrico | Fuego | Hierba):
+        if pokemon.pokemon_id is None:
+            print("Error: El pokémon no tiene un ID válido para actualizar")
+            return
+        await self.__encolar(
+            lambda cursor: self.db._actualizar_pokemon(cursor, pokemon),
+            preparar=lambda: self.db._id_especie(pokemon.evoluciones_nombres),
+            confirmar=lambda _: pokemon.limpiar_cambios()
+        )
+
+    async def save_pokemons_by_id_user(self, id_user: int, pokemons: List[Agua | Electrico | Fuego | Hierba]) -> List[int]:
+        pokemons = list(pokemons)
+        return await self.__encolar(
+            lambda cursor: self.db._guardar_pokemons(cursor, id_user, pokemons),
+            preparar=lambda: self.db._preparar_especies(pokemons),
+            confirmar=lambda nuevos_ids: self.db._confirmar_pokemons(pokemons, nuevos_ids)
+        )
+
+    async def post_combate(self, user_id: int, ruta: str) -> Tuple | None:
+        return await self.__encolar(lambda cursor: self.db._insertar_combate(cursor, user_id, ruta))
+
+    async def delete_users_by_ids(self, ids_users: List[int]) -> threading.Thread | None:
+        rutas = await self.__encolar(lambda cursor: self.db._borrar_usuarios(cursor, ids_users))
+        return Almacenamiento._limpiar_combates(rutas)
+
+    async def delete_user_by_id(self, id_user: int) -> threading.Thread | None:
+        return await self.delete_users_by_ids([id_user])
+
+    async def close(self):
+        # Espera a que el escritor vacie la cola antes de cerrar las conexiones
+        self.__cola.put(None)
+        await asyncio.get_running_loop().run_in_executor(None, self.__escritor.join)
+        self.__lectores.shutdown(wait=True)
+        self.db.close()
+
+class AlmacenamientoMemoria(Almacenamiento):
+    # Backend en diccionarios de Python, con las mismas tuplas que devuelve SQLite
+    def __init__(self) -> None:
+        self.users: dict = {}
+        self.pokemons: dict = {}
+        self.user_pokemons: dict = {}
+        self.battles: dict = {}
+        # Linea evolutiva -> (id, name, evolution_names) como la tabla species
+        self.species: dict = {}
+        self.__ids = {'users': 0, 'pokemons': 0, 'battles': 0, 'species': 0}
+        self.__candado = threading.RLock()
+
+    @staticmethod
+    def __ahora() -> str:
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    def __siguiente_id(self, tabla: str) -> int:
+        self.__ids[tabla] += 1
+        return self.__ids[tabla]
+
+    def __especie(self, evoluciones_nombres: List[str]) -> Tuple:
+        linea = tuple(evoluciones_nombres)
+        especie = self.species.get(linea)
+        if especie is None:
+            with self.__candado:
+                species_id = self.__siguiente_id('species')
+                especie = self.species[linea] = (species_id, linea[0] if linea else "", json.dumps(list(linea)))
+        return especie
+
+    def __fila_pokemon(self, pokemon_id: int, pokemon: Agua | Electrico | Fuego | Hierba) -> Tuple:
+        return (
+            pokemon_id,
+            pokemon.nombre,
+            pokemon.descripcion,
+            pokemon.evolucion,
+            pokemon.tipo,
+            pokemon.ataque,
+            pokemon.defensa,
+            pokemon.vida,
+            pokemon.nivel,
+            self.__especie(pokemon.evoluciones_nombres)[2]
+        )
+
+    def get_all_users(self) -> List[Tuple]:
+        return list(self.users.values())
+
+    def post_new_user(self, user: str) -> Tuple | None:
+        with self.__candado:
+            if self.get_user_by_name(user) is not None:
+                raise sqlite3.IntegrityError('UNIQUE constraint failed: users.user')
+            user_id = self.__siguiente_id('users')
+            self.users[user_id] = (user_id, user, self.__ahora())
+            self.user_pokemons[user_id] = []
+        return self.users[user_id]
+
+    def get_user_by_id(self, id: int) -> Tuple:
+        return self.users.get(id)
+
+    def get_user_by_name(self, name: str) -> Tuple:
+        for usuario in self.users.values():
+            if usuario[1] == name:
+                return usuario
+        return None
+
+    def post_pokemon_by_id_user(self, id_user: int, pokemon: Agua | Electrico | Fuego | Hierba):
+        with self.__candado:
+            pokemon_id = self.__siguiente_id('pokemons')
+            self.pokemons[pokemon_id] = self.__fila_pokemon(pokemon_id, pokemon)
+            self.user_pokemons.setdefault(id_user, []).append(pokemon_id)
+        pokemon.pokemon_id = pokemon_id
+        pokemon.limpiar_cambios()
+        return pokemon_id
+
+    def get_pokemon_by_id(self, id_pokemon: int) -> Tuple:
+        return self.pokemons.get(id_pokemon)
+
+    def get_all_pokemons_by_user_id(self, id_user: int) -> List[Tuple]:
+        return [self.pokemons[i] for i in self.user_pokemons.get(id_user, []) if i in self.pokemons]
+
+    def delete_users_by_ids(self, ids_users: List[int]) -> threading.Thread | None:
+        rutas = []
+        with self.__candado:
+            for id_user in ids_users:
+                for pokemon_id in self.user_pokemons.pop(id_user, []):
+                    self.pokemons.pop(pokemon_id, None)
+                for battle_id in [b[0] for b in self.battles.values() if b[1] == id_user]:
+                    rutas.append(self.battles.pop(battle_id)[2])
+                self.users.pop(id_user, None)
+        return self._limpiar_combates(rutas)
+
+    def put_pokemon_by_id(self, pokemon: Agua | Electrico | Fuego | Hierba):
+        if pokemon.pokemon_id is None:
+            print("Error: El pokémon no tiene un ID válido para actualizar")
+            return
+        if pokemon.pokemon_id in self.pokemons:
+            self.pokemons[pokemon.pokemon_id] = self.__fila_pokemon(pokemon.pokemon_id, pokemon)
+        pokemon.limpiar_cambios()
+
+    def save_pokemons_by_id_user(self, id_user: int, pokemons: List[Agua | Electrico | Fuego | Hierba]) -> List[int]:
+        nuevos_ids = []
+        with self.__candado:
+            for pokemon in pokemons:
+                if pokemon.pokemon_id is None:
+                    nuevos_ids.append(self.post_pokemon_by_id_user(id_user, pokemon))
+                elif pokemon.cambios:
+                    self.put_pokemon_by_id(pokemon)
+        return nuevos_ids
+
+    def put_user_update_by_id(self, user_id) -> Tuple | None:
+        usuario = self.users.get(user_id)
+        if usuario is not None:
+            usuario = self.users[user_id] = (usuario[0], usuario[1], self.__ahora())
+        return usuario
+
+    def post_combate(self, user_id: int, ruta: str) -> Tuple | None:
+        with self.__candado:
+            battle_id = self.__siguiente_id('battles')
+            self.battles[battle_id] = (battle_id, user_id, ruta, self.__ahora())
+        return self.battles[battle_id]
+
+    def get_all_combates_by_user_id(self, user_id: int) -> List[Tuple]:
+        return [b for b in self.battles.values() if b[1] == user_id]
+
+    def get_all_species(self) -> List[Tuple]:
+        return sorted(self.species.values())
+
+    def get_all_pokemons_by_species_id(self, id_species: int) -> List[Tuple]:
+        evolution_names = next((e[2] for e in self.species.values() if e[0] == id_species), None)
+        return [p for p in self.pokemons.values() if p[9] == evolution_names]
+
+class CacheLRU:
+    # Diccionario acotado: al pasar de `capacidad` entradas se descarta la menos usada
+    AUSENTE = object()
+
+    def __init__(self, capacidad: int = 1024):
+        self.capacidad = capacidad
+        self.aciertos = 0
+        self.fallos = 0
+        self.__datos: OrderedDict = OrderedDict()
+        self.__candado = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.__datos)
+
+    def __contains__(self, clave) -> bool:
+        return clave in self.__datos
+
+    def obtener(self, clave, cargar=None):
+        # Devuelve el valor en cache o lo carga con `cargar()`; None tambien se guarda.
+        # Sin `cargar` un fallo devuelve AUSENTE.
+        with self.__candado:
+            valor = self.__datos.get(clave, CacheLRU.AUSENTE)
+            if valor is not CacheLRU.AUSENTE:
+                self.__datos.move_to_end(clave)
+                self.aciertos += 1
+                return valor
+            self.fallos += 1
+        if cargar is None:
+            return CacheLRU.AUSENTE
+        valor = cargar()
+        self.poner(clave, valor)
+        return valor
+
+    def buscar(self, clave):
+        # Consulta sin contar acierto ni fallo, para las escrituras
+        return self.__datos.get(clave, CacheLRU.AUSENTE)
+
+    def poner(self, clave, valor):
+        with self.__candado:
+            self.__datos[clave] = valor
+            self.__datos.move_to_end(clave)
+            if len(self.__datos) > self.capacidad:
+                self.__datos.popitem(last=False)
+
+    def quitar(self, clave):
+        with self.__candado:
+            self.__datos.pop(clave, None)
+
+    def limpiar(self):
+        with self.__candado:
+            self.__datos.clear()
+
+    def items(self) -> List[Tuple]:
+        # Copia de las entradas, sin tocar el orden LRU
+        with self.__candado:
+            return list(self.__datos.items())
+
+class AlmacenamientoCache(Almacenamiento):
+    # Cache LRU delante de otro backend. Las escrituras pasan al backend y
+    # actualizan la cache con la fila resultante (write-through), asi que
+    # navegar por los menus no repite consultas identicas.
+    def __init__(self, base: Almacenamiento, capacidad: int = 1024, max_filas: int = 10_000) -> None:
+        self.base = base
+        # Las listas por usuario con mas de max_filas filas no se guardan
+        self.max_filas = max_filas
+        self.usuarios = CacheLRU(capacidad)
+        self.nombres = CacheLRU(capacidad)
+        self.listados = CacheLRU(capacidad)
+        self.pokemons = CacheLRU(capacidad)
+        self.pokemons_usuario = CacheLRU(capacidad)
+        self.combates_usuario = CacheLRU(capacidad)
+        self.__especies: dict = {}
+        # pokemon_id -> id_user de cada fila que entra en una lista de pokemons_usuario,
+        # para invalidar solo lo afectado. Se reconstruye al pasar de __limite_dueños.
+        self.__dueños: dict = {}
+        self.__limite_dueños = 100_000
+
+    def estadisticas(self) -> dict:
+        # Aciertos y fallos por cache
+        return {
+            nombre: {'aciertos': cache.aciertos, 'fallos': cache.fallos, 'entradas': len(cache)}
+            for nombre, cache in (
+                ('usuarios', self.usuarios),
+                ('nombres', self.nombres),
+                ('listados', self.listados),
+                ('pokemons', self.pokemons),
+                ('pokemons_usuario', self.pokemons_usuario),
+                ('combates_usuario', self.combates_usuario),
+            )
+        }
+
+    def invalidar(self):
+        for cache in (self.usuarios, self.nombres, self.listados, self.pokemons, self.pokemons_usuario, self.combates_usuario):
+            cache.limpiar()
+        self.__dueños.clear()
+
+    def __registrar_dueños(self, id_user: int, filas: List[Tuple]):
+        dueños = self.__dueños
+        for fila in filas:
+            dueños[fila[0]] = id_user
+        if len(dueños) > self.__limite_dueños:
+            # Las listas que salieron de la LRU dejan entradas viejas; solo quedan las vigentes
+            self.__dueños = {
+                fila[0]: id_usuario
+                for id_usuario, lista in self.pokemons_usuario.items() for fila in lista
+            }
+            self.__limite_dueños = max(100_000, 2 * len(self.__dueños))
+
+    def __fila_pokemon(self, pokemon: Agua | Electrico | Fuego | Hierba) -> Tuple:
+        linea = tuple(pokemon.evoluciones_nombres)
+        evolution_names = self.__especies.get(linea)
+        if evolution_names is None:
+            evolution_names = self.__especies[linea] = json.dumps(list(linea))
+        return (
+            pokemon.pokemon_id,
+            pokemon.nombre,
+            pokemon.descripcion,
+            pokemon.evolucion,
+            pokemon.tipo,
+            pokemon.ataque,
+            pokemon.defensa,
+            pokemon.vida,
+            pokemon.nivel,
+            evolution_names
+        )
+
+    def __guardar_usuario(self, usuario: Tuple | None):
+        if usuario is None:
+            return
+        self.usuarios.poner(usuario[0], usuario)
+        self.nombres.poner(usuario[1], usuario)
+        # Los listados muestran la fecha de actualizacion
+        self.listados.limpiar()
+
+    def __guardar_pokemons(self, id_user: int, pokemons: List[Agua | Electrico | Fuego | Hierba], nuevos_ids: List[int]):
+        filas = [self.__fila_pokemon(p) for p in pokemons]
+        for fila in filas:
+            self.pokemons.poner(fila[0], fila)
+
+        lista = self.pokemons_usuario.buscar(id_user)
+        if lista is CacheLRU.AUSENTE:
+            return
+        nuevos = set(nuevos_ids)
+        actualizadas = {fila[0]: fila for fila in filas if fila[0] not in nuevos}
+        lista = [actualizadas.get(fila[0], fila) for fila in lista]
+        # Los ids nuevos son mayores que los existentes, el orden por id se mantiene
+        lista.extend(fila for fila in filas if fila[0] in nuevos)
+        if len(lista) > self.max_filas:
+            self.pokemons_usuario.quitar(id_user)
+        else:
+            self.pokemons_usuario.poner(id_user, lista)
+            self.__registrar_dueños(id_user, filas)
+
+    def get_all_users(self) -> List[Tuple]:
+        return list(self.listados.obtener(('todos',), self.base.get_all_users))
+
+    def post_new_user(self, user: str) -> Tuple | None:
+        usuario = self.base.post_new_user(user)
+        self.__guardar_usuario(usuario)
+        if usuario is not None:
+            self.pokemons_usuario.poner(usuario[0], [])
+            self.combates_usuario.poner(usuario[0], [])
+        return usuario
+
+    def get_user_by_id(self, id: int) -> Tuple:
+        return self.usuarios.obtener(id, lambda: self.base.get_user_by_id(id))
+
+    def get_user_by_name(self, name: str) -> Tuple:
+        return self.nombres.obtener(name, lambda: self.base.get_user_by_name(name))
+
+    def post_pokemon_by_id_user(self, id_user: int, pokemon: Agua | Electrico | Fuego | Hierba):
+        pokemon_id = self.base.post_pokemon_by_id_user(id_user, pokemon)
+        if pokemon_id is not None:
+            self.__guardar_pokemons(id_user, [pokemon], [pokemon_id])
+        return pokemon_id
+
+    def get_pokemon_by_id(self, id_pokemon: int) -> Tuple:
+        return self.pokemons.obtener(id_pokemon, lambda: self.base.get_pokemon_by_id(id_pokemon))
+
+    def get_all_pokemons_by_user_id(self, id_user: int) -> List[Tuple]:
+        return list(self.iter_pokemons_by_user_id(id_user))
+
+    def delete_users_by_ids(self, ids_users: List[int]) -> threading.Thread | None:
+        ids_users = list(ids_users)
+        limpieza = self.base.delete_users_by_ids(ids_users)
+        borrados = set(ids_users)
+        for id_user in ids_users:
+            self.usuarios.quitar(id_user)
+            lista = self.pokemons_usuario.buscar(id_user)
+            if lista is not CacheLRU.AUSENTE:
+                for fila in lista:
+                    self.pokemons.quitar(fila[0])
+                    self.__dueños.pop(fila[0], None)
+            self.pokemons_usuario.quitar(id_user)
+            self.combates_usuario.quitar(id_user)
+        # Por nombre se quitan solo las entradas de los usuarios borrados
+        for nombre, usuario in self.nombres.items():
+            if usuario is not None and usuario[0] in borrados:
+                self.nombres.quitar(nombre)
+        # Pokemons sueltos (de get_pokemon_by_id): se quitan los de los borrados y los de
+        # dueño desconocido
+        for pokemon_id, _ in self.pokemons.items():
+            dueño = self.__dueños.get(pokemon_id)
+            if dueño is None or dueño in borrados:
+                self.pokemons.quitar(pokemon_id)
+                self.__dueños.pop(pokemon_id, None)
+        self.listados.limpiar()
+        return limpieza
+
+    def put_pokemon_by_id(self, pokemon: Agua | Electrico | Fuego | Hierba):
+        self.base.put_pokemon_by_id(pokemon)
+        if pokemon.pokemon_id is None:
+            return
+        fila = self.__fila_pokemon(pokemon)
+        self.pokemons.poner(pokemon.pokemon_id, fila)
+        # Si no tiene dueño registrado no esta en ninguna lista cacheada
+        id_user = self.__dueños.get(pokemon.pokemon_id)
+        if id_user is None:
+            return
+        lista = self.pokemons_usuario.buscar(id_user)
+        if lista is not CacheLRU.AUSENTE:
+            self.pokemons_usuario.poner(id_user, [fila if f[0] == fila[0] else f for f in lista])
+
+    def save_pokemons_by_id_user(self, id_user: int, pokemons: List[Agua | Electrico | Fuego | Hierba]) -> List[int]:
+        nuevos_ids = self.base.save_pokemons_by_id_user(id_user, pokemons)
+        self.__guardar_pokemons(id_user, pokemons, nuevos_ids)
+        return nuevos_ids
+
+    def put_user_update_by_id(self, user_id) -> Tuple | None:
+        usuario = self.base.put_user_update_by_id(user_id)
+        self.__guardar_usuario(usuario)
+        return usuario
+
+    def post_combate(self, user_id: int, ruta: str) -> Tuple | None:
+        combate = self.base.post_combate(user_id, ruta)
+        lista = self.combates_usuario.buscar(user_id)
+        if combate is not None and lista is not CacheLRU.AUSENTE:
+            self.combates_usuario.poner(user_id, lista + [combate])
+        return combate
+
+    def get_all_combates_by_user_id(self, user_id: int) -> List[Tuple]:
+        lista = self.combates_usuario.obtener(user_id)
+        if lista is CacheLRU.AUSENTE:
+            lista = self.base.get_all_combates_by_user_id(user_id)
+            if len(lista) <= self.max_filas:
+                self.combates_usuario.poner(user_id, lista)
+        return list(lista)
+
+    def get_all_species(self) -> List[Tuple]:
+        return self.base.get_all_species()
+
+    def get_all_pokemons_by_species_id(self, id_species: int) -> List[Tuple]:
+        return self.base.get_all_pokemons_by_species_id(id_species)
+
+    def iter_all_users(self, tamaño_lote: int = 500):
+        # Fallo: se recorre por lotes el backend sin cargar la tabla entera
+        lista = self.listados.obtener(('todos',))
+        if lista is CacheLRU.AUSENTE:
+            return self.base.iter_all_users(tamaño_lote)
+        return iter(lista)
+
+    def iter_pokemons_by_user_id(self, id_user: int, tamaño_lote: int = 500):
+        lista = self.pokemons_usuario.obtener(id_user)
+        if lista is not CacheLRU.AUSENTE:
+            yield from lista
+            return
+        # Fallo: se lee por lotes del backend y la lista solo se guarda si se
+        # consumio completa y no supera max_filas
+        filas = []
+        for fila in self.base.iter_pokemons_by_user_id(id_user, tamaño_lote):
+            if filas is not None:
+                filas.append(fila)
+                if len(filas) > self.max_filas:
+                    filas = None
+            yield fila
+        if filas is not None:
+            self.pokemons_usuario.poner(id_user, filas)
+            self.__registrar_dueños(id_user, filas)
+            for fila in filas:
+                self.pokemons.poner(fila[0], fila)
+
+    def iter_combates_by_user_id(self, user_id: int, tamaño_lote: int = 500):
+        lista = self.combates_usuario.obtener(user_id)
+        if lista is CacheLRU.AUSENTE:
+            return self.base.iter_combates_by_user_id(user_id, tamaño_lote)
+        return iter(lista)
+
+    def get_users_page(self, after_id: int = 0, limit: int = 20) -> List[Tuple]:
+        return list(self.listados.obtener(('pagina', after_id, limit), lambda: self.base.get_users_page(after_id, limit)))
+
+    def get_pokemons_page_by_user_id(self, id_user: int, after_id: int = 0, limit: int = 20) -> List[Tuple]:
+        lista = self.pokemons_usuario.obtener(id_user)
+        if lista is CacheLRU.AUSENTE:
+            return self.base.get_pokemons_page_by_user_id(id_user, after_id, limit)
+        return [fila for fila in lista if fila[0] > after_id][:limit]
+
+    def get_combates_page_by_user_id(self, user_id: int, after_id: int = 0, limit: int = 20) -> List[Tuple]:
+        lista = self.combates_usuario.obtener(user_id)
+        if lista is CacheLRU.AUSENTE:
+            return self.base.get_combates_page_by_user_id(user_id, after_id, limit)
+        return [fila for fila in lista if fila[0] > after_id][:limit]
+
+    def close(self):
+        self.base.close()
+
+def crear_almacenamiento(backend: str | None = None, ruta: str | None = None) -> Almacenamiento:
+    # Backend por configuracion: POKEDEX_BACKEND = sqlite | sqlite-memoria | memoria
+    # y POKEDEX_DB con la ruta del archivo para el backend sqlite
+    backend = backend or os.environ.get('POKEDEX_BACKEND', 'sqlite')
+    ruta = ruta or os.environ.get('POKEDEX_DB', 'pokedex.db')
+    if backend == 'sqlite':
+        almacenamiento = DataBase(ruta)
+    elif backend == 'sqlite-memoria':
+        almacenamiento = DataBaseMemoria()
+    elif backend == 'memoria':
+        almacenamiento = AlmacenamientoMemoria()
+    else:
+        raise ValueError(f"Backend de almacenamiento desconocido: {backend}")
+    # POKEDEX_METRICAS: prefijo de los archivos .prom y .json que se escriben al salir;
+    # POKEDEX_METRICAS_LENTA_MS: desde cuantos ms una llamada guarda su EXPLAIN QUERY PLAN
+    prefijo_metricas = os.environ.get('POKEDEX_METRICAS')
+    if prefijo_metricas and isinstance(almacenamiento, DataBase):
+        metricas = MetricasDB(float(os.environ.get('POKEDEX_METRICAS_LENTA_MS', '25')) / 1000)
+        metricas.instrumentar(almacenamiento)
+        atexit.register(metricas.exportar, prefijo_metricas)
+    # POKEDEX_CACHE: entradas por cache LRU, 0 la desactiva
+    capacidad = int(os.environ.get('POKEDEX_CACHE', '1024'))
+    if capacidad <= 0:
+        return almacenamiento
+    return AlmacenamientoCache(almacenamiento, capacidad)
+
+class Renderizador:
+    # Limpia la pantalla con secuencias ANSI en lugar de lanzar `clear` en un proceso.
+    # Con la salida en bloques cada pantalla sale en una sola escritura: input() vacia
+    # el buffer antes de leer. Sin TTY no se limpia y en modo no interactivo
+    # (POKEDEX_INTERACTIVO=0) las pausas no esperan.
+    LIMPIAR = "\x1b[H\x1b[2J\x1b[3J"
+
+    def __init__(self, salida=None, tty: bool | None = None, interactivo: bool | None = None):
+        self.salida = salida
+        if tty is None:
+            flujo = salida or sys.stdout
+            tty = (os.environ.get('POKEDEX_TTY', '1') != '0' and os.environ.get('TERM') != 'dumb'
+                   and hasattr(flujo, 'isatty') and flujo.isatty())
+        if interactivo is None:
+            interactivo = os.environ.get('POKEDEX_INTERACTIVO', '1') != '0'
+        self.tty = tty
+        self.interactivo = interactivo
+        self.limpiezas = 0
+        self.pausas = 0
+
+    def instalar(self):
+        # Pasa stdout de linea a bloques; se llama al arrancar App, no al importar
+        if self.tty and self.salida is None and hasattr(sys.stdout, 'reconfigure'):
+            sys.stdout.reconfigure(line_buffering=False)
+            if os.name == 'nt':
+                # Activa el procesamiento de secuencias ANSI en la consola de Windows
+                os.system('')
+
+    def limpiar(self):
+        self.limpiezas += 1
+        if self.tty:
+            (self.salida or sys.stdout).write(self.LIMPIAR)
+
+    def pausar(self):
+        self.pausas += 1
+        if not self.interactivo:
+            return
         try:
             input("\nPresiona Enter para continuar..")
         except Exception:
             pass
 
+    def vaciar(self):
+        (self.salida or sys.stdout).flush()
+
+class Trazador:
+    # Spans anidados con tiempo de pared y de CPU del hilo, exportables como JSON de
+    # trace events de Chrome (chrome://tracing o Perfetto). Con POKEDEX_TRAZA=<ruta.json>
+    # se activa y escribe la traza al salir; apagado, span() devuelve un contexto vacio.
+    # Los spans de menu incluyen la espera de input(): la diferencia la da cpu_ms.
+    SPAN_NULO = contextlib.nullcontext()
+
+    def __init__(self, ruta: str | None = None, max_eventos: int = 1_000_000):
+        self.ruta = ruta if ruta is not None else os.environ.get('POKEDEX_TRAZA')
+        self.activo = bool(self.ruta)
+        self.max_eventos = max_eventos
+        self.eventos: List[dict] = []
+        self.descartados = 0
+        self.origen = time.perf_counter()
+        self.__candado = threading.Lock()
+
+    def instalar(self):
+        if self.activo:
+            atexit.register(self.exportar)
+
+    def iniciar(self, nombre: str, **args):
+        # Para spans que abren y cierran callbacks distintos; devuelve el token para terminar()
+        if not self.activo:
+            return None
+        return (nombre, args, time.perf_counter(), time.thread_time())
+
+    def terminar(self, token):
+        if token is None:
+            return
+        fin = time.perf_counter()
+        cpu = time.thread_time()
+        nombre, args, inicio, cpu_inicio = token
+        args['cpu_ms'] = round((cpu - cpu_inicio) * 1000, 3)
+        evento = {
+            'name': nombre,
+            'cat': nombre.split('.', 1)[0],
+            'ph': 'X',
+            'ts': round((inicio - self.origen) * 1e6, 1),
+            'dur': round((fin - inicio) * 1e6, 1),
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': args,
+        }
+        with self.__candado:
+            if len(self.eventos) < self.max_eventos:
+                self.eventos.append(evento)
+            else:
+                self.descartados += 1
+
+    def span(self, nombre: str, **args):
+        if not self.activo:
+            return self.SPAN_NULO
+        return self.__span(nombre, args)
+
+    @contextlib.contextmanager
+    def __span(self, nombre: str, args: dict):
+        token = self.iniciar(nombre, **args)
+        try:
+            yield
+        finally:
+            self.terminar(token)
+
+    def exportar(self, ruta: str | None = None):
+        ruta = ruta or self.ruta
+        with self.__candado:
+            eventos = list(self.eventos)
+        traza = {
+            'traceEvents': eventos,
+            'displayTimeUnit': 'ms',
+            'otherData': {'descartados': self.descartados},
+        }
+        temporal = f'{ruta}.tmp'
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(traza, archivo)
+        os.replace(temporal, ruta)
+
+class PerfiladorMuestreo:
+    # Perfilador por muestreo: un hilo mira la pila de otro cada `intervalo` segundos y
+    # cuenta las pilas en formato colapsado ("a;b;c cuenta") para flamegraph.pl o
+    # speedscope. Con solo_cpu (Linux) descarta las muestras en las que el hilo no gasto
+    # CPU, asi la espera de input() no tapa el resto. POKEDEX_PERFIL=<ruta> lo activa.
+    def __init__(self, intervalo: float = 0.005, hilo: int | None = None, solo_cpu: bool = True):
+        self.intervalo = intervalo
+        self.hilo = hilo if hilo is not None else threading.main_thread().ident
+        self.solo_cpu = solo_cpu and hasattr(time, 'pthread_getcpuclockid')
+        self.pilas: Counter = Counter()
+        self.muestras = 0
+        self.__etiquetas: dict = {}
+        self.__detener = threading.Event()
+        self.__muestreador: threading.Thread | None = None
+
+    def iniciar(self):
+        self.__muestreador = threading.Thread(target=self.__muestrear, name='perfilador', daemon=True)
+        self.__muestreador.start()
+
+    def detener(self):
+        self.__detener.set()
+        if self.__muestreador is not None:
+            self.__muestreador.join()
+
+    def __etiqueta(self, codigo) -> str:
+        etiqueta = self.__etiquetas.get(codigo)
+        if etiqueta is None:
+            etiqueta = self.__etiquetas[codigo] = f"{os.path.basename(codigo.co_filename)}:{codigo.co_qualname}"
+        return etiqueta
+
+    def __muestrear(self):
+        reloj_cpu = time.pthread_getcpuclockid(self.hilo) if self.solo_cpu else None
+        cpu_anterior = time.clock_gettime(reloj_cpu) if reloj_cpu is not None else 0.0
+        while not self.__detener.wait(self.intervalo):
+            if reloj_cpu is not None:
+                cpu = time.clock_gettime(reloj_cpu)
+                if cpu == cpu_anterior:
+                    continue
+                cpu_anterior = cpu
+            marco = sys._current_frames().get(self.hilo)
+            if marco is None:
+                continue
+            pila = []
+            while marco is not None:
+                pila.append(self.__etiqueta(marco.f_code))
+                marco = marco.f_back
+            pila.reverse()
+            self.pilas[';'.join(pila)] += 1
+            self.muestras += 1
+
+    def exportar(self, ruta: str):
+        self.detener()
+        temporal = f'{ruta}.tmp'
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            for pila, cuenta in self.pilas.most_common():
+                archivo.write(f"{pila} {cuenta}\n")
+        os.replace(temporal, ruta)
+
+    @staticmethod
+    def desde_entorno() -> PerfiladorMuestreo | None:
+        # POKEDEX_PERFIL=<ruta> y POKEDEX_PERFIL_MS con el intervalo (5 por defecto);
+        # arranca en el hilo que llama y escribe el archivo al salir
+        ruta = os.environ.get('POKEDEX_PERFIL')
+        if not ruta:
+            return None
+        perfilador = PerfiladorMuestreo(float(os.environ.get('POKEDEX_PERFIL_MS', '5')) / 1000, threading.get_ident())
+        perfilador.iniciar()
+        atexit.register(perfilador.exportar, ruta)
+        return perfilador
+
+class Utils:
+    renderizador = Renderizador()
+    trazador = Trazador()
+
+    @staticmethod 
+    def clear():
+        Utils.renderizador.limpiar()
+
+    @staticmethod
+    def pause():
+        Utils.renderizador.pausar()
+
     @staticmethod
     def print_title(t: str):
         print("=" * 60 )
@@ -220,6 +1788,13 @@ class Utils:
 
 
 class PokemonBase(ABC):
+    __slots__ = ('pokemon_id', 'nombre', 'descripcion', 'ataque', 'defensa', 'vida', 'nivel', 'evolucion', 'atrapado', 'cambios')
+
+    # Campos que se guardan en la base; `cambios` es una mascara de bits con los
+    # modificados desde la ultima carga o guardado
+    CAMPOS_PERSISTIDOS = ('nombre', 'descripcion', 'evolucion', 'ataque', 'defensa', 'vida', 'nivel', 'evoluciones_nombres')
+    BITS_CAMPOS = {campo: 1 << i for i, campo in enumerate(CAMPOS_PERSISTIDOS)}
+
     def __init__(self,
         nombre: str = "Sin Pokemon",
         descripcion: str = "No descripcin",
@@ -233,7 +1808,7 @@ class PokemonBase(ABC):
         ):
 
         self.pokemon_id = pokemon_id
-        self.nombre: str = nombre
+        self.nombre: str = sys.intern(nombre) if isinstance(nombre, str) else nombre
         self.descripcion: str = descripcion
         self.ataque: int = max(0, int(ataque))
         self.defensa: int = max(0, int(defensa))
@@ -243,6 +1818,17 @@ class PokemonBase(ABC):
         if self.evolucion > 3:
             self.evolucion = 3
         self.atrapado: bool =  bool (atrapado)
+        self.cambios: int = 0
+
+    def marcar(self, *campos: str):
+        for campo in campos:
+            self.cambios |= self.BITS_CAMPOS[campo]
+
+    def campos_modificados(self) -> Tuple[str, ...]:
+        return tuple(campo for campo in self.CAMPOS_PERSISTIDOS if self.cambios & self.BITS_CAMPOS[campo])
+
+    def limpiar_cambios(self):
+        self.cambios = 0
 
     @abstractmethod
     def hablar(self):
@@ -258,9 +1844,13 @@ class PokemonBase(ABC):
 
     def subir_nivel(self, inc: int = 10, reiniciar_on_evol: bool = True):#si alcanza 100 intenta evolucionar hasta 3 evoluciones
         self.nivel += inc
+        if inc:
+            self.marcar('nivel')
         if self.nivel >= 100:
+            self.marcar('nivel')
             if self.evolucion < 3:
                 self.evolucion += 1
+                self.marcar('evolucion')
                 if reiniciar_on_evol:
                     self.nivel = 0
                 return True 
@@ -268,7 +1858,22 @@ class PokemonBase(ABC):
                 self.nivel = 0
         return False
 
+def entrenamiento_cerrado(nivel: int, evolucion: int, n: int) -> Tuple[int, int]:
+    # Nivel y evolucion despues de n llamadas a entrenar(), sin simularlas. Cada llamada
+    # suma 10 niveles; al llegar a 100 el nivel vuelve a 0 (evolucione o no) y la
+    # evolucion sube si es menor que 3. El primer reinicio llega en `primero` pasos y
+    # los siguientes cada 10.
+    primero = max(1, -((nivel - 100) // 10))
+    if n < primero:
+        return nivel + 10 * n, evolucion
+    reinicios = 1 + (n - primero) // 10
+    if evolucion < 3:
+        evolucion += min(reinicios, 3 - evolucion)
+    return 10 * ((n - primero) % 10), evolucion
+
 class Entrenamiento(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def subirAtaque(self):
         raise NotImplementedError
@@ -283,10 +1888,24 @@ class Entrenamiento(ABC):
         
 
 class Pokemon(PokemonBase):
+    __slots__ = ('evoluciones_nombres', 'evoluciono')
+
     BOOST_ATAQUE = 20 
     BOOST_DEFENSA = 20
     BOOST_VIDA = 20
 
+    # Lineas evolutivas compartidas: cada especie guarda una sola tupla para todas sus instancias
+    _ESPECIES: dict = {}
+
+    @classmethod
+    def especie(cls, evoluciones_nombres) -> Tuple[str, ...]:
+        clave = tuple(evoluciones_nombres)
+        linea = cls._ESPECIES.get(clave)
+        if linea is None:
+            linea = tuple(sys.intern(n) for n in clave)
+            cls._ESPECIES[linea] = linea
+        return linea
+
     def __init__(self,
         nombre: str = "Sin Pokemon",
         descripcion: str = "No descripcion",
@@ -303,9 +1922,9 @@ class Pokemon(PokemonBase):
         super().__init__(nombre, descripcion, ataque, defensa, vida, nivel, evolucion, atrapado, pokemon_id)
 
         if evoluciones_nombres:
-            self.evoluciones_nombres = evoluciones_nombres[:3]
+            self.evoluciones_nombres = Pokemon.especie(evoluciones_nombres[:3])
         else:
-            self.evoluciones_nombres = [self.nombre]
+            self.evoluciones_nombres = Pokemon.especie((self.nombre,))
 
         if self.nombre == "Sin Pokemon" and 1 <= self.evolucion <= len(self.evoluciones_nombres):
             self.nombre = self.evoluciones_nombres[self.evolucion - 1]
@@ -333,34 +1952,62 @@ class Pokemon(PokemonBase):
         self.ataque += 10
         self.defensa += 10
         self.vida += 10
+        self.marcar('ataque', 'defensa', 'vida')
         evoluciono = self.subir_nivel(10)
         if evoluciono:
             idx = min(self.evolucion - 1, len(self.evoluciones_nombres) - 1)
             self.nombre = self.evoluciones_nombres[idx]
+            self.marcar('nombre')
             print(f"¡El Pokemon ha evolucionado! Ahora es: {self.nombre}")
         else:
             print("Entrenamiento aplicado.")
 
+    def entrenar_varias(self, n: int) -> int:
+        # Mismo estado final que n llamadas a entrenar(), en O(1) y sin mensajes.
+        # Devuelve cuantas veces evoluciono
+        if n < 0:
+            raise ValueError("La cantidad de entrenamientos no puede ser negativa")
+        if n == 0:
+            return 0
+        self.ataque += 10 * n
+        self.defensa += 10 * n
+        self.vida += 10 * n
+        self.marcar('ataque', 'defensa', 'vida', 'nivel')
+        evolucion = self.evolucion
+        self.nivel, self.evolucion = entrenamiento_cerrado(self.nivel, evolucion, n)
+        if self.evolucion != evolucion:
+            idx = min(self.evolucion - 1, len(self.evoluciones_nombres) - 1)
+            self.nombre = self.evoluciones_nombres[idx]
+            self.marcar('evolucion', 'nombre')
+        return self.evolucion - evolucion
+
     def subirAtaque(self):
         self.ataque += self.BOOST_ATAQUE
+        self.marcar('ataque')
         print(f"Ataque aumentada a {self.ataque}")
 
     def subirDefensa(self):
         self.defensa += self.BOOST_DEFENSA
+        self.marcar('defensa')
         print(f"Defensa aumentada a {self.defensa}")
 
     def subirVida(self):
         self.vida += self.BOOST_VIDA
+        self.marcar('vida')
         print(f"Vida aumentada a {self.vida}")
 
     def actualizar(self):
         self.ataque += self.BOOST_ATAQUE
         self.defensa += self.BOOST_DEFENSA
         self.vida += self.BOOST_VIDA
+        self.marcar('ataque', 'defensa', 'vida')
         self.evoluciono = self.subir_nivel(0)
         print(f"Actualizacion completa: ataque, defensa y vida incrementados.")
 
 class Agua(Pokemon):
+    __slots__ = ('ataque_especial',)
+    tipo = 'Agua'
+    ATAQUE_ESPECIAL = "Hidrobomba"
 
     def __init__(self, 
                 nombre: str = "Sin Pokemon", 
@@ -373,18 +2020,21 @@ class Agua(Pokemon):
                 atrapado: bool = False, 
                 evoluciones_nombres: List[str] | None = ["Squirtle", "Wartortle", "Blastoise"], 
                 pokemon_id: int | None = None,
-                ataque_especial="Hidrobomba"
+                ataque_especial=ATAQUE_ESPECIAL
             ):
         super().__init__(nombre, descripcion, ataque, defensa, vida, nivel, evolucion, atrapado, evoluciones_nombres, pokemon_id)
 
         self.ataque_especial = ataque_especial
-        self.tipo = 'Agua'
 
     def actualizar(self):
         self.defensa += 10
+        self.marcar('defensa')
         print(f"{self.nombre} (Agua) se refresca: +10 defensa.")
 
 class Fuego(Pokemon):
+    __slots__ = ('ataque_especial',)
+    tipo = 'Fuego'
+    ATAQUE_ESPECIAL = "Lanzallamas"
 
     def __init__(self, 
                 nombre: str = "Sin Pokemon", 
@@ -397,19 +2047,22 @@ class Fuego(Pokemon):
                 atrapado: bool = False, 
                 evoluciones_nombres: List[str] | None = ["Charmander", "Charmeleon", "Charizard"], 
                 pokemon_id: int | None = None,
-                ataque_especial: str = "Lanzallamas"
+                ataque_especial: str = ATAQUE_ESPECIAL
             ):
         super().__init__(nombre, descripcion, ataque, defensa, vida, nivel, evolucion, atrapado, evoluciones_nombres, pokemon_id)
 
         self.ataque_especial = ataque_especial
-        self.tipo = 'Fuego'
 
     def actualizar(self):
         self.ataque += 10
+        self.marcar('ataque')
         print(f"{self.nombre} (Fuego) se enciende: +10 ataque.")
 
 
 class Electrico(Pokemon):
+    __slots__ = ('ataque_especial',)
+    tipo = 'Electrico'
+    ATAQUE_ESPECIAL = "Impactrueno"
 
     def __init__(self, 
                 nombre: str = "Sin Pokemon", 
@@ -422,18 +2075,21 @@ class Electrico(Pokemon):
                 atrapado: bool = False, 
                 evoluciones_nombres: List[str] | None = ["Pichu", "Pikachu", "Raichu"], 
                 pokemon_id: int | None = None,
-                ataque_especial: str = "Impactrueno"
+                ataque_especial: str = ATAQUE_ESPECIAL
             ):
         super().__init__(nombre, descripcion, ataque, defensa, vida, nivel, evolucion, atrapado, evoluciones_nombres, pokemon_id)
 
         self.ataque_especial = ataque_especial
-        self.tipo = 'Electrico'
 
     def actualizar(self):
         self.vida += 10
+        self.marcar('vida')
         print(f"{self.nombre} (Electrico) se carga: +10 vida.")
 
 class Hierba(Pokemon):
+    __slots__ = ('ataque_especial',)
+    tipo = 'Hierba'
+    ATAQUE_ESPECIAL = "Rayo Solar"
 
     def __init__(self, 
                 nombre: str = "Sin Pokemon", 
@@ -446,19 +2102,21 @@ class Hierba(Pokemon):
                 atrapado: bool = False, 
                 evoluciones_nombres: List[str] | None = ["Bulbasaur", "Ivysaur", "Venusaur"], 
                 pokemon_id: int | None = None,
-                ataque_especial: str = "Rayo Solar"
+                ataque_especial: str = ATAQUE_ESPECIAL
             ):
         super().__init__(nombre, descripcion, ataque, defensa, vida, nivel, evolucion, atrapado, evoluciones_nombres, pokemon_id)
 
         self.ataque_especial = ataque_especial
-        self.tipo = 'Hierba'
 
     def actualizar(self):
         self.ataque += 5
         self.vida += 5
+        self.marcar('ataque', 'vida')
         print(f"{self.nombre} (Hierba) se nutre: +5 ataque, +5 vida.")
 
 class PokemonConEntrenamiento(Pokemon, Entrenamiento):
+    __slots__ = ()
+
     def subirAtaque(self):
         Pokemon.subirAtaque(self)
 
@@ -468,6 +2126,296 @@ class PokemonConEntrenamiento(Pokemon, Entrenamiento):
     def subirVida(self):
         Pokemon.subirVida(self)
 
+# Registro de tipos: valor de la columna `type` -> clase
+TIPOS_POKEMON = {clase.tipo: clase for clase in (Agua, Fuego, Electrico, Hierba)}
+
+class Roster:
+    # Equipo en columnas (struct-of-arrays). Las estadisticas viven en arreglos tipados;
+    # nombres, descripciones, ataques especiales y lineas evolutivas se guardan como
+    # indices a tablas compartidas. Los Pokemon se construyen solo al pedir roster[i].
+    TIPOS = tuple(TIPOS_POKEMON.values())
+    CODIGOS = {clase.tipo: codigo for codigo, clase in enumerate(TIPOS)}
+    COLUMNAS = ('ids', 'tipos', 'ataques', 'defensas', 'vidas', 'niveles', 'evoluciones',
+                'i_nombres', 'i_descripciones', 'i_especiales', 'i_especies', 'cambios')
+    DTYPES = {'q': 'int64', 'h': 'int16', 'b': 'int8'}
+
+    def __init__(self, pokemons: List[Agua | Fuego | Electrico | Hierba] | None = None):
+        # id 0 significa que el pokemon aun no se ha guardado en la base
+        self.ids = array('q')
+        self.tipos = array('b')
+        self.ataques = array('q')
+        self.defensas = array('q')
+        self.vidas = array('q')
+        self.niveles = array('q')
+        self.evoluciones = array('b')
+        self.i_nombres = array('q')
+        self.i_descripciones = array('q')
+        self.i_especiales = array('q')
+        self.i_especies = array('q')
+        # Mascara de campos modificados sin guardar (PokemonBase.cambios)
+        self.cambios = array('h')
+        # Tablas compartidas con los rosters derivados (filtrar_tipo, ordenar...)
+        self.textos: List = []
+        self.especies: List[Tuple[str, ...]] = []
+        self.__posiciones: dict = {}
+        if pokemons:
+            self.extend(pokemons)
+
+    def __indice(self, tabla: List, valor) -> int:
+        clave = (tabla is self.especies, valor)
+        posicion = self.__posiciones.get(clave)
+        if posicion is None:
+            posicion = len(tabla)
+            tabla.append(valor)
+            self.__posiciones[clave] = posicion
+        return posicion
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, i: int) -> Agua | Fuego | Electrico | Hierba:
+        clase = self.TIPOS[self.tipos[i]]
+        pokemon = clase(
+            nombre=self.textos[self.i_nombres[i]],
+            descripcion=self.textos[self.i_descripciones[i]],
+            ataque=self.ataques[i],
+            defensa=self.defensas[i],
+            vida=self.vidas[i],
+            nivel=self.niveles[i],
+            evolucion=self.evoluciones[i],
+            atrapado=True,
+            evoluciones_nombres=self.especies[self.i_especies[i]],
+            pokemon_id=self.ids[i] or None,
+            ataque_especial=self.textos[self.i_especiales[i]]
+        )
+        pokemon.cambios = self.cambios[i]
+        return pokemon
+
+    def __fila(self, pokemon: Agua | Fuego | Electrico | Hierba) -> Tuple:
+        return (
+            pokemon.pokemon_id or 0,
+            self.CODIGOS[pokemon.tipo],
+            pokemon.ataque,
+            pokemon.defensa,
+            pokemon.vida,
+            pokemon.nivel,
+            pokemon.evolucion,
+            self.__indice(self.textos, pokemon.nombre),
+            self.__indice(self.textos, pokemon.descripcion),
+            self.__indice(self.textos, pokemon.ataque_especial),
+            self.__indice(self.especies, tuple(pokemon.evoluciones_nombres)),
+            pokemon.cambios,
+        )
+
+    def __setitem__(self, i: int, pokemon: Agua | Fuego | Electrico | Hierba):
+        for columna, valor in zip(self.COLUMNAS, self.__fila(pokemon)):
+            getattr(self, columna)[i] = valor
+
+    def __delitem__(self, i: int):
+        for columna in self.COLUMNAS:
+            del getattr(self, columna)[i]
+
+    def append(self, pokemon: Agua | Fuego | Electrico | Hierba):
+        for columna, valor in zip(self.COLUMNAS, self.__fila(pokemon)):
+            getattr(self, columna).append(valor)
+
+    def extend(self, pokemons):
+        for pokemon in pokemons:
+            self.append(pokemon)
+
+    def extend_filas(self, filas: List[Tuple], especie=None):
+        # Carga filas de get_all_pokemons_by_user_id directo a las columnas, sin crear objetos
+        especie = especie or (lambda evolution_names: Pokemon.especie(json.loads(evolution_names)))
+        codigos = self.CODIGOS
+        especiales = [self.__indice(self.textos, clase.ATAQUE_ESPECIAL) for clase in self.TIPOS]
+        indices_especie: dict = {}
+        self.ids.extend(fila[0] for fila in filas)
+        self.tipos.extend(codigos[fila[4]] for fila in filas)
+        self.ataques.extend(fila[5] for fila in filas)
+        self.defensas.extend(fila[6] for fila in filas)
+        self.vidas.extend(fila[7] for fila in filas)
+        self.niveles.extend(fila[8] for fila in filas)
+        self.evoluciones.extend(fila[3] for fila in filas)
+        self.i_nombres.extend(self.__indice(self.textos, fila[1]) for fila in filas)
+        self.i_descripciones.extend(self.__indice(self.textos, fila[2]) for fila in filas)
+        self.i_especiales.extend(especiales[codigos[fila[4]]] for fila in filas)
+        for fila in filas:
+            indice = indices_especie.get(fila[9])
+            if indice is None:
+                indice = indices_especie[fila[9]] = self.__indice(self.especies, especie(fila[9]))
+            self.i_especies.append(indice)
+        # Recien leidas de la base: sin cambios pendientes
+        self.cambios.frombytes(bytes(self.cambios.itemsize * len(filas)))
+
+    @property
+    def nombres(self) -> List[str]:
+        textos = self.textos
+        return [textos[i] for i in self.i_nombres]
+
+    def filas(self):
+        # Recorre el equipo sin construir objetos: (nombre, ataque, defensa, vida, nivel)
+        return zip(self.nombres, self.ataques, self.defensas, self.vidas, self.niveles)
+
+    def columna(self, nombre: str):
+        # Vista NumPy sin copia sobre la columna (o el arreglo mismo si no hay NumPy)
+        datos = getattr(self, nombre)
+        if np is None:
+            return datos
+        return np.frombuffer(datos, dtype=self.DTYPES[datos.typecode])
+
+    def entrenar(self, n: int, indices=None) -> int:
+        # entrenar_varias(n) sobre todo el equipo (o las filas `indices`, sin repetir)
+        # directo en las columnas. Devuelve el total de evoluciones
+        if n < 0:
+            raise ValueError("La cantidad de entrenamientos no puede ser negativa")
+        if indices is None:
+            indices = range(len(self))
+        if n == 0 or len(indices) == 0:
+            return 0
+        bits = PokemonBase.BITS_CAMPOS
+        entrenado = bits['ataque'] | bits['defensa'] | bits['vida'] | bits['nivel']
+        evolucionado = bits['evolucion'] | bits['nombre']
+
+        if np is None:
+            total = 0
+            for i in indices:
+                self.ataques[i] += 10 * n
+                self.defensas[i] += 10 * n
+                self.vidas[i] += 10 * n
+                evolucion = self.evoluciones[i]
+                self.niveles[i], self.evoluciones[i] = entrenamiento_cerrado(self.niveles[i], evolucion, n)
+                self.cambios[i] |= entrenado
+                if self.evoluciones[i] != evolucion:
+                    self.i_nombres[i] = self.__indice_nombre(self.i_especies[i], self.evoluciones[i])
+                    self.cambios[i] |= evolucionado
+                    total += self.evoluciones[i] - evolucion
+            return total
+
+        # Misma cuenta que entrenamiento_cerrado, por columnas
+        indices = np.asarray(indices, dtype=np.intp)
+        for columna in ('ataques', 'defensas', 'vidas'):
+            self.columna(columna)[indices] += 10 * n
+        niveles = self.columna('niveles')
+        evoluciones = self.columna('evoluciones')
+        nivel = niveles[indices]
+        evolucion = evoluciones[indices].astype(np.int64)
+        primero = np.maximum(1, -((nivel - 100) // 10))
+        reinicia = n >= primero
+        reinicios = np.where(reinicia, 1 + (n - primero) // 10, 0)
+        niveles[indices] = np.where(reinicia, 10 * ((n - primero) % 10), nivel + 10 * n)
+        subidas = np.where(evolucion < 3, np.minimum(reinicios, 3 - evolucion), 0)
+        evoluciones[indices] = evolucion + subidas
+        cambios = self.columna('cambios')
+        cambios[indices] |= entrenado
+
+        # El nombre nuevo depende solo de la especie y la evolucion final
+        evolucionaron = indices[subidas > 0]
+        if len(evolucionaron):
+            cambios[evolucionaron] |= evolucionado
+            claves = self.columna('i_especies')[evolucionaron] * 4 + evoluciones[evolucionaron]
+            unicas, inversa = np.unique(claves, return_inverse=True)
+            nombres = np.array([self.__indice_nombre(int(clave) // 4, int(clave) % 4) for clave in unicas], dtype=np.int64)
+            self.columna('i_nombres')[evolucionaron] = nombres[inversa]
+        return int(subidas.sum())
+
+    def __indice_nombre(self, i_especie: int, evolucion: int) -> int:
+        # Indice en textos del nombre de la especie en esa evolucion (como Pokemon.entrenar)
+        linea = self.especies[i_especie]
+        return self.__indice(self.textos, linea[min(evolucion - 1, len(linea) - 1)])
+
+    def indices_pendientes(self):
+        # Filas sin guardar: nuevas (id 0) o con campos modificados
+        if np is None:
+            return [i for i, (pokemon_id, cambios) in enumerate(zip(self.ids, self.cambios)) if not pokemon_id or cambios]
+        return np.flatnonzero((self.columna('ids') == 0) | (self.columna('cambios') != 0))
+
+    def poder(self):
+        if np is None:
+            return array('q', (a + d + v for a, d, v in zip(self.ataques, self.defensas, self.vidas)))
+        return self.columna('ataques') + self.columna('defensas') + self.columna('vidas')
+
+    def suma(self, columna: str = 'ataques') -> int:
+        if np is None:
+            return sum(getattr(self, columna))
+        return int(self.columna(columna).sum())
+
+    def indices_tipo(self, tipo: str):
+        codigo = self.CODIGOS[tipo]
+        if np is None:
+            return [i for i, t in enumerate(self.tipos) if t == codigo]
+        return np.flatnonzero(self.columna('tipos') == codigo)
+
+    def filtrar_tipo(self, tipo: str) -> Roster:
+        return self.tomar(self.indices_tipo(tipo))
+
+    def ordenar(self, columna: str = 'ataques', descendente: bool = True) -> Roster:
+        valores = self.poder() if columna == 'poder' else self.columna(columna)
+        if np is None:
+            orden = sorted(range(len(self)), key=valores.__getitem__, reverse=descendente)
+        elif descendente:
+            # Orden estable de mayor a menor
+            orden = np.argsort(-valores, kind='stable')
+        else:
+            orden = np.argsort(valores, kind='stable')
+        return self.tomar(orden)
+
+    def tomar(self, indices) -> Roster:
+        nuevo = Roster()
+        nuevo.textos = self.textos
+        nuevo.especies = self.especies
+        nuevo.__posiciones = self.__posiciones
+        if np is None:
+            for columna in self.COLUMNAS:
+                datos = getattr(self, columna)
+                getattr(nuevo, columna).extend(datos[i] for i in indices)
+        else:
+            indices = np.asarray(indices, dtype=np.intp)
+            for columna in self.COLUMNAS:
+                getattr(nuevo, columna).frombytes(self.columna(columna)[indices].tobytes())
+        return nuevo
+
+class HidratadorPokemons:
+    # Convierte filas de la tabla pokemons en objetos usando TIPOS_POKEMON.
+    # Cada valor distinto de evolution_names se decodifica una sola vez.
+    def __init__(self):
+        self.__especies: dict = {}
+
+    def especie(self, evolution_names: str) -> Tuple[str, ...]:
+        linea = self.__especies.get(evolution_names)
+        if linea is None:
+            linea = self.__especies[evolution_names] = Pokemon.especie(json.loads(evolution_names))
+        return linea
+
+    def pokemon(self, fila: Tuple) -> Agua | Fuego | Electrico | Hierba:
+        return TIPOS_POKEMON[fila[4]](
+            nombre=fila[1],
+            descripcion=fila[2],
+            ataque=fila[5],
+            defensa=fila[6],
+            vida=fila[7],
+            nivel=fila[8],
+            evolucion=fila[3],
+            atrapado=True,
+            evoluciones_nombres=self.especie(fila[9]),
+            pokemon_id=fila[0]
+        )
+
+    def pokemons(self, filas: List[Tuple]) -> List[Agua | Fuego | Electrico | Hierba]:
+        return [self.pokemon(fila) for fila in filas]
+
+    def roster(self, filas, tamaño_lote: int = 1000) -> Roster:
+        # Hidratacion perezosa: las filas quedan en columnas y se vuelven objetos al accederlas.
+        # Acepta cualquier iterable (por ejemplo iter_pokemons_by_user_id) y lo consume por lotes.
+        roster = Roster()
+        filas = iter(filas)
+        while lote := list(islice(filas, tamaño_lote)):
+            roster.extend_filas(lote, self.especie)
+        return roster
+
 def aplicar_daño(atacante_val: int, defensor_def: int, defensor_vida: int) -> Tuple[int, int]:
     resta = atacante_val
     if defensor_def >= resta:
@@ -480,16 +2428,698 @@ def aplicar_daño(atacante_val: int, defensor_def: int, defensor_vida: int) -> T
             defensor_vida = 0
     return defensor_def, defensor_vida
 
+# Acciones del combate (las mismas opciones del menu de combate)
+ACCION_PASAR = 1
+ACCION_NORMAL = 2
+ACCION_ESPECIAL = 3
+ACCION_HUIR = 4
+ACCION_CONTRAATAQUE = 5
+
+MULTIPLICADOR_ESPECIAL = 1.5
+
+def politica_fija(accion: int):
+    def politica(mi_def: int, mi_vida: int, en_def: int, en_vida: int) -> int:
+        return accion
+    return politica
+
+def politica_aleatoria(rng: random.Random | None = None):
+    # Misma politica que el enemigo de combate_con_enemigo: random.choice([1, 2, 3])
+    choice = (rng or random).choice
+    opciones = (ACCION_PASAR, ACCION_NORMAL, ACCION_ESPECIAL)
+    def politica(mi_def: int, mi_vida: int, en_def: int, en_vida: int) -> int:
+        return choice(opciones)
+    return politica
+
+def politica_desde_secuencia(secuencia):
+    # Reproduce una secuencia de acciones ya elegida (por ejemplo una fila de elecciones sembradas)
+    siguiente = iter(secuencia).__next__
+    def politica(mi_def: int, mi_vida: int, en_def: int, en_vida: int) -> int:
+        return int(siguiente())
+    return politica
+
+class ResultadoCombate:
+    def __init__(self,
+        ganador: str | None,
+        turnos: int,
+        eventos: List[Tuple[int, str, int, int]],
+        mi_def: int,
+        mi_vida: int,
+        en_def: int,
+        en_vida: int,
+        empate: bool = False
+        ):
+        # ganador: 'jugador', 'enemigo' o None si el jugador huyo o se llego a max_turnos (empate)
+        self.ganador = ganador
+        self.empate = empate
+        self.turnos = turnos
+        # Cada evento es (turno, actor, accion, daño)
+        self.eventos = eventos
+        self.mi_def = mi_def
+        self.mi_vida = mi_vida
+        self.en_def = en_def
+        self.en_vida = en_vida
+
+    @property
+    def huyo(self) -> bool:
+        return self.ganador is None and not self.empate
+
+class MotorCombate:
+    def __init__(self, politica_jugador=None, politica_enemigo=None, rng: random.Random | None = None, registrar_eventos: bool = True,
+                 max_turnos: int = 10000):
+        self.rng = rng or random.Random()
+        self.politica_jugador = politica_jugador or politica_fija(ACCION_NORMAL)
+        self.politica_enemigo = politica_enemigo or politica_aleatoria(self.rng)
+        self.registrar_eventos = registrar_eventos
+        # Igual que simular_lotes: sin ataque o pasando siempre el combate no terminaria
+        self.max_turnos = max_turnos
+
+    def combatir(self, mi_pokemon: Agua | Fuego | Electrico | Hierba, enemigo: Agua | Fuego | Electrico | Hierba,
+                 al_iniciar_turno=None, al_evento=None, al_terminar_turno=None) -> ResultadoCombate:
+        return self.simular(
+            mi_pokemon.ataque, mi_pokemon.defensa, mi_pokemon.vida,
+            enemigo.ataque, enemigo.defensa, enemigo.vida,
+            al_iniciar_turno, al_evento, al_terminar_turno
+        )
+
+    def simular(self, mi_atk: int, mi_def: int, mi_vida: int, en_atk: int, en_def: int, en_vida: int,
+                al_iniciar_turno=None, al_evento=None, al_terminar_turno=None) -> ResultadoCombate:
+        # Mismas reglas que combate_con_enemigo: el jugador empieza, cada ataque del jugador
+        # recibe contraataque y el enemigo elige entre pasar, ataque normal o especial.
+        politica_jugador = self.politica_jugador
+        politica_enemigo = self.politica_enemigo
+        registrar = self.registrar_eventos or al_evento is not None
+        eventos: List[Tuple[int, str, int, int]] = []
+        mi_especial = int(mi_atk * MULTIPLICADOR_ESPECIAL)
+        en_especial = int(en_atk * MULTIPLICADOR_ESPECIAL)
+        max_turnos = self.max_turnos
+        turno_jugador = True
+        turnos = 0
+
+        while mi_vida > 0 and en_vida > 0:
+            if turnos >= max_turnos:
+                return ResultadoCombate(None, turnos, eventos, mi_def, mi_vida, en_def, en_vida, empate=True)
+            turnos += 1
+            if al_iniciar_turno is not None:
+                al_iniciar_turno(mi_def, mi_vida, en_def, en_vida, turno_jugador)
+
+            if turno_jugador:
+                op = politica_jugador(mi_def, mi_vida, en_def, en_vida)
+                if op == ACCION_NORMAL or op == ACCION_ESPECIAL:
+                    atk = mi_atk if op == ACCION_NORMAL else mi_especial
+                    if en_def >= atk:
+                        en_def -= atk
+                    else:
+                        en_vida -= atk - en_def
+                        en_def = 0
+                        if en_vida < 0:
+                            en_vida = 0
+                    if mi_def >= en_atk:
+                        mi_def -= en_atk
+                    else:
+                        mi_vida -= en_atk - mi_def
+                        mi_def = 0
+                        if mi_vida < 0:
+                            mi_vida = 0
+                    if registrar:
+                        ev = (turnos, 'jugador', op, atk)
+                        contra = (turnos, 'enemigo', ACCION_CONTRAATAQUE, en_atk)
+                        eventos.append(ev)
+                        eventos.append(contra)
+                        if al_evento is not None:
+                            al_evento(ev)
+                            al_evento(contra)
+                elif op == ACCION_HUIR:
+                    if registrar:
+                        ev = (turnos, 'jugador', ACCION_HUIR, 0)
+                        eventos.append(ev)
+                        if al_evento is not None:
+                            al_evento(ev)
+                    return ResultadoCombate(None, turnos, eventos, mi_def, mi_vida, en_def, en_vida)
+                elif op == ACCION_PASAR and registrar:
+                    ev = (turnos, 'jugador', ACCION_PASAR, 0)
+                    eventos.append(ev)
+                    if al_evento is not None:
+                        al_evento(ev)
+                turno_jugador = False
+            else:
+                choice = politica_enemigo(mi_def, mi_vida, en_def, en_vida)
+                atk = 0
+                if choice == ACCION_NORMAL or choice == ACCION_ESPECIAL:
+                    atk = en_atk if choice == ACCION_NORMAL else en_especial
+                    if mi_def >= atk:
+                        mi_def -= atk
+                    else:
+                        mi_vida -= atk - mi_def
+                        mi_def = 0
+                        if mi_vida < 0:
+                            mi_vida = 0
+                if registrar:
+                    ev = (turnos, 'enemigo', choice, atk)
+                    eventos.append(ev)
+                    if al_evento is not None:
+                        al_evento(ev)
+                turno_jugador = True
+
+            if al_terminar_turno is not None:
+                al_terminar_turno()
+
+        ganador = 'jugador' if en_vida <= 0 else 'enemigo'
+        return ResultadoCombate(ganador, turnos, eventos, mi_def, mi_vida, en_def, en_vida)
+
+def aplicar_daño_lote(atacante_val, defensor_def, defensor_vida):
+    # Version vectorizada de aplicar_daño: primero se gasta la defensa y el sobrante va a la vida
+    sobrante = np.maximum(atacante_val - defensor_def, 0)
+    defensor_def = np.maximum(defensor_def - atacante_val, 0)
+    defensor_vida = np.maximum(defensor_vida - sobrante, 0)
+    return defensor_def, defensor_vida
+
+class ResultadoLotes:
+    def __init__(self, victorias, derrotas, huidas, turnos, mi_vida, en_vida):
+        self.victorias = victorias
+        self.derrotas = derrotas
+        self.huidas = huidas
+        self.turnos = turnos
+        self.mi_vida = mi_vida
+        self.en_vida = en_vida
+
+    def __len__(self):
+        return len(self.turnos)
+
+def simular_lotes(mi_atk, mi_def, mi_vida, en_atk, en_def, en_vida,
+                  acciones_jugador=ACCION_NORMAL, elecciones_enemigo=None,
+                  semilla: int | None = None, max_turnos: int = 10000) -> ResultadoLotes:
+    # Simula N combates a la vez con las mismas reglas que MotorCombate.
+    # acciones_jugador: accion fija (o una por combate) del jugador.
+    # elecciones_enemigo: matriz (N, turnos del enemigo) con valores 1-3; si no se da
+    # se sortea con la semilla, igual que random.choice([1, 2, 3]).
+    if np is None:
+        return _simular_lotes_python(mi_atk, mi_def, mi_vida, en_atk, en_def, en_vida,
+                                     acciones_jugador, elecciones_enemigo, semilla, max_turnos)
+
+    mi_atk = np.asarray(mi_atk, dtype=np.int64)
+    mi_def = np.array(mi_def, dtype=np.int64)
+    mi_vida = np.array(mi_vida, dtype=np.int64)
+    en_atk = np.asarray(en_atk, dtype=np.int64)
+    en_def = np.array(en_def, dtype=np.int64)
+    en_vida = np.array(en_vida, dtype=np.int64)
+    n = len(mi_vida)
+    acciones = np.broadcast_to(np.asarray(acciones_jugador, dtype=np.int64), (n,))
+    mi_especial = np.floor(mi_atk * MULTIPLICADOR_ESPECIAL).astype(np.int64)
+    en_especial = np.floor(en_atk * MULTIPLICADOR_ESPECIAL).astype(np.int64)
+    rng = np.random.default_rng(semilla) if elecciones_enemigo is None else None
+    if elecciones_enemigo is not None:
+        elecciones_enemigo = np.asarray(elecciones_enemigo, dtype=np.int64)
+        max_turnos = min(max_turnos, 2 * elecciones_enemigo.shape[1] + 1)
+
+    # Todos los combates empiezan en el turno del jugador y alternan a la vez.
+    # Solo se siguen simulando los combates activos; al terminar se vuelcan sus valores.
+    huidas = np.zeros(n, dtype=bool)
+    turnos = np.zeros(n, dtype=np.int64)
+    vida_final_jugador = mi_vida.copy()
+    vida_final_enemigo = en_vida.copy()
+    ids = np.flatnonzero((mi_vida > 0) & (en_vida > 0))
+    jugador_ataca = (acciones[ids] == ACCION_NORMAL) | (acciones[ids] == ACCION_ESPECIAL)
+    jugador_huye = acciones[ids] == ACCION_HUIR
+    golpe_jugador = np.where(acciones[ids] == ACCION_ESPECIAL, mi_especial[ids], mi_atk[ids])
+    mi_atk, en_atk, en_especial = mi_atk[ids], en_atk[ids], en_especial[ids]
+    mi_def, mi_vida, en_def, en_vida = mi_def[ids], mi_vida[ids], en_def[ids], en_vida[ids]
+    turno = 0
+
+    while turno < max_turnos and len(ids) > 0:
+        turno += 1
+        if turno % 2 == 1:
+            huyen = jugador_huye
+            atacan = jugador_ataca
+            en_def_n, en_vida_n = aplicar_daño_lote(golpe_jugador, en_def, en_vida)
+            en_def = np.where(atacan, en_def_n, en_def)
+            en_vida = np.where(atacan, en_vida_n, en_vida)
+            mi_def_n, mi_vida_n = aplicar_daño_lote(en_atk, mi_def, mi_vida)
+        else:
+            indice = turno // 2 - 1
+            if elecciones_enemigo is None:
+                elecciones = rng.integers(ACCION_PASAR, ACCION_ESPECIAL + 1, size=len(ids))
+            else:
+                elecciones = elecciones_enemigo[ids, indice]
+            huyen = None
+            atacan = (elecciones == ACCION_NORMAL) | (elecciones == ACCION_ESPECIAL)
+            golpe = np.where(elecciones == ACCION_ESPECIAL, en_especial, en_atk)
+            mi_def_n, mi_vida_n = aplicar_daño_lote(golpe, mi_def, mi_vida)
+        mi_def = np.where(atacan, mi_def_n, mi_def)
+        mi_vida = np.where(atacan, mi_vida_n, mi_vida)
+
+        terminan = (mi_vida <= 0) | (en_vida <= 0)
+        if huyen is not None:
+            terminan |= huyen
+        if terminan.any():
+            fin = ids[terminan]
+            turnos[fin] = turno
+            vida_final_jugador[fin] = mi_vida[terminan]
+            vida_final_enemigo[fin] = en_vida[terminan]
+            if huyen is not None:
+                huidas[fin] = huyen[terminan]
+            siguen = ~terminan
+            ids = ids[siguen]
+            jugador_ataca, jugador_huye, golpe_jugador = jugador_ataca[siguen], jugador_huye[siguen], golpe_jugador[siguen]
+            mi_atk, en_atk, en_especial = mi_atk[siguen], en_atk[siguen], en_especial[siguen]
+            mi_def, mi_vida, en_def, en_vida = mi_def[siguen], mi_vida[siguen], en_def[siguen], en_vida[siguen]
+
+    # Combates que alcanzaron max_turnos sin terminar
+    turnos[ids] = turno
+    vida_final_jugador[ids] = mi_vida
+    vida_final_enemigo[ids] = en_vida
+
+    victorias = (vida_final_enemigo <= 0) & ~huidas
+    derrotas = (vida_final_jugador <= 0) & ~huidas & ~victorias
+    return ResultadoLotes(victorias, derrotas, huidas, turnos, vida_final_jugador, vida_final_enemigo)
+
+def _simular_lotes_python(mi_atk, mi_def, mi_vida, en_atk, en_def, en_vida,
+                          acciones_jugador, elecciones_enemigo, semilla, max_turnos: int = 10000) -> ResultadoLotes:
+    # Sin NumPy se recorre cada combate con MotorCombate
+    n = len(mi_vida)
+    acciones = acciones_jugador if isinstance(acciones_jugador, (list, tuple)) else [acciones_jugador] * n
+    rng = random.Random(semilla)
+    victorias, derrotas, huidas, turnos, vidas_jugador, vidas_enemigo = [], [], [], [], [], []
+    for i in range(n):
+        if elecciones_enemigo is None:
+            politica_enemigo = politica_aleatoria(rng)
+        else:
+            politica_enemigo = politica_desde_secuencia(elecciones_enemigo[i])
+        motor = MotorCombate(politica_fija(acciones[i]), politica_enemigo, registrar_eventos=False, max_turnos=max_turnos)
+        resultado = motor.simular(mi_atk[i], mi_def[i], mi_vida[i], en_atk[i], en_def[i], en_vida[i])
+        victorias.append(resultado.ganador == 'jugador')
+        derrotas.append(resultado.ganador == 'enemigo')
+        huidas.append(resultado.huyo)
+        turnos.append(resultado.turnos)
+        vidas_jugador.append(resultado.mi_vida)
+        vidas_enemigo.append(resultado.en_vida)
+    return ResultadoLotes(victorias, derrotas, huidas, turnos, vidas_jugador, vidas_enemigo)
+
+def simular_cruce(pokemons: List[Agua | Fuego | Electrico | Hierba], enemigos: List[Agua | Fuego | Electrico | Hierba],
+                  acciones_jugador=ACCION_NORMAL, semilla: int | None = None) -> ResultadoLotes:
+    # Todos los pokemons contra todos los enemigos; el combate i corresponde a
+    # pokemons[i // len(enemigos)] contra enemigos[i % len(enemigos)]
+    pares = [(p, e) for p in pokemons for e in enemigos]
+    return simular_lotes(
+        [p.ataque for p, _ in pares], [p.defensa for p, _ in pares], [p.vida for p, _ in pares],
+        [e.ataque for _, e in pares], [e.defensa for _, e in pares], [e.vida for _, e in pares],
+        acciones_jugador=acciones_jugador, semilla=semilla
+    )
+
+Z_95 = 1.959963984540054
+
+def _simular_bloque(estadisticas: Tuple[int, int, int, int, int, int], accion_jugador: int, semilla: str, n: int) -> Tuple[int, int, int, int, int]:
+    # Cada bloque usa su propio generador sembrado, independiente del resto de procesos
+    rng = random.Random(semilla)
+    motor = MotorCombate(politica_fija(accion_jugador), politica_aleatoria(rng), rng, registrar_eventos=False)
+    simular = motor.simular
+    victorias = suma_turnos = suma_turnos2 = suma_vida = suma_vida2 = 0
+    for _ in range(n):
+        resultado = simular(*estadisticas)
+        if resultado.ganador == 'jugador':
+            victorias += 1
+        suma_turnos += resultado.turnos
+        suma_turnos2 += resultado.turnos * resultado.turnos
+        suma_vida += resultado.mi_vida
+        suma_vida2 += resultado.mi_vida * resultado.mi_vida
+    return victorias, suma_turnos, suma_turnos2, suma_vida, suma_vida2
+
+class EstimacionCombate:
+    def __init__(self, enemigo: Agua | Fuego | Electrico | Hierba):
+        self.enemigo = enemigo
+        self.simulaciones = 0
+        self.victorias = 0
+        self.suma_turnos = 0
+        self.suma_turnos2 = 0
+        self.suma_vida = 0
+        self.suma_vida2 = 0
+
+    def acumular(self, n: int, bloque: Tuple[int, int, int, int, int]):
+        self.simulaciones += n
+        self.victorias += bloque[0]
+        self.suma_turnos += bloque[1]
+        self.suma_turnos2 += bloque[2]
+        self.suma_vida += bloque[3]
+        self.suma_vida2 += bloque[4]
+
+    @property
+    def prob_victoria(self) -> float:
+        return self.victorias / self.simulaciones if self.simulaciones else 0.0
+
+    @property
+    def intervalo_victoria(self) -> Tuple[float, float]:
+        # Intervalo de Wilson al 95%
+        n = self.simulaciones
+        if n == 0:
+            return 0.0, 1.0
+        p = self.prob_victoria
+        z2 = Z_95 * Z_95
+        centro = (p + z2 / (2 * n)) / (1 + z2 / n)
+        margen = Z_95 * math.sqrt(p * (1 - p) / n + z2 / (4 * n * n)) / (1 + z2 / n)
+        return max(0.0, centro - margen), min(1.0, centro + margen)
+
+    @property
+    def turnos_esperados(self) -> float:
+        return self.suma_turnos / self.simulaciones if self.simulaciones else 0.0
+
+    @property
+    def intervalo_turnos(self) -> Tuple[float, float]:
+        return self.__intervalo_media(self.suma_turnos, self.suma_turnos2)
+
+    @property
+    def vida_esperada(self) -> float:
+        return self.suma_vida / self.simulaciones if self.simulaciones else 0.0
+
+    @property
+    def intervalo_vida(self) -> Tuple[float, float]:
+        return self.__intervalo_media(self.suma_vida, self.suma_vida2)
+
+    def precision(self) -> float:
+        bajo, alto = self.intervalo_victoria
+        return (alto - bajo) / 2
+
+    def __intervalo_media(self, suma: int, suma2: int) -> Tuple[float, float]:
+        n = self.simulaciones
+        if n < 2:
+            return 0.0, float('inf')
+        media = suma / n
+        varianza = max(0.0, (suma2 - n * media * media) / (n - 1))
+        margen = Z_95 * math.sqrt(varianza / n)
+        return media - margen, media + margen
+
+def estimar_probabilidades(mi_pokemon: Agua | Fuego | Electrico | Hierba,
+                           enemigos: List[Agua | Fuego | Electrico | Hierba],
+                           accion_jugador: int = ACCION_ESPECIAL,
+                           precision: float = 0.01,
+                           max_simulaciones: int = 1_000_000,
+                           tamaño_bloque: int = 20_000,
+                           procesos: int | None = None,
+                           semilla: int = 0) -> List[EstimacionCombate]:
+    # Monte Carlo contra cada enemigo siguiendo la politica random.choice([1, 2, 3]).
+    # Se lanzan rondas de bloques en paralelo y un enemigo deja de simularse cuando
+    # la mitad del intervalo de confianza de su probabilidad de victoria es <= precision.
+    procesos = procesos or os.cpu_count() or 1
+    estimaciones = [EstimacionCombate(e) for e in enemigos]
+    estadisticas = [
+        (mi_pokemon.ataque, mi_pokemon.defensa, mi_pokemon.vida, e.ataque, e.defensa, e.vida)
+        for e in enemigos
+    ]
+    bloques_enviados = [0] * len(enemigos)
+
+    def pendientes() -> List[int]:
+        return [
+            i for i, est in enumerate(estimaciones)
+            if est.simulaciones < max_simulaciones and (est.simulaciones == 0 or est.precision() > precision)
+        ]
+
+    def ronda(i: int) -> List[Tuple[str, int]]:
+        restantes = max_simulaciones - estimaciones[i].simulaciones
+        trabajos = []
+        for _ in range(procesos):
+            n = min(tamaño_bloque, restantes)
+            if n <= 0:
+                break
+            restantes -= n
+            trabajos.append((f'{semilla}-{i}-{bloques_enviados[i]}', n))
+            bloques_enviados[i] += 1
+        return trabajos
+
+    if procesos == 1:
+        while activos := pendientes():
+            for i in activos:
+                for semilla_bloque, n in ronda(i):
+                    estimaciones[i].acumular(n, _simular_bloque(estadisticas[i], accion_jugador, semilla_bloque, n))
+        return estimaciones
+
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        while activos := pendientes():
+            futuros = [
+                (i, n, pool.submit(_simular_bloque, estadisticas[i], accion_jugador, semilla_bloque, n))
+                for i in activos for semilla_bloque, n in ronda(i)
+            ]
+            for i, n, futuro in futuros:
+                estimaciones[i].acumular(n, futuro.result())
+    return estimaciones
+
+class SolucionCombate:
+    def __init__(self, mi_atk: int, en_atk: int, exacto: bool = False, max_estados: int = 250_000):
+        self.mi_atk = mi_atk
+        self.en_atk = en_atk
+        self.mi_especial = int(mi_atk * MULTIPLICADOR_ESPECIAL)
+        self.en_especial = int(en_atk * MULTIPLICADOR_ESPECIAL)
+        self.exacto = exacto
+        self.__tercio = Fraction(1, 3) if exacto else 1 / 3
+        self.__medio = Fraction(1, 2) if exacto else 0.5
+        self.__cero = Fraction(0) if exacto else 0.0
+        self.__uno = Fraction(1) if exacto else 1.0
+        # Tabla de transposicion: estado del turno del jugador -> (prob. de victoria, mejor accion).
+        # Acotada: si pasa de max_estados se vacia antes de resolver un estado nuevo, asi
+        # que ocupa a lo sumo max_estados mas los estados de una sola resolucion.
+        self.max_estados = max_estados
+        self.estados: dict = {}
+
+    def prob_victoria(self, mi_def: int, mi_vida: int, en_def: int, en_vida: int):
+        return self.__resolver((mi_def, mi_vida, en_def, en_vida))[0]
+
+    def mejor_accion(self, mi_def: int, mi_vida: int, en_def: int, en_vida: int) -> int:
+        return self.__resolver((mi_def, mi_vida, en_def, en_vida))[1]
+
+    def politica(self):
+        def politica(mi_def: int, mi_vida: int, en_def: int, en_vida: int) -> int:
+            return self.mejor_accion(mi_def, mi_vida, en_def, en_vida)
+        return politica
+
+    def __terminal(self, estado: Tuple[int, int, int, int]):
+        # Igual que combate_con_enemigo: si el enemigo cae gana el jugador aunque tambien caiga
+        if estado[3] <= 0:
+            return self.__uno
+        if estado[1] <= 0:
+            return self.__cero
+        return None
+
+    def __tras_ataque(self, estado: Tuple[int, int, int, int], atk: int) -> Tuple[int, int, int, int]:
+        mi_def, mi_vida, en_def, en_vida = estado
+        en_def, en_vida = aplicar_daño(atk, en_def, en_vida)
+        mi_def, mi_vida = aplicar_daño(self.en_atk, mi_def, mi_vida)
+        return mi_def, mi_vida, en_def, en_vida
+
+    def __golpe_enemigo(self, estado: Tuple[int, int, int, int], atk: int) -> Tuple[int, int, int, int]:
+        mi_def, mi_vida = aplicar_daño(atk, estado[0], estado[1])
+        return mi_def, mi_vida, estado[2], estado[3]
+
+    def __sucesores(self, estado: Tuple[int, int, int, int]):
+        # Estados del turno del jugador de los que depende el valor de `estado`, por accion
+        tras_especial = self.__tras_ataque(estado, self.mi_especial)
+        tras_normal = self.__tras_ataque(estado, self.mi_atk)
+        return (
+            (ACCION_ESPECIAL, tras_especial, (tras_especial, self.__golpe_enemigo(tras_especial, self.en_atk), self.__golpe_enemigo(tras_especial, self.en_especial))),
+            (ACCION_NORMAL, tras_normal, (tras_normal, self.__golpe_enemigo(tras_normal, self.en_atk), self.__golpe_enemigo(tras_normal, self.en_especial))),
+            (ACCION_PASAR, None, (self.__golpe_enemigo(estado, self.en_atk), self.__golpe_enemigo(estado, self.en_especial))),
+        )
+
+    def __valor(self, estado: Tuple[int, int, int, int]):
+        terminal = self.__terminal(estado)
+        if terminal is not None:
+            return terminal
+        return self.estados[estado][0]
+
+    def __resolver(self, inicio: Tuple[int, int, int, int]):
+        terminal = self.__terminal(inicio)
+        if terminal is not None:
+            return terminal, ACCION_PASAR
+        if inicio in self.estados:
+            return self.estados[inicio]
+        if len(self.estados) > self.max_estados:
+            self.estados.clear()
+
+        if self.mi_atk == 0 and self.en_atk == 0:
+            # Nadie puede hacer daño: el combate nunca termina
+            self.estados[inicio] = (self.__cero, ACCION_PASAR)
+            return self.estados[inicio]
+
+        # Recorrido iterativo en postorden; cada sucesor tiene menos defensa+vida total
+        pila = [inicio]
+        while pila:
+            estado = pila[-1]
+            if estado in self.estados:
+                pila.pop()
+                continue
+            sucesores = self.__sucesores(estado)
+            faltan = [
+                s for _, _, dependencias in sucesores for s in dependencias
+                if s != estado and s not in self.estados and self.__terminal(s) is None
+            ]
+            if faltan:
+                pila.extend(faltan)
+                continue
+
+            mejor, mejor_accion = None, ACCION_PASAR
+            for accion, tras_ataque, dependencias in sucesores:
+                if accion == ACCION_PASAR:
+                    # Pasar con el enemigo pasando vuelve al mismo estado: V = (V(golpe) + V(especial)) / 2
+                    if self.en_atk == 0:
+                        valor = self.__cero
+                    else:
+                        valor = (self.__valor(dependencias[0]) + self.__valor(dependencias[1])) * self.__medio
+                else:
+                    terminal = self.__terminal(tras_ataque)
+                    if terminal is not None:
+                        valor = terminal
+                    else:
+                        valor = sum((self.__valor(s) for s in dependencias), self.__cero) * self.__tercio
+                if mejor is None or valor > mejor:
+                    mejor, mejor_accion = valor, accion
+            self.estados[estado] = (mejor, mejor_accion)
+            pila.pop()
+
+        return self.estados[inicio]
+
+class ResolutorCombate:
+    def __init__(self, max_soluciones: int = 256, max_estados: int = 1_000_000):
+        # Cache LRU acotada: una solucion por par (ataque jugador, ataque enemigo), y a lo
+        # sumo max_estados estados entre todas (unos 230 bytes por estado)
+        self.max_soluciones = max_soluciones
+        self.max_estados = max_estados
+        self.soluciones: OrderedDict = OrderedDict()
+
+    def solucion(self, mi_atk: int, en_atk: int, exacto: bool = False) -> SolucionCombate:
+        clave = (mi_atk, en_atk, exacto)
+        solucion = self.soluciones.get(clave)
+        if solucion is None:
+            solucion = SolucionCombate(mi_atk, en_atk, exacto, max_estados=self.max_estados)
+            self.soluciones[clave] = solucion
+            if len(self.soluciones) > self.max_soluciones:
+                self.soluciones.popitem(last=False)
+        else:
+            self.soluciones.move_to_end(clave)
+        return solucion
+
+    def resolver(self, mi_pokemon: Agua | Fuego | Electrico | Hierba, enemigo: Agua | Fuego | Electrico | Hierba, exacto: bool = False):
+        # Devuelve (probabilidad de victoria, mejor accion inicial)
+        solucion = self.solucion(mi_pokemon.ataque, enemigo.ataque, exacto)
+        resultado = (
+            solucion.prob_victoria(mi_pokemon.defensa, mi_pokemon.vida, enemigo.defensa, enemigo.vida),
+            solucion.mejor_accion(mi_pokemon.defensa, mi_pokemon.vida, enemigo.defensa, enemigo.vida)
+        )
+        self.__recortar()
+        return resultado
+
+    def __recortar(self):
+        # Descarta las soluciones menos usadas hasta volver al presupuesto de estados;
+        # la mas reciente se conserva aunque sola lo supere (su tabla ya esta acotada)
+        total = sum(len(s.estados) for s in self.soluciones.values())
+        while total > self.max_estados and len(self.soluciones) > 1:
+            _, solucion = self.soluciones.popitem(last=False)
+            total -= len(solucion.estados)
+
+def pokemons_iniciales() -> List[Tuple[str, Agua | Fuego | Electrico | Hierba]]:
+    # Opciones de pokemon inicial: (tipo, pokemon nuevo sin guardar)
+    return [
+        ("Agua", Agua("Squirtle", "Pokemon tortuga", ataque=20, defensa=30, vida=100, nivel=1, evoluciones_nombres=["Squirtle", "Wartortle", "Blastoise"])),
+        ("Fuego", Fuego("Charmander", "Pokemon de fuego", ataque=25, defensa=20, vida=90, nivel=1, evoluciones_nombres=["Charmander", "Charmeleon", "Charizard"])),
+        ("Electrico", Electrico("Pichu", "Poemon electrico", ataque=18, defensa=18, vida=80, nivel=1, evoluciones_nombres=["Pichu", "Pikachu", "Raichu"])),
+        ("Hierba", Hierba("Bulbasaur", "Pokemon planta", ataque=22, defensa=22, vida=95, nivel=1, evoluciones_nombres=["Bulbasaur", "Ivysaur", "Venusaur"]))
+    ]
+
+def crear_enemigos_por_defecto() -> List[Agua | Fuego | Electrico | Hierba]:
+    e1 = Fuego("Enemigo Fuerte 1", "Firme y peligroso", ataque=80, defensa=80, vida=200, nivel=50)
+    e2 = Electrico("Enemigo Fuerte 2", "Agil y potente", ataque=70, defensa=60, vida=180, nivel=48)
+    e3 = Hierba("Enemigo Debil 1", "Tranquilo", ataque=20, defensa=20, vida=80, nivel=5)
+    e4 = Agua("Enemigo Debil 2", "Aguas calmadas", ataque=15, defensa=18, vida=70, nivel=4)
+    return [e1, e2, e3, e4]
+
+def narrar_evento(mi_pokemon: Agua | Fuego | Electrico | Hierba, enemigo: Agua | Fuego | Electrico | Hierba,
+                  evento: Tuple[int, str, int, int]) -> str | None:
+    # Linea del registro de combate para un evento de MotorCombate; None si el jugador huye
+    _, actor, accion, daño = evento
+    if actor == 'jugador':
+        if accion == ACCION_PASAR:
+            return "Pase el turno."
+        if accion == ACCION_NORMAL:
+            return f"Hiciste un ataque normal con {daño}."
+        if accion == ACCION_ESPECIAL:
+            special = getattr(mi_pokemon, "ataque_especial", "Ataque Especial")
+            return f"{mi_pokemon.nombre} usa {special} ({daño} dmg)."
+        return None
+    if accion == ACCION_CONTRAATAQUE:
+        return f"{enemigo.nombre} te contraataca ({daño})."
+    if accion == ACCION_PASAR:
+        return f"{enemigo.nombre} pasa el turno."
+    if accion == ACCION_NORMAL:
+        return f" {enemigo.nombre} te golpea con ataque normal ({daño})."
+    special = getattr(enemigo, "ataque_especial", "Atgaque Especial")
+    return f"{enemigo.nombre} usa {special} ({daño} dmg)."
+
+def escribir_registro_combate(jugador_nombre: str, data: List[str], carpeta_combates: str = 'combates', sufijo: str = '') -> str:
+    # Escribe el registro de un combate y devuelve la ruta del archivo
+    if not os.path.exists(carpeta_combates):
+        os.makedirs(carpeta_combates, exist_ok=True)
+
+    fecha_actual = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    nombre_archivo = f"{jugador_nombre}_{fecha_actual}{sufijo}.txt"
+    ruta_archivo = os.path.join(carpeta_combates, nombre_archivo)
+
+    with open(ruta_archivo, 'w', encoding='utf-8') as archivo:
+        archivo.write(f"REGISTRO DE COMBATE\n")
+        archivo.write(f"Jugador: {jugador_nombre}\n")
+        archivo.write(f"Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        archivo.write(f"{'='*50}\n\n")
+        
+        for linea in data:
+            archivo.write(f"{linea}\n")
+    return ruta_archivo
+
+class Paginador:
+    # Pagina por clave sobre una consulta obtener(after_id, limit) cuyas filas empiezan por id
+    def __init__(self, obtener, tamaño: int = 10):
+        self.obtener = obtener
+        self.tamaño = tamaño
+        self.desde = 0
+        self.anteriores: List[int] = []
+        self.filas: List[Tuple] = []
+        self.hay_siguiente = False
+        self.cargar()
+
+    def cargar(self):
+        # Se pide una fila de mas para saber si existe otra pagina
+        filas = self.obtener(self.desde, self.tamaño + 1)
+        self.hay_siguiente = len(filas) > self.tamaño
+        self.filas = filas[:self.tamaño]
+
+    @property
+    def hay_anterior(self) -> bool:
+        return len(self.anteriores) > 0
+
+    def siguiente(self):
+        self.anteriores.append(self.desde)
+        self.desde = self.filas[-1][0]
+        self.cargar()
+
+    def anterior(self):
+        self.desde = self.anteriores.pop()
+        self.cargar()
+
 class App:
+    # Nombre de cada opcion del menu principal en las trazas
+    ACCIONES_MENU = {
+        1: 'detalles', 2: 'hablar', 3: 'entrenamiento', 4: 'combatir', 5: 'crear_enemigo', 6: 'ver_atrapados',
+        7: 'pruebas_errores', 8: 'registros', 9: 'guardar', 10: 'cambiar_partida', 11: 'cambiar_pokemon', 12: 'salir',
+    }
+    ACCIONES_ENTRENAMIENTO = {1: 'normal', 2: 'individual', 3: 'intensivo', 4: 'personalizado', 0: 'volver'}
+
     def __init__(self):
         self.id_jugador : int
         self.jugador_nombre: str = ""
         self.mi_pokemon: Agua | Fuego | Electrico | Hierba | None = None
-        self.pokemons_atrapados : List[Agua | Fuego | Electrico | Hierba] = []
+        self.pokemons_atrapados : Roster = Roster()
         self.enemigos: List[Agua | Fuego | Electrico | Hierba] = self._crear_enemigos_por_defecto()
-        self.database = DataBase()
+        self.database = crear_almacenamiento()
+        self.hidratador = HidratadorPokemons()
+        Utils.renderizador.instalar()
+        Utils.trazador.instalar()
+        self.perfilador = PerfiladorMuestreo.desde_entorno()
         Utils.clear()
-        self.__init_app()
+        with Utils.trazador.span('inicio'):
+            self.__init_app()
         self.main_loop()
 
     def __init_app(self):
@@ -507,101 +3137,59 @@ class App:
         Utils.clear()
 
     def __cargar_pokemos_desde_db(self):
-        pokemons_db = self.database.get_all_pokemons_by_user_id(self.id_jugador)
-        pokemons = []
+        pokemons_db = self.database.iter_pokemons_by_user_id(self.id_jugador)
+        primero = next(pokemons_db, None)
 
-        if len(pokemons_db) == 0:
+        if primero is None:
             self.elegir_inicial()
             return
-        
-        for pokemon in pokemons_db:
-            if pokemon[4] == 'Agua':
-                pokemon = Agua(
-                    nombre=pokemon[1],
-                    descripcion=pokemon[2],
-                    ataque=pokemon[5],
-                    defensa=pokemon[6],
-                    vida=pokemon[7],
-                    nivel=pokemon[8],
-                    evolucion=pokemon[3],
-                    atrapado=True,
-                    evoluciones_nombres=json.loads(pokemon[9]),
-                    pokemon_id=pokemon[0]
-                )
-                pokemons.append(pokemon)
-                continue
-            if pokemon[4] == 'Fuego':
-                pokemon = Fuego(
-                    nombre=pokemon[1],
-                    descripcion=pokemon[2],
-                    ataque=pokemon[5],
-                    defensa=pokemon[6],
-                    vida=pokemon[7],
-                    nivel=pokemon[8],
-                    evolucion=pokemon[3],
-                    atrapado=True,
-                    evoluciones_nombres=json.loads(pokemon[9]),
-                    pokemon_id=pokemon[0]
-                )
-                pokemons.append(pokemon)
-                continue
-            if pokemon[4] == 'Hierba':
-                pokemon = Hierba(
-                    nombre=pokemon[1],
-                    descripcion=pokemon[2],
-                    ataque=pokemon[5],
-                    defensa=pokemon[6],
-                    vida=pokemon[7],
-                    nivel=pokemon[8],
-                    evolucion=pokemon[3],
-                    atrapado=True,
-                    evoluciones_nombres=json.loads(pokemon[9]),
-                    pokemon_id=pokemon[0]
-                )
-                pokemons.append(pokemon)
-                continue
-            if pokemon[4] == 'Electrico':
-                pokemon = Electrico(
-                    nombre=pokemon[1],
-                    descripcion=pokemon[2],
-                    ataque=pokemon[5],
-                    defensa=pokemon[6],
-                    vida=pokemon[7],
-                    nivel=pokemon[8],
-                    evolucion=pokemon[3],
-                    atrapado=True,
-                    evoluciones_nombres=json.loads(pokemon[9]),
-                    pokemon_id=pokemon[0]
-                )
-                pokemons.append(pokemon)
-                continue
 
-        self.mi_pokemon = pokemons[0]
-        del pokemons[0]
-        self.pokemons_atrapados = pokemons
+        with Utils.trazador.span('partida.cargar'):
+            self.mi_pokemon = self.hidratador.pokemon(primero)
+            self.pokemons_atrapados = self.hidratador.roster(pokemons_db)
 
         Utils.print_title('Pokemones cargados')
-        for pokemon in pokemons_db:
-            Utils.print_title(f'Nombre: {pokemon[1]} | Ataque: {pokemon[5]} | Defensa {pokemon[6]} | Vida: {pokemon[7]} | Nivel: {pokemon[8]}')
+        Utils.print_title(f'Nombre: {self.mi_pokemon.nombre} | Ataque: {self.mi_pokemon.ataque} | Defensa {self.mi_pokemon.defensa} | Vida: {self.mi_pokemon.vida} | Nivel: {self.mi_pokemon.nivel}')
+        for nombre, ataque, defensa, vida, nivel in self.pokemons_atrapados.filas():
+            Utils.print_title(f'Nombre: {nombre} | Ataque: {ataque} | Defensa {defensa} | Vida: {vida} | Nivel: {nivel}')
         Utils.pause()
         Utils.clear()
 
+    def __navegacion(self, paginador: Paginador, opcion: int) -> dict:
+        # Imprime las opciones de pagina a partir del numero `opcion` y devuelve sus acciones
+        acciones = {}
+        if paginador.hay_siguiente:
+            print(f'[{opcion}] - Página siguiente')
+            acciones[opcion] = paginador.siguiente
+            opcion += 1
+        if paginador.hay_anterior:
+            print(f'[{opcion}] - Página anterior')
+            acciones[opcion] = paginador.anterior
+        return acciones
+
     def __seleccionar_guardado(self):
+        paginador = Paginador(self.database.get_users_page)
         while True:
-            usuarios = self.database.get_all_users()
+            usuarios = paginador.filas
             Utils.print_title('Seleccione una partida')
             for i, usuario in enumerate(usuarios):
                 print(f'[{i + 1}] - {usuario[1]} - {usuario[2]}')
 
             print(f'[{len(usuarios) + 1}] - Crear nueva partida')
             print(f'[{len(usuarios) + 2}] - Eliminar una partida')
+            navegacion = self.__navegacion(paginador, len(usuarios) + 3)
 
             try:
                 user_option = int(input('Seleccione el usuario\t'))
+                if user_option in navegacion:
+                    navegacion[user_option]()
+                    Utils.clear()
+                    continue
                 if user_option > 0 and user_option <= len(usuarios) + 2:
                     if len(usuarios) + 2 == user_option:
                         Utils.clear()
                         self.__eliminar_partida()
+                        paginador.cargar()
                         Utils.clear()
                         continue
                     break
@@ -623,16 +3211,22 @@ class App:
             Utils.clear()
 
     def __eliminar_partida(self):
-        usuarios = self.database.get_all_users()
+        paginador = Paginador(self.database.get_users_page)
         Utils.print_title('Seleccione una partida a eliminar')
 
         while True:
+            usuarios = paginador.filas
             for i, usuario in enumerate(usuarios):
                 print(f'[{i + 1}] - {usuario[1]} - {usuario[2]}')
 
             print(f'[{len(usuarios) + 1}] - Cancelar')
+            navegacion = self.__navegacion(paginador, len(usuarios) + 2)
             try:
                 user_delete = int(input('Seleccione el usuario\t'))
+                if user_delete in navegacion:
+                    navegacion[user_delete]()
+                    Utils.clear()
+                    continue
                 if user_delete > 0 and user_delete <= len(usuarios) + 1:
                     break
                 raise ValueError
@@ -685,12 +3279,7 @@ class App:
 
     def elegir_inicial(self):
         Utils.print_title("Elege tu Pokemon inicial")
-        opciones = [
-            ("Agua", Agua("Squirtle", "Pokemon tortuga", ataque=20, defensa=30, vida=100, nivel=1, evoluciones_nombres=["Squirtle", "Wartortle", "Blastoise"])),
-            ("Fuego", Fuego("Charmander", "Pokemon de fuego", ataque=25, defensa=20, vida=90, nivel=1, evoluciones_nombres=["Charmander", "Charmeleon", "Charizard"])),
-            ("Electrico", Electrico("Pichu", "Poemon electrico", ataque=18, defensa=18, vida=80, nivel=1, evoluciones_nombres=["Pichu", "Pikachu", "Raichu"])),
-            ("Hierba", Hierba("Bulbasaur", "Pokemon planta", ataque=22, defensa=22, vida=95, nivel=1, evoluciones_nombres=["Bulbasaur", "Ivysaur", "Venusaur"]))
-        ]
+        opciones = pokemons_iniciales()
         for idx, (tipo, poke) in enumerate(opciones, start = 1):
             print(f"{idx}. {tipo} - {poke.nombre} - Ataque {poke.ataque} | Defensa {poke.defensa} | Vida {poke.vida}")
         print("0. Salir")
@@ -719,28 +3308,30 @@ class App:
                 print("Ingresa un numero valido.")
 
     def _crear_enemigos_por_defecto(self) -> List[Agua | Fuego | Electrico | Hierba]:
-        e1 = Fuego("Enemigo Fuerte 1", "Firme y peligroso", ataque=80, defensa=80, vida=200, nivel=50)
-        e2 = Electrico("Enemigo Fuerte 2", "Agil y potente", ataque=70, defensa=60, vida=180, nivel=48)
-        e3 = Hierba("Enemigo Debil 1", "Tranquilo", ataque=20, defensa=20, vida=80, nivel=5)
-        e4 = Agua("Enemigo Debil 2", "Aguas calmadas", ataque=15, defensa=18, vida=70, nivel=4)
-        return [e1, e2, e3, e4]
+        return crear_enemigos_por_defecto()
 
     def __registros_combates(self):
-        registros = self.database.get_all_combates_by_user_id(self.id_jugador)
+        paginador = Paginador(lambda desde, limite: self.database.get_combates_page_by_user_id(self.id_jugador, desde, limite))
         
-        if len(registros) == 0:
+        if len(paginador.filas) == 0:
             Utils.print_title('No hay combates registrados')
             Utils.pause()
             return
             
         while True:
+            registros = paginador.filas
             Utils.print_title('Selecciona el combate a ver')
             for i, combate in enumerate(registros):
                 print(f'[{i+1}] : {combate[2][9:]}')
             print(f'[{len(registros)+1}] - Salir')
+            navegacion = self.__navegacion(paginador, len(registros) + 2)
             
             try:
                 opc = int(input('Selecciona una opción:\t'))
+                if opc in navegacion:
+                    navegacion[opc]()
+                    Utils.clear()
+                    continue
                 if opc < 1 or opc > len(registros) + 1:
                     raise ValueError
                 
@@ -787,8 +3378,8 @@ class App:
         
         while True:
             Utils.print_title('Selecciona el pokemon a usar')
-            for i, pokemon in enumerate(self.pokemons_atrapados):
-                print(f'{i + 1} - {pokemon.nombre}')
+            for i, nombre in enumerate(self.pokemons_atrapados.nombres):
+                print(f'{i + 1} - {nombre}')
             print(f'{len(self.pokemons_atrapados) + 1} - Salir')
             try:
                 opc = int(input('Seleccione\t'))
@@ -840,66 +3431,67 @@ class App:
                 continue
 
             Utils.clear()
-            if op == 1:
-                if self.mi_pokemon:
-                    self.mi_pokemon.detallesPokemon()
-                    Utils.pause()
-                else:
-                    print("No tienes Pokemon.")
-                    Utils.pause()
+            with Utils.trazador.span(f"menu.{self.ACCIONES_MENU[op]}", opcion=op):
+                if op == 1:
+                    if self.mi_pokemon:
+                        self.mi_pokemon.detallesPokemon()
+                        Utils.pause()
+                    else:
+                        print("No tienes Pokemon.")
+                        Utils.pause()
 
-            elif op == 2:
-                if self.mi_pokemon:
-                    self.mi_pokemon.hablar()
-                    Utils.pause()
-                else:
-                    print("No tienes Pokemon.")
-                    Utils.pause()
+                elif op == 2:
+                    if self.mi_pokemon:
+                        self.mi_pokemon.hablar()
+                        Utils.pause()
+                    else:
+                        print("No tienes Pokemon.")
+                        Utils.pause()
 
-            elif op == 3:
-                if self.mi_pokemon:
-                    self.menu_entrenamiento()
-                    Utils.pause()
-                else:
-                    print("No tienes Pokemon.")
-                    Utils.pause()
+                elif op == 3:
+                    if self.mi_pokemon:
+                        self.menu_entrenamiento()
+                        Utils.pause()
+                    else:
+                        print("No tienes Pokemon.")
+                        Utils.pause()
 
-            elif op == 4:
-                if self.mi_pokemon:
-                    self.menu_combatir()
-                    Utils.pause()
-                else:
-                    print("No tienes Pokemon.")
-                    Utils.pause()
+                elif op == 4:
+                    if self.mi_pokemon:
+                        self.menu_combatir()
+                        Utils.pause()
+                    else:
+                        print("No tienes Pokemon.")
+                        Utils.pause()
 
-            elif op == 5:
-                self.crear_pokemon_enemigo_manual()
+                elif op == 5:
+                    self.crear_pokemon_enemigo_manual()
 
-            elif op == 6:
-                self.VerPokemonsAtrapados()
+                elif op == 6:
+                    self.VerPokemonsAtrapados()
                 
-            elif op == 7:
-                self.pruebas_manejo_errores()
+                elif op == 7:
+                    self.pruebas_manejo_errores()
 
-            elif op == 8:
-                self.__registros_combates()
+                elif op == 8:
+                    self.__registros_combates()
             
-            elif op == 9:
-                self.__guardar_partida()
+                elif op == 9:
+                    self.__guardar_partida()
 
-            elif op == 10:
-                self.__seleccionar_guardado()
-                self.__cargar_pokemos_desde_db()
+                elif op == 10:
+                    self.__seleccionar_guardado()
+                    self.__cargar_pokemos_desde_db()
             
-            elif op == 11:
-                self.__cambiar_pokemon()
+                elif op == 11:
+                    self.__cambiar_pokemon()
 
-            elif op == 12:
-                print("Gracias por usar la Pokedex! Hasta luego.")
-                break
+                elif op == 12:
+                    print("Gracias por usar la Pokedex! Hasta luego.")
+                    break
 
-            else:
-                print("Opcion invalida")
+                else:
+                    print("Opcion invalida")
             Utils.clear()
 
     def __guardar_partida(self):
@@ -909,17 +3501,18 @@ class App:
             Utils.clear()
             return
 
-        if self.mi_pokemon.pokemon_id is not None:
-            self.database.put_pokemon_by_id(self.mi_pokemon)
-        for pokemon in self.pokemons_atrapados:
-            if pokemon.pokemon_id is not None:
-                self.database.put_pokemon_by_id(self.mi_pokemon)
-            else:
-                self.database.post_pokemon_by_id_user(self.id_jugador, pokemon)
+        with Utils.trazador.span('partida.guardar'):
+            # Solo se construyen y guardan los atrapados nuevos o modificados
+            pendientes = self.pokemons_atrapados.indices_pendientes()
+            atrapados = [self.pokemons_atrapados[i] for i in pendientes]
+            self.database.save_pokemons_by_id_user(self.id_jugador, [self.mi_pokemon] + atrapados)
+            # Los pokemons nuevos reciben su id al guardarse y todos quedan sin cambios
+            for i, pokemon in zip(pendientes, atrapados):
+                self.pokemons_atrapados[i] = pokemon
 
-        self.database.put_user_update_by_id(self.id_jugador)
+            self.database.put_user_update_by_id(self.id_jugador)
 
-        progreso = self.database.get_user_by_id(self.id_jugador)
+            progreso = self.database.get_user_by_id(self.id_jugador)
 
         Utils.print_title('Información Guardada para:')
         print(f'Usuario {progreso[1]}')
@@ -948,59 +3541,61 @@ class App:
                 continue
 
             Utils.clear()
-            if op == 1:
-                print(f"\nEntrenamiento Normal: actualiza ataque, defensa y nivel (al mismo tiempo)")
-                self.mi_pokemon.entrenar()
-                self.mi_pokemon.mostrar_datos()
-                Utils.pause()
+            with Utils.trazador.span(f"entrenamiento.{self.ACCIONES_ENTRENAMIENTO.get(op, 'invalida')}"):
+                if op == 1:
+                    print(f"\nEntrenamiento Normal: actualiza ataque, defensa y nivel (al mismo tiempo)")
+                    self.mi_pokemon.entrenar()
+                    self.mi_pokemon.mostrar_datos()
+                    Utils.pause()
                 
-            elif op == 2:
-                print("1. Subir Ataque")
-                print("2. Subir Defensa")
-                print("3. Subir Vida")
-                try:
-                    s = int(input("Elige:  "))
-                    if s == 1:
-                        self.mi_pokemon.subirAtaque()
-                    elif s == 2:
-                        self.mi_pokemon.subirDefensa()          
-                    elif s == 3:
-                        self.mi_pokemon.subirVida()
-                    else:
-                        print("Opcion invalida.")
-                except ValueError:
-                    print("Valor invalido.")
-                Utils.pause()
+                elif op == 2:
+                    print("1. Subir Ataque")
+                    print("2. Subir Defensa")
+                    print("3. Subir Vida")
+                    try:
+                        s = int(input("Elige:  "))
+                        if s == 1:
+                            self.mi_pokemon.subirAtaque()
+                        elif s == 2:
+                            self.mi_pokemon.subirDefensa()          
+                        elif s == 3:
+                            self.mi_pokemon.subirVida()
+                        else:
+                            print("Opcion invalida.")
+                    except ValueError:
+                        print("Valor invalido.")
+                    Utils.pause()
 
-            elif op == 3:
-                print("\nEntrenamiento Intensivo: actualiza ataque, defensa y vida con boost.")
-                self.mi_pokemon.actualizar()
-                self.mi_pokemon.mostrar_datos()
-                Utils.pause()
+                elif op == 3:
+                    print("\nEntrenamiento Intensivo: actualiza ataque, defensa y vida con boost.")
+                    self.mi_pokemon.actualizar()
+                    self.mi_pokemon.mostrar_datos()
+                    Utils.pause()
 
 
-            elif op == 4:
-                try:
-                    a = int(input("Ingresa nuevo valor de Ataque:  "))
-                    d = int(input("Ingresa nuevo valor de Defensa:  "))
-                    v = int(input("Ingresa nuevo valor de Vida:  "))
+                elif op == 4:
+                    try:
+                        a = int(input("Ingresa nuevo valor de Ataque:  "))
+                        d = int(input("Ingresa nuevo valor de Defensa:  "))
+                        v = int(input("Ingresa nuevo valor de Vida:  "))
                     
-                    self.mi_pokemon.ataque += a
-                    self.mi_pokemon.defensa += d
-                    self.mi_pokemon.vida += v
+                        self.mi_pokemon.ataque += a
+                        self.mi_pokemon.defensa += d
+                        self.mi_pokemon.vida += v
+                        self.mi_pokemon.marcar('ataque', 'defensa', 'vida')
                     
 
-                    print("Valores actualizados manualmente.")
-                except ValueError:
-                    print("Entrada invalida.")
+                        print("Valores actualizados manualmente.")
+                    except ValueError:
+                        print("Entrada invalida.")
 
-                self.mi_pokemon.mostrar_datos()
-                Utils.pause()
+                    self.mi_pokemon.mostrar_datos()
+                    Utils.pause()
                 
-            elif op == 0:
-                break
-            else: 
-                print("Opcion invalida.")
+                elif op == 0:
+                    break
+                else: 
+                    print("Opcion invalida.")
             Utils.clear()
 
     def select_enemy(self) -> Agua | Fuego | Hierba | Electrico:
@@ -1014,6 +3609,7 @@ class App:
         print("Deseas elegir un enemigo o que sea aleatoreamente?")
         print("1. Aleatorio")
         print("2. Elegir de la lista")
+        print("3. Ver probabilidades de victoria")
         print("0. Volver")
         try:
             choice = int(input("Elige:  "))
@@ -1024,6 +3620,9 @@ class App:
         Utils.clear()
         if choice == 0:
             return 
+        if choice == 3:
+            self.__mostrar_probabilidades()
+            return
         if choice == 1:
             enemigo = self.select_enemy()
         else:
@@ -1039,101 +3638,86 @@ class App:
         Utils.clear()
         self.combate_con_enemigo(enemigo)
 
+    def __mostrar_probabilidades(self):
+        if self.mi_pokemon is None:
+            return
+
+        Utils.print_title("PROBABILIDADES DE VICTORIA")
+        # En el proceso actual y con bloques chicos: con precision 0.02 alcanzan unos miles
+        # de combates por enemigo y no vale la pena arrancar un pool en cada visita al menu
+        estimaciones = estimar_probabilidades(self.mi_pokemon, self.enemigos, precision=0.02, max_simulaciones=100_000,
+                                              tamaño_bloque=500, procesos=1)
+        for i, est in enumerate(estimaciones, start = 1):
+            bajo, alto = est.intervalo_victoria
+            print(f"{i}. {est.enemigo.nombre} - Victoria {est.prob_victoria:.1%} ({bajo:.1%} - {alto:.1%}) | Turnos {est.turnos_esperados:.1f} | Vida restante {est.vida_esperada:.1f}")
+
     def combate_con_enemigo(self, enemigo: Agua | Fuego | Hierba | Electrico):
         if self.mi_pokemon is None:
             return
 
+        mi_pokemon = self.mi_pokemon
         data_combate = []
-        data_combate.append(f'Combate contra enemigo {self.mi_pokemon.nombre} - {enemigo.nombre}')
+        data_combate.append(f'Combate contra enemigo {mi_pokemon.nombre} - {enemigo.nombre}')
 
-        mi_def = self.mi_pokemon.defensa
-        mi_vida = self.mi_pokemon.vida
-        en_def = enemigo.defensa
-        en_vida = enemigo.vida
-        turno_jugador = True
+        # Span del turno en curso: lo abre mostrar_estado y lo cierra fin_turno
+        turno = [None]
 
-        while (mi_vida > 0) and (en_vida > 0):
+        def mostrar_estado(mi_def: int, mi_vida: int, en_def: int, en_vida: int, turno_jugador: bool):
+            turno[0] = Utils.trazador.iniciar('combate.turno', jugador=turno_jugador)
             Utils.print_title("COMBATE - ESTADO ")
             print("Tu Pokemon:  ")
-            print(f"{self.mi_pokemon.nombre} | Ataque: {self.mi_pokemon.ataque} | Defensa:{mi_def} | Vida: {mi_vida}")
+            print(f"{mi_pokemon.nombre} | Ataque: {mi_pokemon.ataque} | Defensa:{mi_def} | Vida: {mi_vida}")
             print("-" * 40)
             print("Enemigo:  ")
             print(f"{enemigo.nombre} | Ataque: {enemigo.ataque} | Defensa: {en_def} | Vida: {en_vida}")
             print("-" * 40)
 
-            if turno_jugador:
-                print("Tu turno: elige una accion")
-                print("1. Pasar turno")
-                print("2. Ataque normal")
-                print("3. Ataque especial")
-                print("4. Huir")
-
-                try:
-                    op = int(input("Elige:  "))
-                except ValueError:
-                    print("Entrada invalida, se considera pasar turno.")
-                    op = 1
-
-                if op == 1:
-                    print("Pase el turno.")
-                    data_combate.append("Pase el turno.")
-
-                elif op == 2:
-                    en_def, en_vida = aplicar_daño(self.mi_pokemon.ataque, en_def, en_vida)
-                    print(f"Hiciste un ataque normal con {self.mi_pokemon.ataque}.")
-                    data_combate.append(f"Hiciste un ataque normal con {self.mi_pokemon.ataque}.")
+        def elegir_accion(mi_def: int, mi_vida: int, en_def: int, en_vida: int) -> int:
+            print("Tu turno: elige una accion")
+            print("1. Pasar turno")
+            print("2. Ataque normal")
+            print("3. Ataque especial")
+            print("4. Huir")
 
-                    mi_def, mi_vida = aplicar_daño(enemigo.ataque, mi_def, mi_vida)
-                    print(f"{enemigo.nombre} te contraataca ({enemigo.ataque}).")
-                    data_combate.append(f"{enemigo.nombre} te contraataca ({enemigo.ataque}).")
-
-                elif op == 3:
-                    atk_val = int(self.mi_pokemon.ataque * 1.5)
-                    en_def, en_vida = aplicar_daño(atk_val, en_def, en_vida)
-                    special = getattr(self.mi_pokemon, "ataque_especial", "Ataque Especial")
-                    print(f"{self.mi_pokemon.nombre} usa {special} ({atk_val} dmg).")
-                    data_combate.append(f"{self.mi_pokemon.nombre} usa {special} ({atk_val} dmg).")
+            try:
+                op = int(input("Elige:  "))
+            except ValueError:
+                print("Entrada invalida, se considera pasar turno.")
+                op = ACCION_PASAR
 
-                    mi_def, mi_vida = aplicar_daño(enemigo.ataque, mi_def, mi_vida)
-                    print(f"{enemigo.nombre} te contraataca ({enemigo.ataque}).")
-                    data_combate.append(f"{enemigo.nombre} te contraataca ({enemigo.ataque}).")
+            if op < ACCION_PASAR or op > ACCION_HUIR:
+                print("Opcion invalida, se considera pasar turno.")
+            return op
 
-                elif op == 4:
-                    print("Huyes del combate.")
-                    Utils.pause()
-                    return
-                    
-                else:
-                    print("Opcion invalida, se considera pasar turno.")
-                    
-                turno_jugador = False
-            else:
-                choice = random.choice([1, 2, 3])
-                
-                if choice == 1:
-                    print(f"{enemigo.nombre} pasa el turno.")
-                    data_combate.append(f"{enemigo.nombre} pasa el turno.")
-
-                elif choice == 2:
-                    mi_def, mi_vida = aplicar_daño(enemigo.ataque, mi_def, mi_vida)
-                    print(f" {enemigo.nombre} te golpea con ataque normal ({enemigo.ataque}).")
-                    data_combate.append(f" {enemigo.nombre} te golpea con ataque normal ({enemigo.ataque}).")
-
-                elif choice == 3:
-                    atk_val = int(enemigo.ataque * 1.5)
-                    mi_def, mi_vida = aplicar_daño(atk_val, mi_def, mi_vida)
-                    special = getattr(enemigo, "ataque_especial", "Atgaque Especial")
-                    print(f"{enemigo.nombre} usa {special} ({atk_val} dmg).")
-                    data_combate.append(f"{enemigo.nombre} usa {special} ({atk_val} dmg).")
-
-                turno_jugador = True
+        def narrar(evento: Tuple[int, str, int, int]):
+            mensaje = narrar_evento(mi_pokemon, enemigo, evento)
+            if mensaje is None:
+                print("Huyes del combate.")
+                return
+            print(mensaje)
+            data_combate.append(mensaje)
 
+        def fin_turno():
             Utils.pause()
             Utils.clear()
+            Utils.trazador.terminar(turno[0])
+            turno[0] = None
+
+        motor = MotorCombate(elegir_accion, politica_aleatoria(), registrar_eventos=False)
+        with Utils.trazador.span('combate', enemigo=enemigo.nombre):
+            resultado = motor.combatir(mi_pokemon, enemigo, mostrar_estado, narrar, fin_turno)
+            # Huir termina el combate sin pasar por fin_turno
+            Utils.trazador.terminar(turno[0])
 
+        if resultado.huyo:
+            Utils.pause()
+            return
 
         Utils.clear()
-        if en_vida <= 0:
+        if resultado.empate:
+            print("Nadie pudo vencer: el combate termina en empate.")
+            data_combate.append("Nadie pudo vencer: el combate termina en empate.")
+        elif resultado.ganador == 'jugador':
             print("Has derrotado al enemigo!")
             data_combate.append("Has derrotado al enemigo!")
             if enemigo.vida < self.mi_pokemon.vida:
@@ -1161,22 +3745,7 @@ class App:
 
     def __guardar_combate(self, data: List[str]):
         try:
-            carpeta_combates = 'combates'
-            if not os.path.exists(carpeta_combates):
-                os.makedirs(carpeta_combates)
-        
-            fecha_actual = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-            nombre_archivo = f"{self.jugador_nombre}_{fecha_actual}.txt"
-            ruta_archivo = os.path.join(carpeta_combates, nombre_archivo)
-
-            with open(ruta_archivo, 'w', encoding='utf-8') as archivo:
-                archivo.write(f"REGISTRO DE COMBATE\n")
-                archivo.write(f"Jugador: {self.jugador_nombre}\n")
-                archivo.write(f"Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                archivo.write(f"{'='*50}\n\n")
-                
-                for linea in data:
-                    archivo.write(f"{linea}\n")
+            ruta_archivo = escribir_registro_combate(self.jugador_nombre, data)
             
             Utils.print_title(f"Combate guardado en: {ruta_archivo}")
 
@@ -1191,8 +3760,8 @@ class App:
         if not self.pokemons_atrapados:
             print("No has atrapado pokemons aun. ")
         else:
-            for i, p in enumerate(self.pokemons_atrapados, start = 1):
-                print(f"{i}. {p.nombre} - Ataque: {p.ataque} Defensa:{p.defensa} Vida:{p.vida} Nivel:{p.nivel}")
+            for i, (nombre, ataque, defensa, vida, nivel) in enumerate(self.pokemons_atrapados.filas(), start = 1):
+                print(f"{i}. {nombre} - Ataque: {ataque} Defensa:{defensa} Vida:{vida} Nivel:{nivel}")
         Utils.pause()
 
     def crear_pokemon_enemigo_manual(self):
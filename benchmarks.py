@@ -0,0 +1,532 @@
+from __future__ import annotations
+import os
+import sys
+import tempfile
+import time
+import json
+import threading
+import tracemalloc
+import gc
+import asyncio
+import statistics
+import argparse
+import contextlib
+import platform
+import random
+import sqlite3
+from typing import List
+
+from app import (
+    DataBase, DataBaseAsync, Agua, Fuego, Electrico, Hierba, HidratadorPokemons, Renderizador,
+    MotorCombate, aplicar_daño, politica_fija, politica_aleatoria, narrar_evento, ACCION_ESPECIAL, Roster,
+)
+
+POKEMONS_POR_USUARIO = 10
+
+
+def _poblar(db: DataBase, filas: int):
+    # Llena pokemons, user_pokemons y battles con `filas` registros cada una
+    usuarios = max(1, filas // POKEMONS_POR_USUARIO)
+    id_species = db._id_especie(["Squirtle", "Wartortle", "Blastoise"])
+    with db.conexion:
+        db.cursor.executemany("INSERT INTO users (user) VALUES(?)", ((f"usuario_{i}",) for i in range(usuarios)))
+        db.cursor.executemany(
+            "INSERT INTO pokemons (name, description, evolution, type, damage, defense, health, level, id_species) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (("Squirtle", "Pokemon tortuga", 1, "Agua", 20, 30, 100, 1, id_species) for _ in range(filas))
+        )
+        db.cursor.executemany(
+            "INSERT INTO user_pokemons (id_user, id_pokemon) VALUES(?, ?)",
+            ((i // POKEMONS_POR_USUARIO + 1, i + 1) for i in range(filas))
+        )
+        db.cursor.executemany(
+            "INSERT INTO battles (id_user, txt_route) VALUES(?, ?)",
+            ((i // POKEMONS_POR_USUARIO + 1, f"combates/usuario_{i}.txt") for i in range(filas))
+        )
+    return usuarios
+
+
+def _medir(funcion, argumentos: List, repeticiones: int) -> float:
+    # Latencia media en microsegundos
+    inicio = time.perf_counter()
+    for i in range(repeticiones):
+        funcion(argumentos[i % len(argumentos)])
+    return (time.perf_counter() - inicio) / repeticiones * 1e6
+
+
+def bench_busquedas_por_usuario(tamaños: List[int], repeticiones: int = 500):
+    print(f"{'filas':>12} {'pokemons (us)':>15} {'combates (us)':>15}")
+    directorio_original = os.getcwd()
+    for filas in tamaños:
+        with tempfile.TemporaryDirectory() as directorio:
+            os.chdir(directorio)
+            try:
+                db = DataBase()
+                usuarios = _poblar(db, filas)
+                ids = [1 + (i * 7919) % usuarios for i in range(repeticiones)]
+                pokemons = _medir(db.get_all_pokemons_by_user_id, ids, repeticiones)
+                combates = _medir(db.get_all_combates_by_user_id, ids, repeticiones)
+                db.close()
+            finally:
+                os.chdir(directorio_original)
+        print(f"{filas:>12} {pokemons:>15.1f} {combates:>15.1f}")
+
+
+def bench_lectores_concurrentes(hilos: List[int], segundos: float = 2.0, filas: int = 100_000):
+    # Un escritor insertando combates sin parar y N hilos lectores; en WAL las
+    # lecturas no esperan al escritor, asi que el total debe crecer con los hilos
+    print(f"{'lectores':>10} {'lecturas/s':>12} {'escrituras/s':>14}")
+    directorio_original = os.getcwd()
+    with tempfile.TemporaryDirectory() as directorio:
+        os.chdir(directorio)
+        try:
+            db = DataBase()
+            usuarios = _poblar(db, filas)
+            for n in hilos:
+                fin = time.perf_counter() + segundos
+                lecturas = [0] * n
+                escrituras = [0]
+
+                def lector(i: int):
+                    while time.perf_counter() < fin:
+                        db.get_all_combates_by_user_id(1 + (lecturas[i] * 7919 + i) % usuarios)
+                        db.get_user_by_id(1 + lecturas[i] % usuarios)
+                        lecturas[i] += 1
+
+                def escritor():
+                    while time.perf_counter() < fin:
+                        db.post_combate(1 + escrituras[0] % usuarios, "combates/estres.txt")
+                        escrituras[0] += 1
+
+                trabajadores = [threading.Thread(target=lector, args=(i,)) for i in range(n)]
+                trabajadores.append(threading.Thread(target=escritor))
+                for t in trabajadores:
+                    t.start()
+                for t in trabajadores:
+                    t.join()
+                print(f"{n:>10} {sum(lecturas) / segundos:>12.0f} {escrituras[0] / segundos:>14.0f}")
+            db.close()
+        finally:
+            os.chdir(directorio_original)
+
+
+def bench_memoria_pokemon(n: int = 100_000):
+    # Bytes por instancia al hidratar n pokemons como lo hace __cargar_pokemos_desde_db
+    print(f"{'tipo':>10} {'bytes/instancia':>16}")
+    for clase, evoluciones in (
+        (Agua, '["Squirtle", "Wartortle", "Blastoise"]'),
+        (Fuego, '["Charmander", "Charmeleon", "Charizard"]'),
+        (Electrico, '["Pichu", "Pikachu", "Raichu"]'),
+        (Hierba, '["Bulbasaur", "Ivysaur", "Venusaur"]'),
+    ):
+        gc.collect()
+        tracemalloc.start()
+        pokemons = [
+            clase(descripcion="Pokemon", ataque=20 + i % 50, defensa=30, vida=100, nivel=i % 99 + 1, atrapado=True, evoluciones_nombres=json.loads(evoluciones))
+            for i in range(n)
+        ]
+        usado, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{clase.__name__:>10} {usado / len(pokemons):>16.1f}")
+
+
+def bench_hidratacion(filas: int = 100_000):
+    # Cargar una partida de `filas` pokemons: lectura de SQLite contra construccion de objetos
+    directorio_original = os.getcwd()
+    with tempfile.TemporaryDirectory() as directorio:
+        os.chdir(directorio)
+        try:
+            db = DataBase()
+            _poblar(db, filas)
+            with db.conexion:
+                db.cursor.execute("UPDATE user_pokemons SET id_user = 1")
+
+            inicio = time.perf_counter()
+            pokemons_db = db.get_all_pokemons_by_user_id(1)
+            lectura = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            HidratadorPokemons().pokemons(pokemons_db)
+            objetos = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            HidratadorPokemons().roster(pokemons_db)
+            perezosa = time.perf_counter() - inicio
+            db.close()
+        finally:
+            os.chdir(directorio_original)
+    print(f"filas: {len(pokemons_db)}")
+    print(f"lectura SQLite      : {lectura * 1000:10.1f} ms")
+    print(f"hidratacion objetos : {objetos * 1000:10.1f} ms")
+    print(f"hidratacion roster  : {perezosa * 1000:10.1f} ms")
+
+
+
+def bench_sesiones_async(sesiones: List[int], guardados: int = 5, pausa: float = 0.25):
+    # N corrutinas que guardan cada `pausa` segundos: el escritor agrupa las escrituras
+    # pendientes en un commit, asi que la latencia por guardado se mantiene mientras
+    # el total no sature la CPU
+    print(f"{'sesiones':>10} {'p50 (ms)':>10} {'p99 (ms)':>10} {'escrituras/s':>14} {'por commit':>12}")
+    directorio_original = os.getcwd()
+    for n in sesiones:
+        with tempfile.TemporaryDirectory() as directorio:
+            os.chdir(directorio)
+            try:
+                latencias, total, db = asyncio.run(_correr_sesiones(n, guardados, pausa))
+            finally:
+                os.chdir(directorio_original)
+        latencias.sort()
+        p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))]
+        print(f"{n:>10} {statistics.median(latencias) * 1000:>10.2f} {p99 * 1000:>10.2f} "
+              f"{db.escrituras / total:>14.0f} {db.escrituras / max(1, db.commits):>12.1f}")
+
+
+async def _correr_sesiones(n: int, guardados: int, pausa: float):
+    db = DataBaseAsync()
+    latencias: List[float] = []
+
+    async def sesion(i: int):
+        # Las sesiones arrancan desfasadas, como jugadores reales
+        await asyncio.sleep(pausa * i / n)
+        usuario = await db.post_new_user(f"jugador_{i}")
+        equipo = [Agua(descripcion="Pokemon", ataque=20, defensa=30, vida=100, atrapado=True) for _ in range(6)]
+        await db.save_pokemons_by_id_user(usuario[0], equipo)
+        for _ in range(guardados):
+            equipo[0].ataque += 10
+            equipo[0].marcar('ataque')
+            inicio = time.perf_counter()
+            await db.save_pokemons_by_id_user(usuario[0], equipo)
+            await db.post_combate(usuario[0], f"combates/jugador_{i}.txt")
+            latencias.append(time.perf_counter() - inicio)
+            await asyncio.sleep(pausa)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(sesion(i) for i in range(n)))
+    total = time.perf_counter() - inicio
+    await db.close()
+    return latencias, total, db
+
+
+def bench_renderizado(turnos: int = 200):
+    # Costo de UI por turno de combate (2 limpiezas y 1 pausa por turno, como combate_con_enemigo)
+    with open(os.devnull, 'w') as nulo:
+        inicio = time.perf_counter()
+        for _ in range(turnos):
+            for _ in range(2):
+                os.system("cls >NUL" if os.name == "nt" else "clear >/dev/null 2>&1")
+        sistema = (time.perf_counter() - inicio) / turnos
+
+        renderizador = Renderizador(salida=nulo, tty=True, interactivo=False)
+        inicio = time.perf_counter()
+        for _ in range(turnos):
+            renderizador.limpiar()
+            renderizador.limpiar()
+            renderizador.pausar()
+        ansi = (time.perf_counter() - inicio) / turnos
+    print(f"os.system clear : {sistema * 1e6:10.1f} us/turno")
+    print(f"ANSI renderer   : {ansi * 1e6:10.1f} us/turno")
+
+
+# Suite con linea base: cada caso da microsegundos por operacion y `suite` los junta en
+# un JSON que se puede comparar con una corrida anterior para cortar el build si algo
+# empeora mas que el umbral. Cada caso se mide en varias pasadas: se guarda la mejor y
+# la dispersion entre pasadas, y solo cuenta como regresion un cambio mayor que el
+# umbral mas la dispersion de la linea base.
+VERSION_SUITE = 2
+PASADAS_SUITE = 5
+TAMAÑOS_SUITE = [1_000, 100_000, 1_000_000]
+EVOLUCIONES_SUITE = {
+    Agua: ["Squirtle", "Wartortle", "Blastoise"],
+    Fuego: ["Charmander", "Charmeleon", "Charizard"],
+    Electrico: ["Pichu", "Pikachu", "Raichu"],
+    Hierba: ["Bulbasaur", "Ivysaur", "Venusaur"],
+}
+
+
+def _mejor_de(funcion, operaciones: int = 1, rondas: int = 5, minimo: float = 0.05) -> float:
+    # Microsegundos por operacion: ajusta las llamadas por ronda para que duren `minimo`
+    # segundos y se queda con la ronda mas rapida (la menos afectada por ruido)
+    llamadas = 1
+    while True:
+        inicio = time.perf_counter()
+        for _ in range(llamadas):
+            funcion()
+        duracion = time.perf_counter() - inicio
+        if duracion >= minimo:
+            break
+        llamadas *= 2
+    mejor = duracion
+    for _ in range(rondas - 1):
+        inicio = time.perf_counter()
+        for _ in range(llamadas):
+            funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor / (llamadas * operaciones) * 1e6
+
+
+def _mediana_por_llamada(funcion, argumentos, despues=None) -> float:
+    # Para operaciones que modifican la base: cada llamada con su propio argumento.
+    # despues(resultado) corre fuera de la medicion (por ejemplo, esperar un hilo)
+    tiempos = []
+    for argumento in argumentos:
+        inicio = time.perf_counter()
+        resultado = funcion(argumento)
+        tiempos.append(time.perf_counter() - inicio)
+        if despues is not None:
+            despues(resultado)
+    return statistics.median(tiempos) * 1e6
+
+
+def _caso_aplicar_daño() -> float:
+    rng = random.Random(0)
+    casos = [(rng.randint(1, 300), rng.randint(0, 200), rng.randint(0, 500)) for _ in range(1000)]
+
+    def lote():
+        for atacante, defensa, vida in casos:
+            aplicar_daño(atacante, defensa, vida)
+    return _mejor_de(lote, len(casos))
+
+
+def _caso_combate() -> float:
+    # Igual que combate_con_enemigo sin terminal: jugador con ataque especial, enemigo
+    # aleatorio y cada evento narrado para el registro del combate
+    mi_pokemon = Agua(descripcion="Pokemon", ataque=40, defensa=30, vida=200, atrapado=True, evoluciones_nombres=EVOLUCIONES_SUITE[Agua])
+    enemigo = Fuego(descripcion="Pokemon", ataque=35, defensa=25, vida=220, evoluciones_nombres=EVOLUCIONES_SUITE[Fuego])
+
+    def combate():
+        data_combate = []
+        rng = random.Random(0)
+        motor = MotorCombate(politica_fija(ACCION_ESPECIAL), politica_aleatoria(rng), rng, registrar_eventos=False)
+        motor.combatir(mi_pokemon, enemigo, al_evento=lambda evento: data_combate.append(narrar_evento(mi_pokemon, enemigo, evento)))
+    return _mejor_de(combate)
+
+
+def _caso_entrenar(veces: int = 100) -> float:
+    def entrenamientos():
+        pokemon = Agua(descripcion="Pokemon", ataque=20, defensa=30, vida=100, atrapado=True, evoluciones_nombres=EVOLUCIONES_SUITE[Agua])
+        for _ in range(veces):
+            pokemon.entrenar()
+    with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+        return _mejor_de(entrenamientos, veces)
+
+
+def _caso_subir_nivel(veces: int = 100) -> float:
+    def subidas():
+        pokemon = Agua(descripcion="Pokemon", ataque=20, defensa=30, vida=100, atrapado=True, evoluciones_nombres=EVOLUCIONES_SUITE[Agua])
+        for _ in range(veces):
+            pokemon.subir_nivel(10)
+    return _mejor_de(subidas, veces)
+
+
+def _caso_construccion(clase) -> float:
+    evoluciones = EVOLUCIONES_SUITE[clase]
+
+    def construir():
+        for i in range(100):
+            clase(descripcion="Pokemon", ataque=20 + i, defensa=30, vida=100, nivel=i % 99 + 1, atrapado=True, evoluciones_nombres=evoluciones)
+    return _mejor_de(construir, 100)
+
+
+def _filas_pokemons(n: int) -> List[tuple]:
+    # Filas con el formato de COLUMNAS_POKEMON, como las devuelve get_all_pokemons_by_user_id
+    tipos = list(EVOLUCIONES_SUITE)
+    return [
+        (i + 1, EVOLUCIONES_SUITE[tipos[i % 4]][0], "Pokemon", 1, tipos[i % 4].tipo, 20 + i % 50, 30, 100, i % 99 + 1, json.dumps(EVOLUCIONES_SUITE[tipos[i % 4]]))
+        for i in range(n)
+    ]
+
+
+def _casos_hidratacion(filas: int = 10_000):
+    pokemons_db = _filas_pokemons(filas)
+
+    def pasada() -> dict:
+        return {
+            'hidratacion.objetos': _mejor_de(lambda: HidratadorPokemons().pokemons(pokemons_db), filas, rondas=3),
+            'hidratacion.roster': _mejor_de(lambda: HidratadorPokemons().roster(pokemons_db), filas, rondas=3),
+        }
+    return pasada
+
+
+METODOS_DB = ('get_all_pokemons_by_user_id', 'post_combate', 'post_pokemon_by_id_user', 'delete_user_by_id')
+
+
+def _esperar_hilo(hilo):
+    if hilo is not None:
+        hilo.join()
+
+
+class _CasosDatabase:
+    # La base se llena una vez; cada llamada es una pasada que mide todos los metodos.
+    # Se crea con el directorio de trabajo en una carpeta temporal.
+    def __init__(self, filas: int, repeticiones: int = 200, pasadas: int = PASADAS_SUITE):
+        self.filas = filas
+        self.repeticiones = repeticiones
+        self.db = DataBase(f'suite_{filas}.db')
+        self.usuarios = _poblar(self.db, filas)
+        self.rng = random.Random(filas)
+        # Cada borrado necesita un usuario distinto que todavia exista
+        borrables = self.rng.sample(range(1, self.usuarios + 1), min(repeticiones * pasadas, self.usuarios))
+        por_pasada = len(borrables) // pasadas
+        self.borrables = [borrables[i * por_pasada:(i + 1) * por_pasada] for i in range(pasadas)]
+
+    def __call__(self) -> dict:
+        db = self.db
+        ids = [self.rng.randint(1, self.usuarios) for _ in range(self.repeticiones)]
+        nuevos = [Agua(descripcion="Pokemon", ataque=20, defensa=30, vida=100, atrapado=True, evoluciones_nombres=EVOLUCIONES_SUITE[Agua]) for _ in ids]
+        resultados = {
+            'get_all_pokemons_by_user_id': _mediana_por_llamada(db.get_all_pokemons_by_user_id, ids),
+            'post_combate': _mediana_por_llamada(lambda id_user: db.post_combate(id_user, "combates/suite.txt"), ids),
+            'post_pokemon_by_id_user': _mediana_por_llamada(lambda i: db.post_pokemon_by_id_user(ids[i], nuevos[i]), range(len(ids))),
+            # El hilo de limpieza de archivos termina antes de la siguiente medicion
+            'delete_user_by_id': _mediana_por_llamada(db.delete_user_by_id, self.borrables.pop(0), despues=_esperar_hilo),
+        }
+        return {f"db.{metodo}[{self.filas}]": valor for metodo, valor in resultados.items()}
+
+    def cerrar(self):
+        self.db.close()
+
+
+def correr_suite(tamaños: List[int] | None = None, filtro: str | None = None, pasadas: int = PASADAS_SUITE) -> dict:
+    casos = {
+        'aplicar_daño': _caso_aplicar_daño,
+        'combate': _caso_combate,
+        'pokemon.entrenar': _caso_entrenar,
+        'pokemon.subir_nivel': _caso_subir_nivel,
+        **{f'construir.{clase.__name__}': (lambda clase=clase: _caso_construccion(clase)) for clase in EVOLUCIONES_SUITE},
+    }
+    # Cada corrida mide una pasada y devuelve {caso: us/op}
+    corridas = [
+        (lambda nombre=nombre, caso=caso: {nombre: caso()})
+        for nombre, caso in casos.items() if filtro is None or filtro in nombre
+    ]
+    if filtro is None or any(filtro in nombre for nombre in ('hidratacion.objetos', 'hidratacion.roster')):
+        corridas.append(_casos_hidratacion())
+
+    # Las pasadas se intercalan entre todos los casos: si la maquina se pone mas lenta
+    # durante unos segundos afecta a una pasada de cada caso y no a todas las de uno
+    muestras: dict = {}
+    bases: List[_CasosDatabase] = []
+    directorio_original = os.getcwd()
+    with tempfile.TemporaryDirectory() as directorio:
+        os.chdir(directorio)
+        try:
+            if filtro is None or any(filtro in f"db.{metodo}[" for metodo in METODOS_DB):
+                bases = [_CasosDatabase(filas, pasadas=pasadas) for filas in tamaños or TAMAÑOS_SUITE]
+            for _ in range(pasadas):
+                for corrida in corridas + bases:
+                    for nombre, valor in corrida().items():
+                        muestras.setdefault(nombre, []).append(valor)
+        finally:
+            for base in bases:
+                base.cerrar()
+            os.chdir(directorio_original)
+    if filtro is not None:
+        muestras = {nombre: valores for nombre, valores in muestras.items() if filtro in nombre}
+
+    return {
+        'version': VERSION_SUITE,
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'unidad': 'us/op',
+        'pasadas': pasadas,
+        # La mejor pasada de cada caso y cuanto mas lenta fue la peor, en %
+        'resultados': {nombre: min(valores) for nombre, valores in muestras.items()},
+        'dispersion': {nombre: _dispersion(valores) for nombre, valores in muestras.items()},
+    }
+
+
+def _dispersion(valores: List[float]) -> float:
+    mejor = min(valores)
+    return (max(valores) - mejor) / mejor * 100 if mejor else 0.0
+
+
+def comparar_suite(actual: dict, base: dict, umbral: float) -> List[str]:
+    # Imprime la comparacion y devuelve los casos que empeoraron mas de `umbral` por ciento
+    # mas la dispersion que la linea base midio para el caso. La dispersion de la corrida
+    # actual no cuenta: una corrida ruidosa o mas lenta no puede ampliar su propio margen
+    regresiones = []
+    print(f"{'caso':<45} {'base (us)':>12} {'actual (us)':>12} {'cambio':>9} {'tolerancia':>11}")
+    for nombre, valor in actual['resultados'].items():
+        anterior = base['resultados'].get(nombre)
+        if anterior is None:
+            print(f"{nombre:<45} {'-':>12} {valor:>12.2f} {'nuevo':>9}")
+            continue
+        cambio = (valor - anterior) / anterior * 100 if anterior else 0.0
+        # Las lineas base de la version 1 no tienen dispersion
+        tolerancia = umbral + base.get('dispersion', {}).get(nombre, 0.0)
+        marca = ''
+        if cambio > tolerancia:
+            regresiones.append(nombre)
+            marca = '  REGRESION'
+        print(f"{nombre:<45} {anterior:>12.2f} {valor:>12.2f} {cambio:>+8.1f}% {tolerancia:>10.1f}%{marca}")
+    return regresiones
+
+
+def main_suite(argumentos: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog='benchmarks.py suite')
+    parser.add_argument('--salida', help='archivo JSON donde guardar los resultados')
+    parser.add_argument('--base', help='JSON de una corrida anterior para comparar')
+    parser.add_argument('--umbral', type=float, default=10.0, help='porcentaje de empeoramiento que cuenta como regresion')
+    parser.add_argument('--filas', type=int, nargs='+', help=f'tamaños de la base (por defecto {TAMAÑOS_SUITE})')
+    parser.add_argument('--filtro', help='solo los casos cuyo nombre contenga este texto')
+    parser.add_argument('--pasadas', type=int, default=PASADAS_SUITE, help='mediciones por caso; se compara la mejor')
+    opciones = parser.parse_args(argumentos)
+
+    actual = correr_suite(opciones.filas, opciones.filtro, opciones.pasadas)
+    if opciones.salida:
+        with open(opciones.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(actual, archivo, indent=2, ensure_ascii=False)
+
+    if not opciones.base:
+        print(json.dumps(actual, indent=2, ensure_ascii=False))
+        return 0
+
+    with open(opciones.base, 'r', encoding='utf-8') as archivo:
+        base = json.load(archivo)
+    regresiones = comparar_suite(actual, base, opciones.umbral)
+    if regresiones:
+        print(f"Error: {len(regresiones)} casos empeoraron mas de {opciones.umbral}% mas la dispersion de la base: {', '.join(regresiones)}")
+        return 1
+    return 0
+
+
+def bench_entrenamiento(pasos: int = 1_000_000, equipo: int = 100_000):
+    with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+        pokemon = Agua(descripcion="Pokemon", ataque=20, defensa=30, vida=100, atrapado=True)
+        inicio = time.perf_counter()
+        for _ in range(pasos):
+            pokemon.entrenar()
+        secuencial = time.perf_counter() - inicio
+    pokemon = Agua(descripcion="Pokemon", ataque=20, defensa=30, vida=100, atrapado=True)
+    inicio = time.perf_counter()
+    pokemon.entrenar_varias(pasos)
+    cerrado = time.perf_counter() - inicio
+
+    roster = Roster([Agua(descripcion="Pokemon", ataque=20, defensa=30, vida=100, nivel=i % 99 + 1, atrapado=True) for i in range(equipo)])
+    inicio = time.perf_counter()
+    roster.entrenar(pasos)
+    vectorizado = time.perf_counter() - inicio
+    print(f"{pasos} x entrenar()       : {secuencial * 1000:12.1f} ms")
+    print(f"entrenar_varias({pasos}) : {cerrado * 1e6:12.1f} us")
+    print(f"Roster.entrenar, {equipo} pokemons : {vectorizado * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["suite"]:
+        sys.exit(main_suite(sys.argv[2:]))
+    elif sys.argv[1:2] == ["entrenamiento"]:
+        # La equivalencia con entrenar() se verifica en test_entrenamiento.py
+        bench_entrenamiento(*[int(t) for t in sys.argv[2:4]])
+    elif sys.argv[1:2] == ["concurrencia"]:
+        bench_lectores_concurrentes([int(t) for t in sys.argv[2:]] or [1, 2, 4, 8])
+    elif sys.argv[1:2] == ["hidratacion"]:
+        bench_hidratacion(*[int(t) for t in sys.argv[2:3]])
+    elif sys.argv[1:2] == ["async"]:
+        bench_sesiones_async([int(t) for t in sys.argv[2:]] or [1, 10, 100, 1000])
+    elif sys.argv[1:2] == ["render"]:
+        bench_renderizado(*[int(t) for t in sys.argv[2:3]])
+    elif sys.argv[1:2] == ["memoria"]:
+        bench_memoria_pokemon(*[int(t) for t in sys.argv[2:3]])
+    else:
+        tamaños = [int(t) for t in sys.argv[1:]] or [1_000, 10_000, 100_000, 1_000_000]
+        bench_busquedas_por_usuario(tamaños)
@@ -0,0 +1,512 @@
+from __future__ import annotations
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from collections import Counter, OrderedDict
+from copy import deepcopy
+from itertools import count
+from typing import List, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+from app import (
+    DataBaseAsync, HidratadorPokemons, MotorCombate, Agua, Fuego, Electrico, Hierba,
+    politica_fija, politica_aleatoria, pokemons_iniciales, crear_enemigos_por_defecto,
+    narrar_evento, escribir_registro_combate,
+    ACCION_PASAR, ACCION_NORMAL, ACCION_ESPECIAL,
+)
+
+# API JSON local sobre HTTP/1.1 con keep-alive. Cada jugador tiene una partida en
+# memoria (su pokemon principal y los atrapados); entrenar y combatir la modifican
+# y POST /usuarios/{id}/guardar solo escribe los cambios pendientes. Las partidas
+# inactivas o que sobran (LRU) se sueltan, guardando antes sus cambios pendientes.
+#
+#   GET  /enemigos
+#   GET  /usuarios?despues=0&limite=20
+#   POST /usuarios                      {"nombre": "ash", "inicial": "Agua"}
+#   GET  /usuarios/{id}                 carga la partida
+#   GET  /usuarios/{id}/pokemons
+#   POST /usuarios/{id}/entrenar        {"modo": "normal|ataque|defensa|vida|intensivo", "pokemon_id": null}
+#   POST /usuarios/{id}/combates        {"enemigo": 0, "accion": "especial", "atrapar": false}
+#   POST /usuarios/{id}/guardar
+#   GET  /usuarios/{id}/combates?despues=0&limite=20
+#   GET  /usuarios/{id}/combates/{id_combate}
+
+ACCIONES = {'pasar': ACCION_PASAR, 'normal': ACCION_NORMAL, 'especial': ACCION_ESPECIAL}
+ESTADOS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+MAX_CUERPO = 1 << 20
+
+
+class ErrorApi(Exception):
+    def __init__(self, estado: int, mensaje: str):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.mensaje = mensaje
+
+
+class Partida:
+    # Estado en memoria de un jugador; el candado serializa sus operaciones
+    def __init__(self, usuario: Tuple, pokemons: List[Agua | Fuego | Electrico | Hierba]):
+        self.usuario = usuario
+        self.pokemons = pokemons
+        self.candado = asyncio.Lock()
+        self.ultimo_uso = time.monotonic()
+
+    @property
+    def pendientes(self) -> List[Agua | Fuego | Electrico | Hierba]:
+        return [p for p in self.pokemons if p.pokemon_id is None or p.cambios]
+
+    @property
+    def mi_pokemon(self) -> Agua | Fuego | Electrico | Hierba | None:
+        return self.pokemons[0] if self.pokemons else None
+
+    def buscar(self, pokemon_id: int | None) -> Agua | Fuego | Electrico | Hierba:
+        if pokemon_id is None:
+            if self.mi_pokemon is None:
+                raise ErrorApi(400, 'La partida no tiene pokemon inicial')
+            return self.mi_pokemon
+        for pokemon in self.pokemons:
+            if pokemon.pokemon_id == pokemon_id:
+                return pokemon
+        raise ErrorApi(404, f'Pokemon {pokemon_id} no encontrado')
+
+
+def pokemon_json(pokemon: Agua | Fuego | Electrico | Hierba) -> dict:
+    return {
+        'id': pokemon.pokemon_id,
+        'nombre': pokemon.nombre,
+        'tipo': pokemon.tipo,
+        'ataque': pokemon.ataque,
+        'defensa': pokemon.defensa,
+        'vida': pokemon.vida,
+        'nivel': pokemon.nivel,
+        'evolucion': pokemon.evolucion,
+        'cambios': list(pokemon.campos_modificados()),
+    }
+
+
+def usuario_json(usuario: Tuple) -> dict:
+    return {'id': usuario[0], 'nombre': usuario[1], 'actualizado': usuario[2]}
+
+
+def combate_json(combate: Tuple) -> dict:
+    return {'id': combate[0], 'id_usuario': combate[1], 'ruta': combate[2], 'fecha': combate[3]}
+
+
+class ServidorPokedex:
+    def __init__(self, ruta: str = 'pokedex.db', semilla=None, max_partidas: int = 1000, inactividad: float = 900.0):
+        self.db = DataBaseAsync(ruta)
+        self.hidratador = HidratadorPokemons()
+        self.enemigos = crear_enemigos_por_defecto()
+        self.rng = random.Random(semilla)
+        # Partidas en memoria, de la menos a la mas usada
+        self.partidas: OrderedDict = OrderedDict()
+        self.max_partidas = max_partidas
+        self.inactividad = inactividad
+        self.peticiones = 0
+        self.__combates = count(1)
+        # Peticiones en curso por usuario; esas partidas no se sueltan
+        self.__en_uso: Counter = Counter()
+
+    # --- Partidas ---
+
+    async def __partida(self, id_user: int) -> Partida:
+        partida = self.partidas.get(id_user)
+        if partida is not None:
+            self.partidas.move_to_end(id_user)
+            partida.ultimo_uso = time.monotonic()
+            return partida
+        usuario = await self.db.get_user_by_id(id_user)
+        if usuario is None:
+            raise ErrorApi(404, f'Usuario {id_user} no encontrado')
+        filas = await self.db.get_all_pokemons_by_user_id(id_user)
+        # Otra peticion pudo cargarla mientras se esperaba a la base
+        partida = self.partidas.setdefault(id_user, Partida(usuario, self.hidratador.pokemons(filas)))
+        await self.__soltar_partidas()
+        return partida
+
+    async def __soltar_partidas(self):
+        # Sale la menos usada mientras sobren partidas, y toda partida inactiva por mas de
+        # `inactividad` segundos. Los cambios pendientes se guardan antes de soltarla.
+        ahora = time.monotonic()
+        for id_user, partida in list(self.partidas.items()):
+            if len(self.partidas) <= self.max_partidas and ahora - partida.ultimo_uso < self.inactividad:
+                break
+            if self.__en_uso[id_user] or self.partidas.get(id_user) is not partida:
+                continue
+            if partida.pendientes:
+                self.__en_uso[id_user] += 1
+                try:
+                    async with partida.candado:
+                        await self.__guardar_partida(id_user, partida)
+                except Exception as error:
+                    print(f"Error: no se pudo guardar la partida {id_user}: {error}")
+                    continue
+                finally:
+                    self.__en_uso[id_user] -= 1
+                # Pudo volver a usarse mientras se guardaba
+                if self.__en_uso[id_user] or partida.pendientes:
+                    continue
+            del self.__en_uso[id_user]
+            if self.partidas.get(id_user) is partida:
+                del self.partidas[id_user]
+
+    async def __guardar_partida(self, id_user: int, partida: Partida) -> Tuple[int, List[int]]:
+        pendientes = partida.pendientes
+        nuevos_ids = await self.db.save_pokemons_by_id_user(id_user, pendientes)
+        usuario = await self.db.put_user_update_by_id(id_user)
+        if usuario is not None:
+            partida.usuario = usuario
+        return len(pendientes), nuevos_ids
+
+    # --- Operaciones ---
+
+    async def listar_enemigos(self, consulta: dict, cuerpo: dict):
+        return 200, [dict(pokemon_json(e), indice=i) for i, e in enumerate(self.enemigos)]
+
+    async def listar_usuarios(self, consulta: dict, cuerpo: dict):
+        despues, limite = self.__pagina(consulta)
+        return 200, [usuario_json(u) for u in await self.db.get_users_page(despues, limite)]
+
+    async def crear_usuario(self, consulta: dict, cuerpo: dict):
+        nombre = str(cuerpo.get('nombre', '')).strip()
+        if not nombre:
+            raise ErrorApi(400, 'Falta el nombre de usuario')
+        iniciales = dict(pokemons_iniciales())
+        inicial = iniciales.get(cuerpo.get('inicial', 'Agua'))
+        if inicial is None:
+            raise ErrorApi(400, f"Inicial invalido, opciones: {', '.join(iniciales)}")
+        try:
+            usuario = await self.db.post_new_user_with_pokemon(nombre, inicial)
+        except sqlite3.IntegrityError:
+            raise ErrorApi(409, 'Este usuario ya existe')
+        self.partidas[usuario[0]] = Partida(usuario, [inicial])
+        await self.__soltar_partidas()
+        return 201, {'usuario': usuario_json(usuario), 'pokemon': pokemon_json(inicial)}
+
+    async def cargar_usuario(self, id_user: int, consulta: dict, cuerpo: dict):
+        partida = await self.__partida(id_user)
+        return 200, {'usuario': usuario_json(partida.usuario), 'pokemons': [pokemon_json(p) for p in partida.pokemons]}
+
+    async def listar_pokemons(self, id_user: int, consulta: dict, cuerpo: dict):
+        partida = await self.__partida(id_user)
+        return 200, [pokemon_json(p) for p in partida.pokemons]
+
+    async def entrenar(self, id_user: int, consulta: dict, cuerpo: dict):
+        partida = await self.__partida(id_user)
+        async with partida.candado:
+            pokemon = partida.buscar(cuerpo.get('pokemon_id'))
+            entrenamientos = {
+                'normal': pokemon.entrenar,
+                'ataque': pokemon.subirAtaque,
+                'defensa': pokemon.subirDefensa,
+                'vida': pokemon.subirVida,
+                'intensivo': pokemon.actualizar,
+            }
+            entrenamiento = entrenamientos.get(cuerpo.get('modo', 'normal'))
+            if entrenamiento is None:
+                raise ErrorApi(400, f"Modo invalido, opciones: {', '.join(entrenamientos)}")
+            # Los metodos de Pokemon narran por consola; el texto vuelve en la respuesta
+            salida = io.StringIO()
+            with contextlib.redirect_stdout(salida):
+                entrenamiento()
+        return 200, {'pokemon': pokemon_json(pokemon), 'mensaje': salida.getvalue().strip()}
+
+    async def combatir(self, id_user: int, consulta: dict, cuerpo: dict):
+        partida = await self.__partida(id_user)
+        indice = cuerpo.get('enemigo')
+        try:
+            enemigo = self.rng.choice(self.enemigos) if indice is None else self.enemigos[int(indice)]
+        except (ValueError, TypeError, IndexError):
+            raise ErrorApi(400, 'Enemigo invalido')
+        accion = ACCIONES.get(cuerpo.get('accion', 'especial'))
+        if accion is None:
+            raise ErrorApi(400, f"Accion invalida, opciones: {', '.join(ACCIONES)}")
+
+        async with partida.candado:
+            mi_pokemon = partida.buscar(None)
+            motor = MotorCombate(politica_fija(accion), politica_aleatoria(self.rng))
+            resultado = motor.combatir(mi_pokemon, enemigo)
+            data_combate = [f'Combate contra enemigo {mi_pokemon.nombre} - {enemigo.nombre}']
+            data_combate.extend(narrar_evento(mi_pokemon, enemigo, evento) for evento in resultado.eventos)
+            if resultado.empate:
+                data_combate.append("Nadie pudo vencer: el combate termina en empate.")
+            else:
+                data_combate.append("Has derrotado al enemigo!" if resultado.ganador == 'jugador' else "Has sido derrotado...")
+
+            atrapado = None
+            if resultado.ganador == 'jugador' and cuerpo.get('atrapar') and enemigo.vida < mi_pokemon.vida:
+                atrapado = deepcopy(enemigo)
+                atrapado.atrapado = True
+                partida.pokemons.append(atrapado)
+
+        # El archivo se escribe fuera del event loop; el sufijo evita choques en el mismo segundo
+        sufijo = f'_{next(self.__combates)}'
+        ruta = await asyncio.get_running_loop().run_in_executor(
+            None, escribir_registro_combate, partida.usuario[1], data_combate, 'combates', sufijo)
+        combate = await self.db.post_combate(id_user, ruta)
+        return 201, {
+            'combate': combate_json(combate),
+            'ganador': resultado.ganador,
+            'turnos': resultado.turnos,
+            'atrapado': pokemon_json(atrapado) if atrapado is not None else None,
+            'registro': data_combate,
+        }
+
+    async def guardar(self, id_user: int, consulta: dict, cuerpo: dict):
+        partida = await self.__partida(id_user)
+        async with partida.candado:
+            guardados, nuevos_ids = await self.__guardar_partida(id_user, partida)
+        return 200, {'usuario': usuario_json(partida.usuario), 'guardados': guardados, 'nuevos_ids': nuevos_ids}
+
+    async def listar_combates(self, id_user: int, consulta: dict, cuerpo: dict):
+        despues, limite = self.__pagina(consulta)
+        return 200, [combate_json(c) for c in await self.db.get_combates_page_by_user_id(id_user, despues, limite)]
+
+    async def leer_combate(self, id_user: int, id_combate: int, consulta: dict, cuerpo: dict):
+        combates = await self.db.get_combates_page_by_user_id(id_user, id_combate - 1, 1)
+        if not combates or combates[0][0] != id_combate:
+            raise ErrorApi(404, f'Combate {id_combate} no encontrado')
+        try:
+            contenido = await asyncio.get_running_loop().run_in_executor(None, self.__leer_archivo, combates[0][2])
+        except OSError:
+            contenido = None
+        return 200, dict(combate_json(combates[0]), contenido=contenido)
+
+    @staticmethod
+    def __leer_archivo(ruta: str) -> str:
+        with open(ruta, 'r', encoding='utf-8') as archivo:
+            return archivo.read()
+
+    @staticmethod
+    def __pagina(consulta: dict) -> Tuple[int, int]:
+        try:
+            despues = int(consulta.get('despues', ['0'])[0])
+            limite = min(100, max(1, int(consulta.get('limite', ['20'])[0])))
+        except ValueError:
+            raise ErrorApi(400, 'Parametros de pagina invalidos')
+        return despues, limite
+
+    # --- HTTP ---
+
+    def __ruta(self, metodo: str, partes: List[str]):
+        # Devuelve (operacion, argumentos de la ruta) o lanza ErrorApi
+        rutas = {
+            ('enemigos',): {'GET': self.listar_enemigos},
+            ('usuarios',): {'GET': self.listar_usuarios, 'POST': self.crear_usuario},
+            ('usuarios', '#'): {'GET': self.cargar_usuario},
+            ('usuarios', '#', 'pokemons'): {'GET': self.listar_pokemons},
+            ('usuarios', '#', 'entrenar'): {'POST': self.entrenar},
+            ('usuarios', '#', 'combates'): {'GET': self.listar_combates, 'POST': self.combatir},
+            ('usuarios', '#', 'guardar'): {'POST': self.guardar},
+            ('usuarios', '#', 'combates', '#'): {'GET': self.leer_combate},
+        }
+        patron = tuple('#' if parte.isdigit() else parte for parte in partes)
+        metodos = rutas.get(patron)
+        if metodos is None:
+            raise ErrorApi(404, 'Ruta no encontrada')
+        operacion = metodos.get(metodo)
+        if operacion is None:
+            raise ErrorApi(405, 'Metodo no permitido')
+        return operacion, [int(parte) for parte in partes if parte.isdigit()]
+
+    async def atender(self, metodo: str, objetivo: str, cuerpo_bytes: bytes) -> Tuple[int, object]:
+        url = urlsplit(objetivo)
+        partes = [parte for parte in url.path.split('/') if parte]
+        try:
+            operacion, argumentos = self.__ruta(metodo, partes)
+            try:
+                cuerpo = json.loads(cuerpo_bytes) if cuerpo_bytes else {}
+            except ValueError:
+                raise ErrorApi(400, 'JSON invalido')
+            if not isinstance(cuerpo, dict):
+                raise ErrorApi(400, 'Se esperaba un objeto JSON')
+            if not argumentos:
+                return await operacion(*argumentos, parse_qs(url.query), cuerpo)
+            # La partida del usuario no se suelta mientras haya peticiones suyas en curso
+            id_user = argumentos[0]
+            self.__en_uso[id_user] += 1
+            try:
+                return await operacion(*argumentos, parse_qs(url.query), cuerpo)
+            finally:
+                self.__en_uso[id_user] -= 1
+                if not self.__en_uso[id_user]:
+                    del self.__en_uso[id_user]
+        except ErrorApi as error:
+            return error.estado, {'error': error.mensaje}
+        except Exception as error:
+            return 500, {'error': f'{type(error).__name__}: {error}'}
+
+    async def conexion(self, lector: asyncio.StreamReader, escritor: asyncio.StreamWriter):
+        # Una conexion atiende peticiones en orden hasta que el cliente la cierra
+        try:
+            while True:
+                linea = await lector.readline()
+                if not linea:
+                    break
+                try:
+                    metodo, objetivo, version = linea.decode('latin-1').split()
+                except ValueError:
+                    await self.__responder(escritor, 400, {'error': 'Peticion invalida'}, False)
+                    break
+                cabeceras = {}
+                while True:
+                    linea = await lector.readline()
+                    if linea in (b'\r\n', b'\n', b''):
+                        break
+                    nombre, _, valor = linea.decode('latin-1').partition(':')
+                    cabeceras[nombre.strip().lower()] = valor.strip()
+
+                try:
+                    largo = int(cabeceras.get('content-length', '0') or 0)
+                except ValueError:
+                    largo = -1
+                if largo < 0:
+                    await self.__responder(escritor, 400, {'error': 'Content-Length invalido'}, False)
+                    break
+                if largo > MAX_CUERPO:
+                    await self.__responder(escritor, 413, {'error': 'Cuerpo demasiado grande'}, False)
+                    break
+                cuerpo = await lector.readexactly(largo) if largo else b''
+                conexion = cabeceras.get('connection', '').lower()
+                mantener = conexion != 'close' if version == 'HTTP/1.1' else conexion == 'keep-alive'
+
+                self.peticiones += 1
+                estado, datos = await self.atender(metodo.upper(), objetivo, cuerpo)
+                await self.__responder(escritor, estado, datos, mantener)
+                if not mantener:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    @staticmethod
+    async def __responder(escritor: asyncio.StreamWriter, estado: int, datos, mantener: bool):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+        escritor.write(
+            f"HTTP/1.1 {estado} {ESTADOS.get(estado, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(cuerpo)}\r\n"
+            f"Connection: {'keep-alive' if mantener else 'close'}\r\n\r\n".encode('latin-1') + cuerpo
+        )
+        await escritor.drain()
+
+    async def cerrar(self):
+        await self.db.close()
+
+
+async def servir(host: str = '127.0.0.1', puerto: int = 8080, ruta: str = 'pokedex.db'):
+    servidor = ServidorPokedex(ruta)
+    tcp = await asyncio.start_server(servidor.conexion, host, puerto, backlog=1024)
+    print(f"Pokedex API en http://{host}:{puerto}")
+    try:
+        async with tcp:
+            await tcp.serve_forever()
+    finally:
+        await servidor.cerrar()
+
+
+# --- Cliente de carga ---
+
+class ClienteHttp:
+    # Conexion keep-alive minima para el cliente de carga
+    def __init__(self, host: str, puerto: int):
+        self.host = host
+        self.puerto = puerto
+        self.lector: asyncio.StreamReader | None = None
+        self.escritor: asyncio.StreamWriter | None = None
+
+    async def abrir(self):
+        self.lector, self.escritor = await asyncio.open_connection(self.host, self.puerto)
+
+    async def pedir(self, metodo: str, ruta: str, datos: dict | None = None) -> Tuple[int, object]:
+        cuerpo = json.dumps(datos).encode('utf-8') if datos is not None else b''
+        self.escritor.write(
+            f"{metodo} {ruta} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(cuerpo)}\r\n\r\n".encode('latin-1') + cuerpo
+        )
+        linea = await self.lector.readline()
+        estado = int(linea.split()[1])
+        largo = 0
+        while True:
+            linea = await self.lector.readline()
+            if linea in (b'\r\n', b''):
+                break
+            nombre, _, valor = linea.decode('latin-1').partition(':')
+            if nombre.lower() == 'content-length':
+                largo = int(valor)
+        return estado, json.loads(await self.lector.readexactly(largo))
+
+    def cerrar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+
+
+async def carga(host: str = '127.0.0.1', puerto: int = 8080, conexiones: int = 50, segundos: float = 5.0):
+    # Cada conexion crea su jugador y repite: ver equipo, entrenar, combatir y guardar
+    fin = time.perf_counter() + segundos
+    latencias: List[float] = []
+    errores = [0]
+    prefijo = f"carga_{os.getpid()}_{int(time.time())}"
+
+    async def trabajador(i: int):
+        cliente = ClienteHttp(host, puerto)
+        await cliente.abrir()
+        try:
+            estado, datos = await cliente.pedir('POST', '/usuarios', {'nombre': f"{prefijo}_{i}", 'inicial': random.choice(['Agua', 'Fuego', 'Electrico', 'Hierba'])})
+            if estado != 201:
+                errores[0] += 1
+                return
+            base = f"/usuarios/{datos['usuario']['id']}"
+            peticiones = [
+                ('GET', f"{base}/pokemons", None),
+                ('POST', f"{base}/entrenar", {'modo': 'normal'}),
+                ('POST', f"{base}/combates", {'accion': 'especial'}),
+                ('POST', f"{base}/guardar", {}),
+                ('GET', f"{base}/combates?limite=5", None),
+            ]
+            n = 0
+            while time.perf_counter() < fin:
+                metodo, ruta, datos = peticiones[n % len(peticiones)]
+                inicio = time.perf_counter()
+                estado, _ = await cliente.pedir(metodo, ruta, datos)
+                latencias.append(time.perf_counter() - inicio)
+                if estado >= 400:
+                    errores[0] += 1
+                n += 1
+        finally:
+            cliente.cerrar()
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabajador(i) for i in range(conexiones)))
+    total = time.perf_counter() - inicio
+    latencias.sort()
+    print(f"conexiones: {conexiones}  peticiones: {len(latencias)}  errores: {errores[0]}")
+    if latencias:
+        p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))]
+        print(f"peticiones/s: {len(latencias) / total:.0f}  p50: {statistics.median(latencias) * 1000:.2f} ms  p99: {p99 * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    # python servidor.py [puerto]                         servidor (POKEDEX_DB para la ruta)
+    # python servidor.py carga [puerto] [conexiones] [segundos]
+    if sys.argv[1:2] == ["carga"]:
+        argumentos = sys.argv[2:]
+        asyncio.run(carga(
+            puerto=int(argumentos[0]) if len(argumentos) > 0 else 8080,
+            conexiones=int(argumentos[1]) if len(argumentos) > 1 else 50,
+            segundos=float(argumentos[2]) if len(argumentos) > 2 else 5.0,
+        ))
+    else:
+        try:
+            asyncio.run(servir(puerto=int(sys.argv[1]) if len(sys.argv) > 1 else 8080, ruta=os.environ.get('POKEDEX_DB', 'pokedex.db')))
+        except KeyboardInterrupt:
+            print("\nServidor detenido.")
@@ -0,0 +1,237 @@
+from __future__ import annotations
+import builtins
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+from app import App, Renderizador, Utils
+
+# Graba y reproduce sesiones completas de App. Un guion es un archivo JSON lines:
+# una cabecera {"version", "semilla", "backend"} y una linea {"prompt", "respuesta"}
+# por cada llamada a input(). Con la misma semilla y una base vacia la sesion es
+# determinista, asi que reproducirla mide el mismo recorrido en cada version.
+#
+#   python sesiones.py grabar guion.jsonl [semilla]
+#   python sesiones.py generar guion.jsonl [entrenamientos] [combates] [semilla]
+#   python sesiones.py reproducir guion.jsonl [informe.json]
+
+VERSION_GUION = 1
+BACKEND = 'sqlite-memoria'
+
+
+class FinGuion(BaseException):
+    # BaseException para que los `except Exception` de App no la absorban
+    pass
+
+
+class DivergenciaSesion(BaseException):
+    def __init__(self, indice: int, esperado: str, obtenido: str):
+        super().__init__(f"Accion {indice}: se esperaba el prompt {esperado!r} y App pidio {obtenido!r}")
+        self.indice = indice
+        self.esperado = esperado
+        self.obtenido = obtenido
+
+
+def correr_app(responder, semilla, backend: str = BACKEND, silencioso: bool = True) -> Tuple[List[dict], float]:
+    # Ejecuta App en un directorio temporal con input() = responder(prompt). Cada registro
+    # guarda cuanto tardo App en procesar esa respuesta hasta pedir la siguiente, sin
+    # contar el tiempo del jugador.
+    registros: List[dict] = []
+    inicio = time.perf_counter()
+    ultimo = [inicio]
+
+    def entrada(prompt: str = '') -> str:
+        llamada = time.perf_counter()
+        if registros:
+            registros[-1]['segundos'] = llamada - ultimo[0]
+        respuesta = responder(prompt)
+        registros.append({'prompt': prompt, 'respuesta': respuesta, 'segundos': 0.0})
+        ultimo[0] = time.perf_counter()
+        return respuesta
+
+    input_original = builtins.input
+    renderizador_original = Utils.renderizador
+    backend_original = os.environ.get('POKEDEX_BACKEND')
+    directorio_original = os.getcwd()
+    random.seed(semilla)
+    os.environ['POKEDEX_BACKEND'] = backend
+    if silencioso:
+        Utils.renderizador = Renderizador(tty=False, interactivo=True)
+    builtins.input = entrada
+    try:
+        with tempfile.TemporaryDirectory() as directorio, open(os.devnull, 'w') as nulo:
+            os.chdir(directorio)
+            try:
+                with contextlib.redirect_stdout(nulo) if silencioso else contextlib.nullcontext():
+                    App()
+            except (FinGuion, SystemExit):
+                pass
+            finally:
+                os.chdir(directorio_original)
+    finally:
+        builtins.input = input_original
+        Utils.renderizador = renderizador_original
+        if backend_original is None:
+            os.environ.pop('POKEDEX_BACKEND', None)
+        else:
+            os.environ['POKEDEX_BACKEND'] = backend_original
+
+    fin = time.perf_counter()
+    if registros:
+        registros[-1]['segundos'] = fin - ultimo[0]
+    return registros, fin - inicio
+
+
+def guardar_guion(ruta: str, registros: List[dict], semilla, backend: str = BACKEND):
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        archivo.write(json.dumps({'version': VERSION_GUION, 'semilla': semilla, 'backend': backend}) + '\n')
+        for registro in registros:
+            archivo.write(json.dumps({'prompt': registro['prompt'], 'respuesta': registro['respuesta']}, ensure_ascii=False) + '\n')
+
+
+def cargar_guion(ruta: str) -> Tuple[dict, List[dict]]:
+    with open(ruta, 'r', encoding='utf-8') as archivo:
+        cabecera = json.loads(archivo.readline())
+        if cabecera.get('version') != VERSION_GUION:
+            raise ValueError(f"Version de guion no soportada: {cabecera.get('version')}")
+        return cabecera, [json.loads(linea) for linea in archivo if linea.strip()]
+
+
+def grabar(ruta: str, semilla=None) -> Tuple[List[dict], float]:
+    # Sesion interactiva normal; las respuestas del jugador quedan en el guion
+    semilla = random.randrange(2 ** 32) if semilla is None else semilla
+    registros, total = correr_app(builtins.input, semilla, silencioso=False)
+    guardar_guion(ruta, registros, semilla)
+    return registros, total
+
+
+def reproducir(ruta: str) -> Tuple[List[dict], float]:
+    # Sin terminal: alimenta input() con el guion y falla si App pide otro prompt
+    cabecera, acciones = cargar_guion(ruta)
+    pendientes = iter(enumerate(acciones))
+
+    def responder(prompt: str) -> str:
+        try:
+            indice, accion = next(pendientes)
+        except StopIteration:
+            raise FinGuion()
+        if accion['prompt'] != prompt:
+            raise DivergenciaSesion(indice, accion['prompt'], prompt)
+        return accion['respuesta']
+
+    return correr_app(responder, cabecera['semilla'], cabecera.get('backend', BACKEND))
+
+
+class JugadorGuionado:
+    # Responde los prompts de App para un recorrido fijo: crear usuario, elegir
+    # inicial, entrenar N veces, pelear M combates, guardar y salir
+    def __init__(self, nombre: str = 'jugador', inicial: int = 1, entrenamientos: int = 1000, combates: int = 500):
+        self.nombre = nombre
+        self.inicial = inicial
+        self.entrenamientos = entrenamientos
+        self.combates = combates
+        self.tiene_inicial = False
+        self.guardado = False
+        self.estado = 'menu'
+
+    def __call__(self, prompt: str) -> str:
+        if prompt.startswith('\nPresiona Enter'):
+            return ''
+        if prompt.startswith('Ingresa tu nombre'):
+            return self.nombre
+        if prompt.startswith('Seleccione el usuario'):
+            return '1'
+        if prompt.startswith('Selecciona el numero del Pokemon'):
+            self.tiene_inicial = True
+            return str(self.inicial)
+        if prompt == 'Elige una opcion:  ':
+            return self.__menu_principal()
+        if prompt == 'Elige una opcion: ':
+            # Menu de entrenamiento: todos los entrenamientos en una sola visita
+            if self.entrenamientos > 0:
+                self.entrenamientos -= 1
+                return '1'
+            return '0'
+        if prompt == 'Elige:  ':
+            if self.estado == 'elegir_enemigo':
+                self.estado = 'combate'
+                return '1'
+            return '3'
+        if prompt == 'Elige: ':
+            # Tras ganar: no atrapar, el equipo no cambia entre combates
+            return '2'
+        raise ValueError(f"Prompt sin respuesta en el guion: {prompt!r}")
+
+    def __menu_principal(self) -> str:
+        self.estado = 'menu'
+        if not self.tiene_inicial:
+            # Cambiar de partida carga la recien creada y pide el inicial
+            return '10'
+        if self.entrenamientos > 0:
+            return '3'
+        if self.combates > 0:
+            self.combates -= 1
+            self.estado = 'elegir_enemigo'
+            return '4'
+        if not self.guardado:
+            self.guardado = True
+            return '9'
+        return '12'
+
+
+def generar(ruta: str, entrenamientos: int = 1000, combates: int = 500, semilla=0) -> Tuple[List[dict], float]:
+    registros, total = correr_app(JugadorGuionado(entrenamientos=entrenamientos, combates=combates), semilla)
+    guardar_guion(ruta, registros, semilla)
+    return registros, total
+
+
+def informe(registros: List[dict], total: float, maximo: int = 15) -> dict:
+    # Tiempo por accion agrupado por prompt y respuesta, de mayor a menor tiempo total
+    grupos: dict = {}
+    for registro in registros:
+        clave = f"{registro['prompt'].strip()} [{registro['respuesta']}]"
+        grupo = grupos.setdefault(clave, {'acciones': 0, 'segundos': 0.0, 'max_segundos': 0.0})
+        grupo['acciones'] += 1
+        grupo['segundos'] += registro['segundos']
+        grupo['max_segundos'] = max(grupo['max_segundos'], registro['segundos'])
+
+    print(f"acciones: {len(registros)}  tiempo total: {total * 1000:.1f} ms")
+    print(f"{'accion':<45} {'acciones':>9} {'total (ms)':>11} {'media (us)':>11} {'max (ms)':>9}")
+    for clave, grupo in sorted(grupos.items(), key=lambda item: -item[1]['segundos'])[:maximo]:
+        print(f"{clave[:45]:<45} {grupo['acciones']:>9} {grupo['segundos'] * 1000:>11.2f} "
+              f"{grupo['segundos'] / grupo['acciones'] * 1e6:>11.1f} {grupo['max_segundos'] * 1000:>9.2f}")
+    return {'acciones': len(registros), 'segundos': total, 'por_prompt': grupos}
+
+
+if __name__ == "__main__":
+    orden = sys.argv[1:2]
+    argumentos = sys.argv[2:]
+    if orden == ["grabar"] and argumentos:
+        registros, total = grabar(argumentos[0], int(argumentos[1]) if len(argumentos) > 1 else None)
+        informe(registros, total)
+    elif orden == ["generar"] and argumentos:
+        registros, total = generar(
+            argumentos[0],
+            int(argumentos[1]) if len(argumentos) > 1 else 1000,
+            int(argumentos[2]) if len(argumentos) > 2 else 500,
+            int(argumentos[3]) if len(argumentos) > 3 else 0,
+        )
+        print(f"guion con {len(registros)} acciones en {argumentos[0]}")
+    elif orden == ["reproducir"] and argumentos:
+        try:
+            registros, total = reproducir(argumentos[0])
+        except DivergenciaSesion as error:
+            print(f"Error: la sesion diverge del guion. {error}")
+            sys.exit(1)
+        resumen = informe(registros, total)
+        if len(argumentos) > 1:
+            with open(argumentos[1], 'w', encoding='utf-8') as archivo:
+                json.dump(resumen, archivo, indent=2, ensure_ascii=False)
+    else:
+        print("uso: python sesiones.py grabar|generar|reproducir guion.jsonl ...")
+        sys.exit(2)
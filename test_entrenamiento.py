@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+import app
+from app import Agua, Electrico, Fuego, Hierba, Roster
+
+# entrenar_varias(n) y Roster.entrenar(n) tienen que dejar exactamente el mismo estado
+# que n llamadas a entrenar()
+
+CAMPOS_ENTRENAMIENTO = ('nombre', 'nivel', 'evolucion', 'ataque', 'defensa', 'vida', 'cambios')
+LINEAS_EVOLUTIVAS = {
+    Agua: ["Squirtle", "Wartortle", "Blastoise"],
+    Fuego: ["Charmander", "Charmeleon", "Charizard"],
+    Electrico: ["Pichu", "Pikachu", "Raichu"],
+    Hierba: ["Bulbasaur", "Ivysaur", "Venusaur"],
+}
+
+
+def copiar_pokemon(pokemon):
+    # Copia campo por campo, sin pasar por el constructor el nivel, el nombre ni los cambios
+    copia = type(pokemon)(descripcion=pokemon.descripcion, ataque=pokemon.ataque, defensa=pokemon.defensa, vida=pokemon.vida,
+                          evolucion=pokemon.evolucion, atrapado=True, evoluciones_nombres=pokemon.evoluciones_nombres)
+    copia.nivel = pokemon.nivel
+    copia.nombre = pokemon.nombre
+    copia.cambios = pokemon.cambios
+    return copia
+
+
+def _pokemon_al_azar(rng: random.Random):
+    # Estados de partida variados: niveles cerca de los bordes del reinicio, lineas
+    # evolutivas de 1 a 3 nombres y cualquier evolucion
+    clase = rng.choice(list(LINEAS_EVOLUTIVAS))
+    linea = LINEAS_EVOLUTIVAS[clase][:rng.randint(1, 3)]
+    pokemon = clase(descripcion="Pokemon", ataque=rng.randint(0, 500), defensa=rng.randint(0, 500), vida=rng.randint(0, 500),
+                    evolucion=rng.randint(1, 3), atrapado=True, evoluciones_nombres=linea)
+    pokemon.nivel = rng.choice([0, 1, 9, 10, 11, 89, 90, 91, 99, 100, 101, 150, rng.randint(0, 250)])
+    pokemon.nombre = rng.choice(linea + ["Apodo"])
+    return pokemon
+
+
+def _estado(pokemon) -> tuple:
+    return tuple(getattr(pokemon, campo) for campo in CAMPOS_ENTRENAMIENTO)
+
+
+def _fila_roster(roster: Roster, i: int) -> tuple:
+    return (roster.textos[roster.i_nombres[i]], roster.niveles[i], roster.evoluciones[i],
+            roster.ataques[i], roster.defensas[i], roster.vidas[i], roster.cambios[i])
+
+
+@pytest.mark.parametrize('semilla', [0, 1, 2])
+def test_entrenar_varias_igual_a_entrenar(semilla):
+    rng = random.Random(semilla)
+    for _ in range(1000):
+        n = rng.choice([0, 1, 2, 9, 10, 11, rng.randint(0, 40), rng.randint(0, 400)])
+        secuencial = _pokemon_al_azar(rng)
+        cerrado = copiar_pokemon(secuencial)
+        for _ in range(n):
+            secuencial.entrenar()
+        cerrado.entrenar_varias(n)
+        assert _estado(cerrado) == _estado(secuencial), f"entrenar_varias({n})"
+
+
+@pytest.mark.parametrize('motor', ['numpy', 'python'])
+@pytest.mark.parametrize('semilla', [0, 1, 2])
+def test_roster_entrenar_igual_a_entrenar(motor, semilla, monkeypatch):
+    if motor == 'numpy' and app.np is None:
+        pytest.skip('NumPy no esta instalado')
+    if motor == 'python':
+        monkeypatch.setattr(app, 'np', None)
+    rng = random.Random(semilla)
+    for _ in range(10):
+        n = rng.choice([1, 10, rng.randint(0, 40), rng.randint(0, 400)])
+        pokemons = [_pokemon_al_azar(rng) for _ in range(100)]
+        roster = Roster([copiar_pokemon(p) for p in pokemons])
+        # Todas las filas o un subconjunto
+        indices = sorted(rng.sample(range(100), rng.randint(0, 100))) if rng.random() < 0.5 else None
+        for i in (indices if indices is not None else range(100)):
+            for _ in range(n):
+                pokemons[i].entrenar()
+        roster.entrenar(n, indices)
+        # Se comparan columnas: roster[i] pasa por el constructor, que sube el nivel 0 a 1
+        esperado = Roster(pokemons)
+        for i in range(len(pokemons)):
+            assert _fila_roster(roster, i) == _fila_roster(esperado, i), f"Roster.entrenar({n}) fila {i}"
@@ -0,0 +1,44 @@
+import signal
+
+import pytest
+
+import torneo
+from torneo import Participantes, Torneo
+
+
+class _ResultadosInterrumpidos(list):
+    # Manda un Ctrl+C despues de leer el primer par, con aplicar() a mitad del chunk
+    def __getitem__(self, indice):
+        if indice == 3:
+            signal.raise_signal(signal.SIGINT)
+        return super().__getitem__(indice)
+
+
+def _estado(t: Torneo) -> tuple:
+    return (t.ronda, t.chunk, t.combates, list(t.elo), list(t.glicko), list(t.rd), list(t.puntos), list(t.jugadas), t.enfrentados)
+
+
+@pytest.mark.parametrize('sistema', ['suizo', 'todos'])
+def test_ctrl_c_a_mitad_de_chunk_y_reanudar(sistema, tmp_path, monkeypatch):
+    participantes = Participantes.sinteticos(21, 1)
+    completo = Torneo(participantes, sistema, tamaño_chunk=4)
+    assert completo.correr(procesos=1)
+
+    jugar_chunk = torneo._jugar_chunk
+    llamadas = []
+
+    def jugar_e_interrumpir(tarea):
+        llamadas.append(tarea)
+        resultados = jugar_chunk(tarea)
+        return _ResultadosInterrumpidos(resultados) if len(llamadas) == 5 else resultados
+
+    checkpoint = str(tmp_path / 'torneo.json')
+    monkeypatch.setattr(torneo, '_jugar_chunk', jugar_e_interrumpir)
+    cortado = Torneo(participantes, sistema, tamaño_chunk=4)
+    assert not cortado.correr(procesos=1, checkpoint=checkpoint)
+    monkeypatch.setattr(torneo, '_jugar_chunk', jugar_chunk)
+
+    # El chunk interrumpido quedo aplicado entero: reanudar no repite ninguno de sus pares
+    reanudado = Torneo.cargar(checkpoint)
+    assert reanudado.correr(procesos=1, checkpoint=checkpoint)
+    assert _estado(reanudado) == _estado(completo)
@@ -0,0 +1,460 @@
+from __future__ import annotations
+import argparse
+import json
+import math
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import List, Tuple
+
+from app import DataBase, MotorCombate, politica_fija, politica_aleatoria, crear_enemigos_por_defecto, ACCION_ESPECIAL
+
+# Torneo entre todos los pokemons guardados (de todas las partidas) y los enemigos por
+# defecto, con ratings Elo y Glicko calculados a partir de combates reales.
+#
+#   python torneo.py [--sistema suizo|todos] [--rondas N] [--procesos P] [--checkpoint torneo.json]
+#   python torneo.py --checkpoint torneo.json --reanudar
+#
+# Todos contra todos no guarda la lista de pares: el par k de la ronda r sale de la
+# formula del metodo del circulo, y cada chunk viaja como (ronda, inicio, fin). Los
+# chunks se reparten en un ProcessPoolExecutor con una ventana acotada: cada proceso
+# libre toma el siguiente de la cola. Los resultados se aplican en orden de chunk y la
+# semilla de cada chunk depende solo de (semilla, ronda, chunk), asi que reanudar desde
+# un checkpoint da exactamente los mismos ratings que una corrida sin cortes.
+
+VERSION_CHECKPOINT = 1
+ELO_INICIAL = 1500.0
+RD_INICIAL = 350.0
+Q_GLICKO = math.log(10) / 400
+
+
+@contextmanager
+def _sin_interrupciones():
+    # Un Ctrl+C que llega adentro se guarda y se lanza al salir, para que aplicar un
+    # chunk, emparejar o cerrar una ronda no queden a medias en el checkpoint. Las
+    # señales solo se pueden manejar en el hilo principal; en otro hilo no hace nada.
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    recibida = []
+    anterior = signal.signal(signal.SIGINT, lambda numero, marco: recibida.append(numero))
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGINT, anterior)
+    if recibida:
+        raise KeyboardInterrupt
+
+
+class Participantes:
+    # Nombres y estadisticas (ataque, defensa, vida) en un arreglo plano
+    def __init__(self, nombres: List[str] | None = None, estadisticas: array | None = None):
+        self.nombres: List[str] = nombres or []
+        self.estadisticas = estadisticas if estadisticas is not None else array('q')
+
+    def __len__(self) -> int:
+        return len(self.nombres)
+
+    def agregar(self, nombre: str, ataque: int, defensa: int, vida: int):
+        self.nombres.append(nombre)
+        self.estadisticas.extend((ataque, defensa, vida))
+
+    @staticmethod
+    def desde_db(ruta: str = 'pokedex.db', enemigos: bool = True) -> Participantes:
+        participantes = Participantes()
+        db = DataBase(ruta)
+        try:
+            for id_user, usuario, _ in db.iter_all_users():
+                for fila in db.iter_pokemons_by_user_id(id_user):
+                    participantes.agregar(f"{usuario}/{fila[1]}#{fila[0]}", fila[5], fila[6], fila[7])
+        finally:
+            db.close()
+        if enemigos:
+            for enemigo in crear_enemigos_por_defecto():
+                participantes.agregar(f"enemigo/{enemigo.nombre}", enemigo.ataque, enemigo.defensa, enemigo.vida)
+        return participantes
+
+    @staticmethod
+    def sinteticos(n: int, semilla: int = 0) -> Participantes:
+        # Para probar torneos grandes sin una base con miles de partidas
+        rng = random.Random(semilla)
+        participantes = Participantes()
+        for i in range(n):
+            participantes.agregar(f"sintetico_{i}", rng.randint(10, 200), rng.randint(10, 200), rng.randint(50, 500))
+        return participantes
+
+
+def par_todos_contra_todos(jugadores: int, ronda: int, k: int) -> Tuple[int, int]:
+    # Metodo del circulo con `jugadores` par: el ultimo queda fijo y el resto rota.
+    # Con un numero impar de participantes el ultimo indice es el descanso.
+    m = jugadores - 1
+    if k == 0:
+        return ronda % m, m
+    return (ronda + k) % m, (ronda - k) % m
+
+
+# Estadisticas de los participantes en cada proceso, cargadas una vez por el inicializador
+_ESTADISTICAS: array | None = None
+
+def _iniciar_proceso(estadisticas: array):
+    global _ESTADISTICAS
+    _ESTADISTICAS = estadisticas
+
+
+def _jugar_chunk(tarea: tuple) -> array:
+    # Devuelve (a, b, medios puntos de a) por cada par jugado del chunk: 2 por victoria, 1 por empate
+    semilla, ronda, chunk, partidas, pares = tarea
+    estadisticas = _ESTADISTICAS
+    n = len(estadisticas) // 3
+    rng = random.Random(f'{semilla}-{ronda}-{chunk}')
+    simular = MotorCombate(politica_fija(ACCION_ESPECIAL), politica_aleatoria(rng), rng, registrar_eventos=False).simular
+    if pares[0] == 'todos':
+        _, jugadores, inicio, fin = pares
+        pares = (par_todos_contra_todos(jugadores, ronda, k) for k in range(inicio, fin))
+    else:
+        pares = zip(pares[1][0::2], pares[1][1::2])
+
+    resultados = array('q')
+    for a, b in pares:
+        if a >= n or b >= n:
+            continue
+        sa = estadisticas[3 * a:3 * a + 3]
+        sb = estadisticas[3 * b:3 * b + 3]
+        medios = 0
+        for partida in range(partidas):
+            # Se alternan los papeles: el que hace de jugador empieza y recibe contraataques
+            if partida % 2 == 0:
+                resultado = simular(*sa, *sb)
+                medios += 2 if resultado.ganador == 'jugador' else resultado.empate
+            else:
+                resultado = simular(*sb, *sa)
+                medios += 2 if resultado.ganador == 'enemigo' else resultado.empate
+        resultados.extend((a, b, medios))
+    return resultados
+
+
+class Torneo:
+    def __init__(self,
+        participantes: Participantes,
+        sistema: str = 'suizo',
+        rondas: int | None = None,
+        partidas: int = 2,
+        tamaño_chunk: int = 512,
+        semilla: int = 0,
+        k_elo: float = 32.0,
+        c_glicko: float = 0.0
+        ):
+        if sistema not in ('suizo', 'todos'):
+            raise ValueError(f"Sistema de torneo desconocido: {sistema}")
+        n = len(participantes)
+        if n < 2:
+            raise ValueError("Hacen falta al menos 2 participantes")
+        self.participantes = participantes
+        self.sistema = sistema
+        # Todos contra todos con un descanso ficticio si son impares
+        self.jugadores = n + n % 2
+        if rondas is None:
+            rondas = self.jugadores - 1 if sistema == 'todos' else math.ceil(math.log2(n)) + 1
+        self.rondas = min(rondas, self.jugadores - 1) if sistema == 'todos' else rondas
+        self.partidas = partidas
+        self.tamaño_chunk = tamaño_chunk
+        self.semilla = semilla
+        self.k_elo = k_elo
+        self.c_glicko = c_glicko
+
+        # Progreso: ronda en curso y chunks de esa ronda ya aplicados
+        self.ronda = 0
+        self.chunk = 0
+        self.combates = 0
+        self.elo = array('d', [ELO_INICIAL]) * n
+        self.glicko = array('d', [ELO_INICIAL]) * n
+        self.rd = array('d', [RD_INICIAL]) * n
+        # Sumas de Glicko del periodo (la ronda) en curso
+        self.suma_varianza = array('d', [0.0]) * n
+        self.suma_delta = array('d', [0.0]) * n
+        self.puntos = array('d', [0.0]) * n
+        self.jugadas = array('q', [0]) * n
+        # Suizo: pares ya jugados (a * n + b con a < b), quienes ya descansaron y pares de la ronda en curso
+        self.enfrentados: set = set()
+        self.descansos: set = set()
+        self.pares_ronda: array | None = None
+
+    # --- Emparejamientos ---
+
+    def chunks_ronda(self) -> int:
+        pares = self.jugadores // 2 if self.sistema == 'todos' else len(self.pares_ronda) // 2
+        return -(-pares // self.tamaño_chunk)
+
+    def tarea(self, chunk: int) -> tuple:
+        inicio = chunk * self.tamaño_chunk
+        if self.sistema == 'todos':
+            fin = min(inicio + self.tamaño_chunk, self.jugadores // 2)
+            pares = ('todos', self.jugadores, inicio, fin)
+        else:
+            pares = ('suizo', self.pares_ronda[2 * inicio:2 * (inicio + self.tamaño_chunk)])
+        return (self.semilla, self.ronda, chunk, self.partidas, pares)
+
+    def emparejar_suizo(self, ventana: int = 64):
+        # Por puntos y luego Elo; cada uno juega con el siguiente libre que no haya
+        # enfrentado (buscando hasta `ventana` puestos). Si son impares descansa el peor
+        # ubicado que todavia no descanso, y suma un punto.
+        n = len(self.participantes)
+        orden = sorted(range(n), key=lambda i: (-self.puntos[i], -self.elo[i], i))
+        if n % 2:
+            descansa = next((i for i in reversed(orden) if i not in self.descansos), orden[-1])
+            orden.remove(descansa)
+            self.descansos.add(descansa)
+            self.puntos[descansa] += 1
+        libres = deque(orden)
+        pares = array('q')
+        while len(libres) > 1:
+            a = libres.popleft()
+            elegido = 0
+            for posicion in range(min(ventana, len(libres))):
+                b = libres[posicion]
+                if min(a, b) * n + max(a, b) not in self.enfrentados:
+                    elegido = posicion
+                    break
+            b = libres[elegido]
+            del libres[elegido]
+            pares.extend((a, b))
+        self.pares_ronda = pares
+
+    # --- Ratings ---
+
+    def aplicar(self, resultados: array):
+        n = len(self.participantes)
+        elo, glicko, rd = self.elo, self.glicko, self.rd
+        suma_varianza, suma_delta = self.suma_varianza, self.suma_delta
+        for i in range(0, len(resultados), 3):
+            a, b, medios = resultados[i], resultados[i + 1], resultados[i + 2]
+            puntaje = medios / (2 * self.partidas)
+
+            # Elo: se actualiza en cada resultado
+            esperado = 1 / (1 + 10 ** ((elo[b] - elo[a]) / 400))
+            cambio = self.k_elo * (puntaje - esperado)
+            elo[a] += cambio
+            elo[b] -= cambio
+
+            # Glicko: se acumula con los ratings del inicio de la ronda
+            for yo, rival, s in ((a, b, puntaje), (b, a, 1 - puntaje)):
+                g = 1 / math.sqrt(1 + 3 * (Q_GLICKO * rd[rival]) ** 2 / math.pi ** 2)
+                e = 1 / (1 + 10 ** (-g * (glicko[yo] - glicko[rival]) / 400))
+                suma_varianza[yo] += g * g * e * (1 - e)
+                suma_delta[yo] += g * (s - e)
+
+            self.puntos[a] += puntaje
+            self.puntos[b] += 1 - puntaje
+            self.jugadas[a] += 1
+            self.jugadas[b] += 1
+            if self.sistema == 'suizo':
+                self.enfrentados.add(min(a, b) * n + max(a, b))
+            self.combates += self.partidas
+
+    def cerrar_ronda(self):
+        # Fin del periodo de Glicko-1
+        for i in range(len(self.participantes)):
+            rd = min(math.sqrt(self.rd[i] ** 2 + self.c_glicko ** 2), RD_INICIAL)
+            if self.suma_varianza[i] > 0:
+                precision = 1 / rd ** 2 + Q_GLICKO ** 2 * self.suma_varianza[i]
+                self.glicko[i] += Q_GLICKO / precision * self.suma_delta[i]
+                rd = math.sqrt(1 / precision)
+            self.rd[i] = rd
+            self.suma_varianza[i] = 0.0
+            self.suma_delta[i] = 0.0
+        self.ronda += 1
+        self.chunk = 0
+        self.pares_ronda = None
+
+    @property
+    def terminado(self) -> bool:
+        return self.ronda >= self.rondas
+
+    # --- Ejecucion ---
+
+    def correr(self, procesos: int | None = None, checkpoint: str | None = None, cada_segundos: float = 30.0,
+               al_cerrar_ronda=None) -> bool:
+        # Devuelve True si termino; con Ctrl+C guarda el checkpoint y devuelve False
+        procesos = procesos or os.cpu_count() or 1
+        ultimo_guardado = time.perf_counter()
+        pool = None
+        if procesos > 1:
+            pool = ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso, initargs=(self.participantes.estadisticas,))
+        else:
+            _iniciar_proceso(self.participantes.estadisticas)
+        try:
+            while not self.terminado:
+                if self.sistema == 'suizo' and self.pares_ronda is None:
+                    with _sin_interrupciones():
+                        self.emparejar_suizo()
+                total = self.chunks_ronda()
+                if pool is None:
+                    while self.chunk < total:
+                        resultados = _jugar_chunk(self.tarea(self.chunk))
+                        with _sin_interrupciones():
+                            self.aplicar(resultados)
+                            self.chunk += 1
+                        if checkpoint and time.perf_counter() - ultimo_guardado >= cada_segundos:
+                            self.guardar(checkpoint)
+                            ultimo_guardado = time.perf_counter()
+                else:
+                    # Ventana de chunks en vuelo; se aplican en orden de envio
+                    siguiente = self.chunk
+                    en_vuelo: deque = deque()
+                    while self.chunk < total:
+                        while siguiente < total and len(en_vuelo) < 4 * procesos:
+                            en_vuelo.append(pool.submit(_jugar_chunk, self.tarea(siguiente)))
+                            siguiente += 1
+                        resultados = en_vuelo.popleft().result()
+                        with _sin_interrupciones():
+                            self.aplicar(resultados)
+                            self.chunk += 1
+                        if checkpoint and time.perf_counter() - ultimo_guardado >= cada_segundos:
+                            self.guardar(checkpoint)
+                            ultimo_guardado = time.perf_counter()
+                with _sin_interrupciones():
+                    self.cerrar_ronda()
+                if al_cerrar_ronda is not None:
+                    al_cerrar_ronda(self)
+                if checkpoint:
+                    self.guardar(checkpoint)
+                    ultimo_guardado = time.perf_counter()
+        except KeyboardInterrupt:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = None
+            if checkpoint:
+                self.guardar(checkpoint)
+            return False
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return True
+
+    def ranking(self, por: str = 'elo') -> List[Tuple[int, str, float, float, float, float, int]]:
+        # (puesto, nombre, elo, glicko, rd, puntos, pares jugados), de mejor a peor
+        claves = {'elo': self.elo, 'glicko': self.glicko, 'puntos': self.puntos}
+        valores = claves[por]
+        orden = sorted(range(len(self.participantes)), key=lambda i: (-valores[i], i))
+        return [
+            (puesto, self.participantes.nombres[i], self.elo[i], self.glicko[i], self.rd[i], self.puntos[i], self.jugadas[i])
+            for puesto, i in enumerate(orden, start=1)
+        ]
+
+    # --- Checkpoint ---
+
+    def guardar(self, ruta: str):
+        estado = {
+            'version': VERSION_CHECKPOINT,
+            'config': {
+                'sistema': self.sistema, 'rondas': self.rondas, 'partidas': self.partidas,
+                'tamaño_chunk': self.tamaño_chunk, 'semilla': self.semilla, 'k_elo': self.k_elo, 'c_glicko': self.c_glicko,
+            },
+            'nombres': self.participantes.nombres,
+            'estadisticas': list(self.participantes.estadisticas),
+            'ronda': self.ronda,
+            'chunk': self.chunk,
+            'combates': self.combates,
+            'elo': list(self.elo),
+            'glicko': list(self.glicko),
+            'rd': list(self.rd),
+            'suma_varianza': list(self.suma_varianza),
+            'suma_delta': list(self.suma_delta),
+            'puntos': list(self.puntos),
+            'jugadas': list(self.jugadas),
+            'enfrentados': sorted(self.enfrentados),
+            'descansos': sorted(self.descansos),
+            'pares_ronda': list(self.pares_ronda) if self.pares_ronda is not None else None,
+        }
+        temporal = f'{ruta}.tmp'
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(estado, archivo, ensure_ascii=False)
+        os.replace(temporal, ruta)
+
+    @staticmethod
+    def cargar(ruta: str) -> Torneo:
+        with open(ruta, 'r', encoding='utf-8') as archivo:
+            estado = json.load(archivo)
+        if estado.get('version') != VERSION_CHECKPOINT:
+            raise ValueError(f"Version de checkpoint no soportada: {estado.get('version')}")
+        participantes = Participantes(estado['nombres'], array('q', estado['estadisticas']))
+        torneo = Torneo(participantes, **estado['config'])
+        torneo.ronda = estado['ronda']
+        torneo.chunk = estado['chunk']
+        torneo.combates = estado['combates']
+        for campo, tipo in (('elo', 'd'), ('glicko', 'd'), ('rd', 'd'), ('suma_varianza', 'd'),
+                            ('suma_delta', 'd'), ('puntos', 'd'), ('jugadas', 'q')):
+            setattr(torneo, campo, array(tipo, estado[campo]))
+        torneo.enfrentados = set(estado['enfrentados'])
+        torneo.descansos = set(estado['descansos'])
+        if estado['pares_ronda'] is not None:
+            torneo.pares_ronda = array('q', estado['pares_ronda'])
+        return torneo
+
+
+def imprimir_ranking(torneo: Torneo, top: int = 20, por: str = 'elo'):
+    print(f"{'#':>5} {'pokemon':<40} {'elo':>8} {'glicko':>8} {'±2rd':>6} {'puntos':>8} {'pares':>6}")
+    for puesto, nombre, elo, glicko, rd, puntos, jugadas in torneo.ranking(por)[:top]:
+        print(f"{puesto:>5} {nombre[:40]:<40} {elo:>8.1f} {glicko:>8.1f} {2 * rd:>6.0f} {puntos:>8.1f} {jugadas:>6}")
+
+
+def main(argumentos: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog='torneo.py')
+    parser.add_argument('--sistema', choices=('suizo', 'todos'), default='suizo')
+    parser.add_argument('--rondas', type=int, help='por defecto log2(n)+1 en suizo y n-1 en todos contra todos')
+    parser.add_argument('--partidas', type=int, default=2, help='combates por par, alternando quien empieza')
+    parser.add_argument('--procesos', type=int, help='procesos del pool (por defecto os.cpu_count())')
+    parser.add_argument('--chunk', type=int, default=512, help='pares por tarea')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--db', default=os.environ.get('POKEDEX_DB', 'pokedex.db'))
+    parser.add_argument('--sinteticos', type=int, help='usar N participantes al azar en lugar de la base')
+    parser.add_argument('--checkpoint', help='archivo JSON de progreso')
+    parser.add_argument('--reanudar', action='store_true', help='continuar desde --checkpoint')
+    parser.add_argument('--cada', type=float, default=30.0, help='segundos entre checkpoints dentro de una ronda')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--orden', choices=('elo', 'glicko', 'puntos'), default='elo')
+    parser.add_argument('--salida', help='JSON con el ranking completo')
+    opciones = parser.parse_args(argumentos)
+
+    if opciones.reanudar:
+        if not opciones.checkpoint or not os.path.exists(opciones.checkpoint):
+            print("Error: --reanudar necesita un --checkpoint existente")
+            return 2
+        torneo = Torneo.cargar(opciones.checkpoint)
+    else:
+        if opciones.sinteticos:
+            participantes = Participantes.sinteticos(opciones.sinteticos, opciones.semilla)
+        else:
+            participantes = Participantes.desde_db(opciones.db)
+        torneo = Torneo(participantes, opciones.sistema, opciones.rondas, opciones.partidas, opciones.chunk, opciones.semilla)
+
+    print(f"{len(torneo.participantes)} participantes, {torneo.sistema}, ronda {torneo.ronda + 1} de {torneo.rondas}")
+    inicio = time.perf_counter()
+    combates_inicio = torneo.combates
+
+    def progreso(t: Torneo):
+        segundos = time.perf_counter() - inicio
+        print(f"ronda {t.ronda}/{t.rondas}  combates {t.combates}  {(t.combates - combates_inicio) / max(segundos, 1e-9):.0f} combates/s")
+
+    terminado = torneo.correr(opciones.procesos, opciones.checkpoint, opciones.cada, progreso)
+    if not terminado:
+        print(f"Interrumpido en la ronda {torneo.ronda + 1}; continua con --checkpoint {opciones.checkpoint} --reanudar")
+    imprimir_ranking(torneo, opciones.top, opciones.orden)
+    if opciones.salida:
+        with open(opciones.salida, 'w', encoding='utf-8') as archivo:
+            json.dump([
+                {'puesto': puesto, 'nombre': nombre, 'elo': elo, 'glicko': glicko, 'rd': rd, 'puntos': puntos, 'pares': jugadas}
+                for puesto, nombre, elo, glicko, rd, puntos, jugadas in torneo.ranking(opciones.orden)
+            ], archivo, indent=2, ensure_ascii=False)
+    return 0 if terminado else 130
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))